@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""检测精度报告
+
+在同一段视频上以不同的人脸检测缩放比例运行FaceDetector，以原始分辨率（缩放
+比例1.0）的结果为基准，统计各缩放比例下的人脸检出率、特征点误差、EAR/MAR
+误差以及每帧耗时，用于选择配置文件中的DETECT_SCALE。
+
+--filter-intervals模式评估特征点滤波（LANDMARK_FILTER）：以每帧运行特征点预测、
+不滤波的结果为基准，比较每隔N帧运行一次预测（其余帧外推）时的EAR误差和眨眼
+检测的召回率/精确率，用于选择LANDMARK_FILTER_INTERVAL和滤波噪声参数。
+
+用法:
+    python accuracy_report.py video.mp4 --scales 1.0 0.75 0.5 0.33 -o report.json
+    python accuracy_report.py video.mp4 --filter-intervals 1 2 3 -o filter_report.json
+"""
+
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+import face_detector
+import fatigue_analyzer
+from landmark_filter import LandmarkFilter
+
+
+def _summary(values):
+    """计算均值和P95，没有数据时返回None"""
+    if len(values) == 0:
+        return None, None
+    values = np.asarray(values, dtype=np.float64)
+    return float(values.mean()), float(np.percentile(values, 95))
+
+
+def evaluate(video, detector, scales, step=1, max_frames=0):
+    """在视频上比较不同检测缩放比例的精度
+
+    Args:
+        video: 视频文件路径
+        detector: 人脸检测器实例（会临时修改其detect_scale并关闭跟踪）
+        scales: 需要比较的缩放比例列表
+        step: 每隔多少帧取一帧
+        max_frames: 最多评估的帧数，0表示不限制
+
+    Returns:
+        dict: 各缩放比例的统计结果
+    """
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video}")
+
+    # 跟踪会让后续帧复用之前的人脸框，评估检测缩放比例时必须逐帧检测
+    detector.tracking = False
+    detector.reset_tracking()
+
+    stats = {s: {"detected": 0, "missed": 0, "extra": 0, "times": [],
+                 "landmark_err": [], "ear_err": [], "mar_err": []} for s in scales}
+    frames = 0
+    index = 0
+    try:
+        while True:
+            flag, frame = cap.read()
+            if not flag or frame is None:
+                break
+            index += 1
+            if (index - 1) % step:
+                continue
+
+            # 基准：原始分辨率检测
+            detector.detect_scale = 1.0
+            base = detector.detect_face(frame)
+
+            for scale in scales:
+                detector.detect_scale = scale
+                start = time.perf_counter()
+                result = detector.detect_face(frame)
+                stats[scale]["times"].append(time.perf_counter() - start)
+
+                item = stats[scale]
+                if result[0]:
+                    item["detected"] += 1
+                if base[0] and not result[0]:
+                    item["missed"] += 1
+                elif result[0] and not base[0]:
+                    item["extra"] += 1
+                elif base[0] and result[0]:
+                    # 每帧特征点误差取68个点欧式距离的均值
+                    diff = result[1].astype(np.float64) - base[1].astype(np.float64)
+                    item["landmark_err"].append(float(np.sqrt((diff ** 2).sum(axis=1)).mean()))
+                    item["ear_err"].append(abs(result[5] - base[5]))
+                    item["mar_err"].append(abs(result[6] - base[6]))
+
+            frames += 1
+            if max_frames and frames >= max_frames:
+                break
+    finally:
+        cap.release()
+
+    report = {"video": video, "frames": frames, "scales": {}}
+    for scale in scales:
+        item = stats[scale]
+        landmark_mean, landmark_p95 = _summary(item["landmark_err"])
+        ear_mean, ear_p95 = _summary(item["ear_err"])
+        mar_mean, mar_p95 = _summary(item["mar_err"])
+        time_mean, time_p95 = _summary(item["times"])
+        report["scales"][str(scale)] = {
+            "detect_rate": item["detected"] / frames if frames else 0.0,
+            "missed": item["missed"],
+            "extra": item["extra"],
+            "landmark_err_px_mean": landmark_mean,
+            "landmark_err_px_p95": landmark_p95,
+            "ear_abs_err_mean": ear_mean,
+            "ear_abs_err_p95": ear_p95,
+            "mar_abs_err_mean": mar_mean,
+            "mar_abs_err_p95": mar_p95,
+            "frame_ms_mean": time_mean * 1000 if time_mean is not None else None,
+            "frame_ms_p95": time_p95 * 1000 if time_p95 is not None else None,
+        }
+    return report
+
+
+def match_events(base, other, tolerance):
+    """按时间贪心匹配两组事件
+
+    Args:
+        base: 基准事件时间列表（升序）
+        other: 待比较的事件时间列表（升序）
+        tolerance: 允许的最大时间差（秒）
+
+    Returns:
+        int: 匹配上的事件数
+    """
+    matched = 0
+    j = 0
+    for t in base:
+        while j < len(other) and other[j] < t - tolerance:
+            j += 1
+        if j < len(other) and other[j] <= t + tolerance:
+            matched += 1
+            j += 1
+    return matched
+
+
+def evaluate_filter(video, detector, intervals, process_noise=1.0, measurement_noise=1.0, max_frames=0,
+                    tolerance=0.2):
+    """在视频上评估特征点滤波和隔帧预测对EAR和眨眼检测的影响
+
+    Args:
+        video: 视频文件路径
+        detector: 人脸检测器实例（各配置与它共用模型，跟踪设置与它相同）
+        intervals: 需要比较的特征点预测间隔列表（1表示每帧预测、只做平滑）
+        process_noise: 滤波过程噪声
+        measurement_noise: 滤波观测噪声（像素²）
+        max_frames: 最多评估的帧数，0表示不限制
+        tolerance: 眨眼事件匹配允许的时间差（秒）
+
+    Returns:
+        dict: 各预测间隔的统计结果
+    """
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    # 每个配置一个检测器（共用模型，帧间状态各自独立）和一个分析器
+    def make(interval):
+        item = face_detector.FaceDetector(tracking=detector.tracking, detect_scale=detector.detect_scale,
+                                          shared=detector)
+        item.landmark_filter = None if interval is None else LandmarkFilter(process_noise, measurement_noise)
+        item.filter_interval = interval or 1
+        analyzer = fatigue_analyzer.FatigueAnalyzer(enable_speech=False)
+        blinks = []
+        analyzer.add_listener(lambda event, t, value: blinks.append(t) if event == "blink" else None)
+        return {"detector": item, "analyzer": analyzer, "blinks": blinks, "times": [], "predicted": 0,
+                "ear_err": [], "landmark_err": []}
+
+    base = make(None)
+    configs = {interval: make(interval) for interval in intervals}
+    frames = 0
+    try:
+        while True:
+            flag, frame = cap.read()
+            if not flag or frame is None:
+                break
+            timestamp = frames / fps
+
+            results = {}
+            for key, item in [(None, base)] + list(configs.items()):
+                start = time.perf_counter()
+                result = item["detector"].detect_face(frame)
+                item["times"].append(time.perf_counter() - start)
+                f = item["detector"].landmark_filter
+                if f is not None and f.predicted:
+                    item["predicted"] += 1
+                if result[0]:
+                    item["analyzer"].update(True, result[5], result[6], result[7][1], timestamp=timestamp)
+                else:
+                    item["analyzer"].update(False, timestamp=timestamp)
+                results[key] = result
+
+            reference = results[None]
+            for interval, item in configs.items():
+                result = results[interval]
+                if reference[0] and result[0]:
+                    diff = result[1].astype(np.float64) - reference[1].astype(np.float64)
+                    item["landmark_err"].append(float(np.sqrt((diff ** 2).sum(axis=1)).mean()))
+                    item["ear_err"].append(abs(result[5] - reference[5]))
+
+            frames += 1
+            if max_frames and frames >= max_frames:
+                break
+    finally:
+        cap.release()
+
+    base_blinks = base["blinks"]
+    base_time, _ = _summary(base["times"])
+    report = {"video": video, "frames": frames, "fps": fps, "tolerance_s": tolerance,
+              "baseline_blinks": len(base_blinks),
+              "baseline_frame_ms_mean": base_time * 1000 if base_time is not None else None,
+              "intervals": {}}
+    for interval, item in configs.items():
+        matched = match_events(base_blinks, item["blinks"], tolerance)
+        ear_mean, ear_p95 = _summary(item["ear_err"])
+        landmark_mean, landmark_p95 = _summary(item["landmark_err"])
+        time_mean, time_p95 = _summary(item["times"])
+        report["intervals"][str(interval)] = {
+            "predicted_frames": item["predicted"],
+            "predictor_rate": 1.0 - item["predicted"] / frames if frames else 0.0,
+            "blinks": len(item["blinks"]),
+            "blink_recall": matched / len(base_blinks) if base_blinks else None,
+            "blink_precision": matched / len(item["blinks"]) if item["blinks"] else None,
+            "landmark_err_px_mean": landmark_mean,
+            "landmark_err_px_p95": landmark_p95,
+            "ear_abs_err_mean": ear_mean,
+            "ear_abs_err_p95": ear_p95,
+            "frame_ms_mean": time_mean * 1000 if time_mean is not None else None,
+            "frame_ms_p95": time_p95 * 1000 if time_p95 is not None else None,
+        }
+    return report
+
+
+def print_filter_report(report):
+    """以表格形式打印特征点滤波的评估结果"""
+    print(f"视频: {report['video']}  评估帧数: {report['frames']}  基准眨眼次数: {report['baseline_blinks']}  "
+          f"基准耗时: {_fmt(report['baseline_frame_ms_mean'], '%.1f')}ms")
+    print("%-8s %10s %8s %8s %8s %12s %12s %10s" % ("interval", "预测比例", "眨眼", "召回率", "精确率",
+                                                    "点误差(px)", "EAR误差", "耗时(ms)"))
+    for interval, item in report["intervals"].items():
+        print("%-8s %10.3f %8d %8s %8s %12s %12s %10s" % (
+            interval, item["predictor_rate"], item["blinks"],
+            _fmt(item["blink_recall"], "%.3f"), _fmt(item["blink_precision"], "%.3f"),
+            _fmt(item["landmark_err_px_mean"], "%.2f"),
+            _fmt(item["ear_abs_err_mean"], "%.4f"),
+            _fmt(item["frame_ms_mean"], "%.1f")))
+
+
+def _fmt(value, pattern):
+    return "-" if value is None else pattern % value
+
+
+def print_report(report):
+    """以表格形式打印报告"""
+    print(f"视频: {report['video']}  评估帧数: {report['frames']}")
+    print("%-7s %8s %6s %6s %12s %12s %12s %10s" % ("scale", "检出率", "漏检", "多检",
+                                                     "点误差(px)", "EAR误差", "MAR误差", "耗时(ms)"))
+    for scale, item in report["scales"].items():
+        print("%-7s %8.3f %6d %6d %12s %12s %12s %10s" % (
+            scale, item["detect_rate"], item["missed"], item["extra"],
+            _fmt(item["landmark_err_px_mean"], "%.2f"),
+            _fmt(item["ear_abs_err_mean"], "%.4f"),
+            _fmt(item["mar_abs_err_mean"], "%.4f"),
+            _fmt(item["frame_ms_mean"], "%.1f")))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="不同人脸检测缩放比例的精度报告")
+    parser.add_argument("video", help="视频文件路径")
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.75, 0.5, 0.33],
+                        help="需要比较的检测缩放比例")
+    parser.add_argument("--step", type=int, default=1, help="每隔多少帧取一帧")
+    parser.add_argument("--max-frames", type=int, default=0, help="最多评估的帧数，0表示不限制")
+    parser.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                        help="68点特征预测模型路径")
+    parser.add_argument("--filter-intervals", type=int, nargs="+",
+                        help="评估特征点滤波：比较这些特征点预测间隔（1为每帧预测只做平滑）下的眨眼检测")
+    parser.add_argument("--process-noise", type=float, default=1.0, help="特征点滤波的过程噪声")
+    parser.add_argument("--measurement-noise", type=float, default=1.0, help="特征点滤波的观测噪声（像素²）")
+    parser.add_argument("--blink-tolerance", type=float, default=0.2, help="眨眼事件匹配允许的时间差（秒）")
+    parser.add_argument("-o", "--output", help="JSON报告输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.filter_intervals:
+        # 隔帧外推需要跟踪模式，与实时检测的设置一致
+        detector = face_detector.FaceDetector(args.predictor, tracking=True)
+        report = evaluate_filter(args.video, detector, args.filter_intervals, args.process_noise,
+                                 args.measurement_noise, args.max_frames, args.blink_tolerance)
+        print_filter_report(report)
+    else:
+        detector = face_detector.FaceDetector(args.predictor, tracking=False)
+        report = evaluate(args.video, detector, args.scales, max(args.step, 1), args.max_frames)
+        print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
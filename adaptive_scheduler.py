@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""自适应分析帧率
+
+检出人脸且疲劳等级为normal持续ADAPTIVE_STABLE_SECONDS后，只要EAR、MAR、俯仰角
+都远离阈值、没有进行中（还不够计为一次事件）的眨眼/打哈欠/点头计数，就把分析帧率
+降到ADAPTIVE_MIN_FPS；
+任意一帧接近阈值时立即恢复全帧率并保持ADAPTIVE_HOLD_SECONDS（正常眨眼结束后
+很快再次降频），未检出人脸或疲劳等级升高时恢复全帧率并重新计算稳定时间。
+
+FatigueAnalyzer按连续帧数判断眨眼，降频期间闭眼过程的第一帧只要接近阈值就会
+恢复全帧率，后续帧按全帧率计数；因此ADAPTIVE_MIN_FPS不宜低于10，保证眼睛
+闭合过程（约100毫秒）中至少采到一帧。闭眼帧数刚好为EYE_AR_CONSEC_FRAMES的短促
+眨眼，如果降频时跳过了闭合前接近阈值的帧，少计的帧可能使这次眨眼不被计入。
+打哈欠持续数秒，远长于降频间隔，MAR只需较小的余量。
+
+俯仰角（度，低头为正）正常驾驶时在0度附近，与点头阈值HAR_THRESH相差不过几度，因此
+只有俯仰角在阈值以下ADAPTIVE_PITCH_MARGIN度以内时才算接近阈值，余量取一个降频间隔
+（0.1秒）内俯仰角变化的P95（实测约3度）。已超过阈值的帧由点头计数判断：连续帧数
+达到NOD_AR_CONSEC_FRAMES后，这次点头结束时一定会被计入，降频不影响计数。
+
+CPU_BUDGET限制检测与分析占用的CPU（单核的比例）：按进程CPU时间估计每分析一帧
+的开销，分析间隔不小于 开销/预算。预算在任何状态下都生效。
+"""
+
+import time
+import config
+import metrics
+
+# 估计每帧CPU开销的统计周期（秒）和平滑系数
+COST_WINDOW = 1.0
+COST_ALPHA = 0.3
+
+# 运行指标：当前的分析间隔和降频/恢复的次数
+_INTERVAL = metrics.gauge("analysis_interval_seconds", "自适应调度的最小分析间隔（秒）")
+_SWITCHES = metrics.counter("scheduler_mode_switches_total", "自适应调度切换分析帧率的次数", ["mode"])
+
+
+class AdaptiveScheduler:
+    """根据驾驶员状态和CPU预算决定下一帧的分析时刻"""
+
+    def __init__(self, analyzer, min_fps=None, stable_seconds=None, hold_seconds=None, ear_margin=None,
+                 mar_margin=None, pitch_margin=None, cpu_budget=None):
+        """初始化调度器
+
+        Args:
+            analyzer: 疲劳分析器实例（读取阈值、计数器和疲劳等级）
+            min_fps: 降频后的分析帧率，None表示使用配置文件中的设置（下同）
+            stable_seconds: 检出人脸且疲劳等级为normal持续多久后允许降频（秒）
+            hold_seconds: 接近阈值后保持全帧率的时间（秒）
+            ear_margin: EAR低于阈值的(1 + ear_margin)倍即视为接近闭眼
+            mar_margin: MAR高于阈值的(1 - mar_margin)倍即视为接近打哈欠
+            pitch_margin: 俯仰角在点头阈值以下不足该值（度）即视为接近点头
+            cpu_budget: 检测与分析可使用的CPU（单核的比例），0表示不限制
+        """
+        self.analyzer = analyzer
+        self.min_fps = config.ADAPTIVE_MIN_FPS if min_fps is None else min_fps
+        self.stable_seconds = config.ADAPTIVE_STABLE_SECONDS if stable_seconds is None else stable_seconds
+        self.hold_seconds = config.ADAPTIVE_HOLD_SECONDS if hold_seconds is None else hold_seconds
+        self.ear_margin = config.ADAPTIVE_EAR_MARGIN if ear_margin is None else ear_margin
+        self.mar_margin = config.ADAPTIVE_MAR_MARGIN if mar_margin is None else mar_margin
+        self.pitch_margin = config.ADAPTIVE_PITCH_MARGIN if pitch_margin is None else pitch_margin
+        self.cpu_budget = config.CPU_BUDGET if cpu_budget is None else cpu_budget
+
+        self.full_rate = True       # 当前是否全帧率分析
+        self.stable_since = None    # 本段检出人脸且等级为normal的开始时间
+        self.last_near = None       # 最近一次接近阈值的时间
+        self.interval = 0.0         # 相邻两次分析的最小间隔（秒）
+        self.next_time = 0.0        # 下一次分析的最早时刻（time.monotonic）
+        self.last_start = None      # 上一次开始取帧分析的时刻
+        self.cpu_cost = None        # 每分析一帧的CPU开销估计（秒）
+        self._cost_mark = None      # (时刻, 进程CPU时间, 已分析帧数)
+        self._frames = 0
+
+    def _steady(self, result):
+        """本帧是否检出人脸且疲劳等级为normal
+
+        Args:
+            result: detect_face的返回值
+        """
+        return bool(result[0]) and self.analyzer.get_fatigue_level() == "normal"
+
+    def _near_threshold(self, result):
+        """本帧的特征是否接近阈值（只对检出人脸的帧调用）
+
+        Args:
+            result: detect_face的返回值
+        """
+        analyzer = self.analyzer
+        # 眨眼、打哈欠或无人驾驶的连续帧计数进行中
+        if analyzer.COUNTER or analyzer.mCOUNTER or analyzer.oCOUNTER:
+            return True
+        # 点头的连续帧数还不够计为一次点头，需要逐帧计数
+        if 0 < analyzer.hCOUNTER < analyzer.NOD_AR_CONSEC_FRAMES:
+            return True
+        ear, mar, pose = result[5], result[6], result[7]
+        if ear < analyzer.EYE_AR_THRESH * (1 + self.ear_margin):
+            return True
+        if mar > analyzer.MAR_THRESH * (1 - self.mar_margin):
+            return True
+        # 俯仰角从下方接近点头阈值（超过阈值的帧已由点头计数判断）
+        pitch = pose[1][0, 0]
+        return analyzer.HAR_THRESH - self.pitch_margin < pitch <= analyzer.HAR_THRESH
+
+    def _update_cost(self, now):
+        """按统计周期更新每帧CPU开销的估计"""
+        cpu = time.process_time()
+        if self._cost_mark is None:
+            self._cost_mark = (now, cpu, self._frames)
+            return
+        mark_time, mark_cpu, mark_frames = self._cost_mark
+        frames = self._frames - mark_frames
+        if now - mark_time < COST_WINDOW or frames <= 0:
+            return
+        cost = (cpu - mark_cpu) / frames
+        self.cpu_cost = cost if self.cpu_cost is None else self.cpu_cost + COST_ALPHA * (cost - self.cpu_cost)
+        self._cost_mark = (now, cpu, self._frames)
+
+    def observe(self, result, now=None):
+        """分析完一帧后调用，更新降频状态和下一次分析的时刻
+
+        Args:
+            result: detect_face的返回值（应在analyzer.update和tick之后调用）
+            now: 当前时刻，None表示time.monotonic()
+
+        Returns:
+            float: 相邻两次分析的最小间隔（秒）
+        """
+        now = time.monotonic() if now is None else now
+        self._frames += 1
+        if self.cpu_budget > 0:
+            self._update_cost(now)
+
+        if not self._steady(result):
+            self.stable_since = None
+            full_rate = True
+        else:
+            if self.stable_since is None:
+                self.stable_since = now
+            if self._near_threshold(result):
+                self.last_near = now
+            full_rate = (now - self.stable_since < self.stable_seconds
+                         or (self.last_near is not None and now - self.last_near < self.hold_seconds))
+        if full_rate != self.full_rate:
+            self.full_rate = full_rate
+            _SWITCHES.labels("full" if full_rate else "reduced").inc()
+
+        interval = 0.0 if full_rate else 1.0 / self.min_fps
+        if self.cpu_budget > 0 and self.cpu_cost is not None:
+            interval = max(interval, self.cpu_cost / self.cpu_budget)
+        self.interval = interval
+        _INTERVAL.set(interval)
+        # 间隔从本帧开始分析（wait返回）的时刻算起
+        self.next_time = (now if self.last_start is None else self.last_start) + interval
+        return interval
+
+    def delay(self, now=None):
+        """距离下一次分析还需等待的时间（秒）"""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.next_time - now)
+
+    def wait(self):
+        """等待到下一次分析的时刻，在取下一帧之前调用"""
+        delay = self.delay()
+        if delay > 0:
+            time.sleep(delay)
+        self.last_start = time.monotonic()
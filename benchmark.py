@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""检测流水线分阶段基准测试
+
+回放录制好的视频帧（或合成帧），分别计时检测流水线的各个阶段：视频解码、
+灰度转换、HOG人脸检测、68点特征预测、头部姿态估计、EAR/MAR计算、特征绘制、
+信息框叠加和显示转换，以及完整的detect_face。每个阶段输出P50/P95/P99延迟和
+吞吐量，并以JSON保存，用于比较不同版本和硬件。
+
+用法:
+    python benchmark.py video.mp4 --frames 300 --repeat 3 -o bench.json
+    python benchmark.py --synthetic --width 640 --height 480 -o bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import cv2
+import dlib
+import numpy as np
+from imutils import face_utils
+import config
+import face_detector
+import fatigue_analyzer
+import frame_renderer
+import landmark_features
+
+# 各阶段的输出顺序
+STAGES = ["decode", "cvtColor", "hog_detect", "shape_predictor", "roi_predictor", "shape_to_np",
+          "shape_to_np_imutils", "head_pose", "head_pose_full", "ear_mar", "ear_mar_scalar", "draw_face_features", "overlay", "display_convert",
+          "detect_face"]
+
+
+def load_frames(video, max_frames):
+    """读取视频帧到内存，同时记录每帧的解码耗时
+
+    Returns:
+        tuple: (帧列表, 解码耗时列表(秒))
+    """
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video}")
+    frames, times = [], []
+    try:
+        while not max_frames or len(frames) < max_frames:
+            start = time.perf_counter()
+            flag, frame = cap.read()
+            elapsed = time.perf_counter() - start
+            if not flag or frame is None:
+                break
+            frames.append(frame)
+            times.append(elapsed)
+    finally:
+        cap.release()
+    return frames, times
+
+
+def synthetic_frames(count, width, height, seed=0):
+    """生成合成帧（平滑渐变加噪声，HOG检测在其上的耗时与真实画面同量级）"""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(0, 255, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    frames = []
+    for i in range(count):
+        noise = rng.normal(0, 20, (height, width, 3)).astype(np.float32)
+        frame = np.clip(base + noise + (i % 32), 0, 255).astype(np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def summarize(times):
+    """计算延迟分位数和吞吐量
+
+    Args:
+        times: 每次调用的耗时列表(秒)
+
+    Returns:
+        dict: 各项统计，没有数据时返回None
+    """
+    if len(times) == 0:
+        return None
+    values = np.asarray(times, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    total = values.sum()
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(values.max()),
+        "throughput_per_s": float(values.size / total * 1000.0) if total > 0 else None,
+    }
+
+
+def _timed(times, func, *args):
+    """调用func并把耗时追加到times，返回func的返回值"""
+    start = time.perf_counter()
+    result = func(*args)
+    times.append(time.perf_counter() - start)
+    return result
+
+
+def run_benchmark(frames, detector, repeat=1, warmup=5, display_size=(640, 480)):
+    """对各阶段计时
+
+    Args:
+        frames: 视频帧列表
+        detector: 人脸检测器实例（会关闭跟踪，保证每帧都进行全图检测）
+        repeat: 帧序列回放的次数
+        warmup: 开始计时前预热的帧数
+        display_size: 显示转换的目标尺寸(宽, 高)
+
+    Returns:
+        tuple: ({阶段名: 耗时列表}, 检出人脸的帧数)
+    """
+    detector.tracking = False
+    detector.reset_tracking()
+    renderer = frame_renderer.FrameRenderer(detector, present=None)
+    status = fatigue_analyzer.FatigueAnalyzer(enable_speech=False).get_status_info()
+    times = {stage: [] for stage in STAGES}
+    hits = 0
+
+    for frame in frames[:warmup]:
+        detector.detect_face(frame)
+
+    for _ in range(repeat):
+        for frame in frames:
+            gray = _timed(times["cvtColor"], cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+            faces = _timed(times["hog_detect"], detector._detect_faces, gray)
+            if faces:
+                hits += 1
+                face = faces[0]
+            else:
+                # 没有检出人脸时用画面中央的框，使后续阶段在每帧上都有数据
+                h, w = gray.shape
+                size = min(w, h) // 2
+                face = dlib.rectangle((w - size) // 2, (h - size) // 2, (w + size) // 2, (h + size) // 2)
+
+            start = time.perf_counter()
+            raw = detector.predictor(gray, face)
+            shape = face_detector.shape_to_np(raw)
+            times["shape_predictor"].append(time.perf_counter() - start)
+
+            # 特征点转换为数组：当前实现与imutils逐行写入的版本对比
+            _timed(times["shape_to_np"], face_detector.shape_to_np, raw)
+            _timed(times["shape_to_np_imutils"], face_utils.shape_to_np, raw)
+
+            # ROI模式：裁剪人脸附近区域转灰度后预测特征点（对比cvtColor + shape_predictor）
+            start = time.perf_counter()
+            roi, (x0, y0) = detector._roi_gray(frame, face)
+            if roi is not None:
+                local = dlib.rectangle(face.left() - x0, face.top() - y0, face.right() - x0, face.bottom() - y0)
+                face_detector.shape_to_np(detector.predictor(roi, local), (x0, y0))
+                times["roi_predictor"].append(time.perf_counter() - start)
+
+            _timed(times["head_pose"], detector.get_head_pose, shape)
+            _timed(times["head_pose_full"], detector._get_head_pose_full, shape)
+            _timed(times["ear_mar"], landmark_features.frame_features, shape)
+
+            leftEye = shape[detector.lStart:detector.lEnd]
+            rightEye = shape[detector.rStart:detector.rEnd]
+            mouth = shape[detector.mStart:detector.mEnd]
+            # 逐个计算的标量版本，用于与向量化版本对比
+            _timed(times["ear_mar_scalar"], lambda: (detector.eye_aspect_ratio(leftEye),
+                                                     detector.eye_aspect_ratio(rightEye),
+                                                     detector.mouth_aspect_ratio(mouth)))
+
+            # 绘制会修改帧，在副本上进行（复制不计入耗时）
+            canvas = frame.copy()
+            _timed(times["draw_face_features"], detector.draw_face_features, canvas, shape, leftEye, rightEye, mouth)
+            _timed(times["overlay"], renderer.annotate, canvas, None, status, 0.0)
+            _timed(times["display_convert"], renderer.to_display, canvas, display_size[0], display_size[1])
+
+            # 完整单帧检测（与界面中的串行模式相同的调用）
+            detector.reset_pose()
+            _timed(times["detect_face"], detector.detect_face, frame)
+
+    return times, hits
+
+
+def environment_info(detector, frames):
+    """记录运行环境，便于比较不同机器和版本的结果"""
+    height, width = frames[0].shape[:2] if frames else (0, 0)
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "dlib": getattr(dlib, "__version__", None),
+        "numpy": np.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+        "frame_size": [width, height],
+        "detect_scale": detector.detect_scale,
+        "pose_fast": detector.pose_fast,
+    }
+
+
+def print_report(report):
+    """以表格形式打印报告"""
+    print(f"来源: {report['source']}  帧数: {report['frames']}  回放次数: {report['repeat']}  "
+          f"检出率: {report['detect_rate']:.3f}")
+    print("%-20s %8s %9s %9s %9s %12s" % ("stage", "count", "p50(ms)", "p95(ms)", "p99(ms)", "throughput/s"))
+    for stage, item in report["stages"].items():
+        if item is None:
+            continue
+        print("%-20s %8d %9.3f %9.3f %9.3f %12.1f" % (stage, item["count"], item["p50_ms"], item["p95_ms"],
+                                                     item["p99_ms"], item["throughput_per_s"] or 0.0))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检测流水线分阶段基准测试")
+    parser.add_argument("video", nargs="?", help="视频文件路径（不指定时需使用--synthetic）")
+    parser.add_argument("--synthetic", action="store_true", help="使用合成帧代替视频")
+    parser.add_argument("--width", type=int, default=640, help="合成帧宽度")
+    parser.add_argument("--height", type=int, default=480, help="合成帧高度")
+    parser.add_argument("--frames", type=int, default=300, help="最多使用的帧数")
+    parser.add_argument("--repeat", type=int, default=1, help="帧序列回放的次数")
+    parser.add_argument("--warmup", type=int, default=5, help="预热帧数")
+    parser.add_argument("--detect-scale", type=float, help="人脸检测缩放比例，默认使用配置文件中的DETECT_SCALE")
+    parser.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                        help="68点特征预测模型路径")
+    parser.add_argument("--label", default="", help="本次结果的标签（如版本号或机器名）")
+    parser.add_argument("-o", "--output", help="JSON结果输出路径")
+    args = parser.parse_args(argv)
+    if not args.video and not args.synthetic:
+        parser.error("需要指定视频文件或--synthetic")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.video:
+        frames, decode_times = load_frames(args.video, args.frames)
+        source = args.video
+    else:
+        frames, decode_times = synthetic_frames(args.frames, args.width, args.height), []
+        source = f"synthetic {args.width}x{args.height}"
+    if not frames:
+        raise SystemExit("没有可用的视频帧")
+
+    detector = face_detector.FaceDetector(args.predictor, tracking=False, detect_scale=args.detect_scale)
+    times, hits = run_benchmark(frames, detector, max(args.repeat, 1), args.warmup)
+    times["decode"] = decode_times
+
+    runs = len(frames) * max(args.repeat, 1)
+    report = {
+        "label": args.label,
+        "source": source,
+        "frames": len(frames),
+        "repeat": max(args.repeat, 1),
+        "detect_rate": hits / runs,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment_info(detector, frames),
+        "config": {"display_fps": config.DISPLAY_FPS, "tracking_enabled": config.TRACKING_ENABLED},
+        "stages": {stage: summarize(times[stage]) for stage in STAGES},
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""视频采集线程
+
+采集线程持续读取视频源，只保留最新一帧及其采集时刻：检测比摄像头慢时，旧帧
+直接被新帧覆盖（计入丢帧数），不会在驱动缓冲区中排队，分析的始终是最新的画面。
+调用方处理完一帧后调用record_decision()，记录从采集到做出判断的延迟。
+
+视频文件不丢帧：采集线程等待上一帧被取走后再读下一帧，并使用视频中的时间戳。
+"""
+
+import os
+import time
+import threading
+import cv2
+import metrics
+
+# 运行指标（按视频源区分）
+_FRAMES_CAPTURED = metrics.counter("frames_captured_total", "采集到的视频帧数", ["stream"])
+_FRAMES_DROPPED = metrics.counter("frames_dropped_total", "未完成分析的视频帧数（按原因）", ["stream", "reason"])
+_RECONNECTS = metrics.counter("camera_reconnects_total", "摄像头重新连接的次数", ["stream"])
+_DECISION_LATENCY = metrics.histogram("capture_to_decision_seconds", "从采集到完成分析的延迟（秒）", ["stream"],
+                                      buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+
+class FrameCapture:
+    """只保留最新一帧的视频采集线程"""
+
+    def __init__(self, source, api=None, name=None, width=None, height=None, sequential=None,
+                 max_reconnects=None, reconnect_delay=1.0, status_callback=None):
+        """初始化并打开视频源（调用start()后开始采集）
+
+        Args:
+            source: 摄像头编号、视频文件路径或网络流地址
+            api: cv2.VideoCapture的后端（如cv2.CAP_DSHOW），None表示自动选择
+            name: 视频源名称（用于指标标签），None表示使用source
+            width: 期望的画面宽度，None表示不设置
+            height: 期望的画面高度，None表示不设置
+            sequential: 是否逐帧交付（不丢帧），None表示视频文件逐帧交付、实时视频只保留最新帧
+            max_reconnects: 读取失败后连续重连失败多少次放弃，None表示一直重试
+            reconnect_delay: 两次重连之间的等待时间（秒）
+            status_callback: 状态文本回调（如重新连接提示），None表示打印到控制台
+        """
+        self.source = int(source) if str(source).isdigit() else source
+        self.api = api
+        self.name = name or str(source)
+        self.width = width
+        self.height = height
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.sequential = self.is_file if sequential is None else sequential
+        self.max_reconnects = max_reconnects
+        self.reconnect_delay = reconnect_delay
+        self.status_callback = status_callback or (lambda text: print(text, end=""))
+
+        self.cond = threading.Condition()
+        self.latest = None      # (视频帧, 时间戳, 采集时刻)
+        self.captured = 0       # 采集到的帧数
+        self.dropped = 0        # 未被取走就被新帧覆盖的帧数
+        self.reconnects = 0     # 重新连接的次数
+        self.last_latency = None  # 最近一帧从采集到完成分析的延迟（秒）
+        self.running = False
+        self.finished = False
+        self.thread = None
+
+        self._captured = _FRAMES_CAPTURED.labels(self.name)
+        self._dropped = _FRAMES_DROPPED.labels(self.name, "replaced")
+        self._reconnects = _RECONNECTS.labels(self.name)
+        self._latency = _DECISION_LATENCY.labels(self.name)
+
+        self.cap = self._open()
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+
+    def _open(self):
+        """打开视频源并设置分辨率"""
+        if self.api is None:
+            cap = cv2.VideoCapture(self.source)
+        else:
+            cap = cv2.VideoCapture(self.source, self.api)
+        if self.width:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        if not self.is_file:
+            # 驱动缓冲区只保留一帧（部分后端不支持，设置失败时忽略）
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def is_opened(self):
+        """视频源是否已打开"""
+        return self.cap is not None and self.cap.isOpened()
+
+    def start(self):
+        """启动采集线程"""
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _reconnect(self):
+        """读取失败后重新连接视频源
+
+        Returns:
+            bool: 是否重新连接成功
+        """
+        failures = 0
+        while self.running:
+            self.reconnects += 1
+            self._reconnects.inc()
+            self.cap.release()
+            self.cap = self._open()
+            if self.cap.isOpened():
+                return True
+            failures += 1
+            if self.max_reconnects is not None and failures >= self.max_reconnects:
+                self.status_callback(u"重新连接摄像头失败\n")
+                return False
+            time.sleep(self.reconnect_delay)
+        return False
+
+    def _run(self):
+        """采集线程主循环"""
+        index = 0
+        try:
+            while self.running:
+                try:
+                    flag, frame = self.cap.read()
+                except Exception as e:
+                    metrics.ERRORS.labels("capture").inc()
+                    print(f"视频帧读取错误: {str(e)}")
+                    flag, frame = False, None
+                capture_time = time.monotonic()
+
+                if not flag or frame is None:
+                    if self.is_file or not self.running:
+                        break
+                    self.status_callback(u"视频帧获取失败，尝试重新连接...\n")
+                    if not self._reconnect():
+                        break
+                    continue
+
+                # 视频文件使用帧时间戳，实时视频使用采集时刻
+                if self.fps and self.fps > 0:
+                    timestamp = index / self.fps
+                else:
+                    timestamp = capture_time
+                index += 1
+                self.captured += 1
+                self._captured.inc()
+
+                with self.cond:
+                    if self.sequential:
+                        # 逐帧交付：等待上一帧被取走
+                        while self.latest is not None and self.running:
+                            self.cond.wait(0.1)
+                    elif self.latest is not None:
+                        self.dropped += 1
+                        self._dropped.inc()
+                    self.latest = (frame, timestamp, capture_time)
+                    self.cond.notify_all()
+        finally:
+            self.cap.release()
+            with self.cond:
+                self.finished = True
+                self.cond.notify_all()
+
+    def take(self):
+        """取走最新一帧（不等待）
+
+        Returns:
+            tuple: (视频帧, 时间戳, 采集时刻)，没有新帧时返回None
+        """
+        with self.cond:
+            item, self.latest = self.latest, None
+            if item is not None:
+                self.cond.notify_all()
+            return item
+
+    def read(self, timeout=None):
+        """等待并取走下一帧
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            tuple: (视频帧, 时间戳, 采集时刻)，采集已结束或等待超时时返回None
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.latest is not None or self.finished or not self.running,
+                                      timeout):
+                return None
+            item, self.latest = self.latest, None
+            self.cond.notify_all()
+            return item
+
+    def frames(self):
+        """依次取出采集到的帧，直到采集结束或被停止
+
+        Yields:
+            tuple: (视频帧, 时间戳, 采集时刻)
+        """
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def done(self):
+        """采集已结束且没有未取走的帧"""
+        return self.finished and self.latest is None
+
+    def record_decision(self, capture_time, now=None):
+        """记录一帧从采集到完成分析的延迟
+
+        Args:
+            capture_time: 该帧的采集时刻（time.monotonic）
+            now: 完成分析的时刻，None表示当前时刻
+
+        Returns:
+            float: 延迟（秒）
+        """
+        latency = (time.monotonic() if now is None else now) - capture_time
+        self.last_latency = latency
+        self._latency.observe(latency)
+        return latency
+
+    def stop(self, timeout=2.0):
+        """停止采集线程并释放视频源"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        elif self.cap is not None:
+            # 未启动过采集线程，直接释放
+            self.cap.release()
+            self.finished = True
@@ -26,6 +26,101 @@ MOUTH_AR_CONSEC_FRAMES = 3
 HAR_THRESH = 0.3
 NOD_AR_CONSEC_FRAMES = 5
 
+# 显示配置：视频画面的渲染帧率，与分析帧率无关；0表示不显示视频画面
+DISPLAY_FPS = 15
+
+# 人脸检测缩放比例：在缩小后的灰度图上运行HOG检测，再将人脸框映射回原图
+# 注意HOG检测器能检出的最小人脸约为80像素，缩放后人脸需仍大于该尺寸
+DETECT_SCALE = 1.0
+
+# 人脸跟踪配置（先跟踪后检测，减少全图HOG检测次数）
+TRACKING_ENABLED = True
+TRACK_METHOD = "correlation"  # "correlation"相关滤波跟踪器，"landmarks"由上一帧特征点推算人脸框
+DETECT_INTERVAL = 15   # 最多连续跟踪多少帧后强制进行一次全图检测
+TRACK_MIN_PSR = 7.0    # 相关滤波跟踪器的最小峰值旁瓣比，低于此值认为跟踪丢失
+TRACK_MIN_IOU = 0.5    # 相邻两帧特征点外接框的最小交并比，低于此值认为跟踪丢失
+
+# ROI模式：跟踪帧由上一帧特征点推算人脸框，只在其附近的裁剪区域上转灰度和预测特征点（需开启跟踪，
+# 不使用TRACK_METHOD指定的相关滤波跟踪器）
+ROI_MODE = False
+ROI_PADDING = 0.5      # 裁剪区域在人脸框四周各扩展的比例（相对人脸框宽高）
+
+# 特征点滤波：匀速卡尔曼滤波平滑68个特征点，减少EAR在阈值附近的抖动；并可隔帧运行特征点预测，
+# 其余帧由滤波器外推（外推需开启跟踪，对眨眼检测的影响用accuracy_report.py --filter-intervals评估）
+LANDMARK_FILTER = False
+LANDMARK_FILTER_INTERVAL = 1       # 每隔几帧运行一次特征点预测：1为每帧，2为半帧率，3为三分之一帧率
+LANDMARK_PROCESS_NOISE = 1.0       # 过程噪声，越大越跟随观测
+LANDMARK_MEASUREMENT_NOISE = 1.0   # 观测噪声（像素²），越大越平滑
+
+# 多进程流水线配置：检测工作进程数，0表示在采集线程中串行处理
+# 流水线模式下工作进程每帧都进行全图检测（不使用跟踪）
+PIPELINE_WORKERS = 0
+# 检测任务的超时（秒）：工作进程异常退出时任务会丢失，超时后该帧按检测失败处理，不再等待
+PIPELINE_TASK_TIMEOUT = 30
+
+# 自适应分析帧率：驾驶员状态稳定且疲劳等级为normal时降低分析帧率，接近阈值或等级升高时立即恢复全帧率
+ADAPTIVE_RATE = False          # 是否启用自适应分析帧率
+ADAPTIVE_MIN_FPS = 10          # 降频后的分析帧率（不宜低于10，否则可能漏掉短促的眨眼）
+ADAPTIVE_STABLE_SECONDS = 10   # 检出人脸且疲劳等级为normal持续多久后允许降频（秒）
+ADAPTIVE_HOLD_SECONDS = 1.0    # 特征接近阈值后保持全帧率的时间（秒）
+ADAPTIVE_EAR_MARGIN = 0.25     # EAR低于阈值的1.25倍即视为接近闭眼
+ADAPTIVE_MAR_MARGIN = 0.1      # MAR高于阈值的0.9倍即视为接近打哈欠（闭嘴时MAR约0.4-0.45）
+ADAPTIVE_PITCH_MARGIN = 3.0    # 俯仰角在点头阈值以下3度以内即视为接近点头（0.1秒内俯仰角变化的P95约3度）
+CPU_BUDGET = 0                 # 检测与分析可使用的CPU（单核的比例，如0.5），0表示不限制
+
+# 频率统计配置
+FREQ_WINDOW = 5        # 眨眼/打哈欠/点头频率的统计窗口（秒）
+SCORE_INTERVAL = 5.5   # 疲劳评分的更新间隔（秒），也是事件计入评分的最大延迟
+ALERT_INTERVAL = 3     # 疲劳警报的检查间隔（秒）
+
+# 驾驶员基线标定：开始检测后在线估计该驾驶员睁眼EAR和闭嘴MAR的分布，据此设置本次行程的阈值
+CALIBRATION_ENABLED = False
+CALIBRATION_SECONDS = 30          # 标定时长（从第一帧检出人脸开始，秒）
+CALIBRATION_MIN_FRAMES = 300      # 标定所需的最少人脸帧数
+CALIBRATION_EAR_RATIO = 0.7       # EAR阈值 = 睁眼EAR中位数 × 该比例
+CALIBRATION_MAR_QUANTILE = 0.9    # 闭嘴MAR取该分位数（包含说话时的嘴部动作）
+CALIBRATION_MAR_MARGIN = 0.15     # MAR阈值 = 闭嘴MAR分位数 + 该值
+EAR_THRESH_RANGE = (0.12, 0.3)    # 标定得到的EAR阈值范围
+MAR_THRESH_RANGE = (0.4, 0.8)     # 标定得到的MAR阈值范围
+
+# 逐帧历史配置：保存最近若干帧的EAR/MAR/俯仰角，用于趋势查询
+HISTORY_CAPACITY = 36000  # 最多保存的帧数（30fps约20分钟），内存占用固定
+PERCLOS_WINDOW = 60       # PERCLOS和平均EAR的统计窗口（秒）
+
+# 语音播报配置
+SPEECH_QUEUE_SIZE = 8  # 语音播报队列容量
+SPEECH_COOLDOWN = {    # 各消息的冷却时间（秒），冷却期内相同消息不再播报
+    "fatigue_mild": 30,
+    "fatigue_moderate": 15,
+    "fatigue_severe": 6,
+}
+
+# 多路视频配置
+STREAM_MAX_IN_FLIGHT = 2   # 每路视频同时在处理中的最大帧数（保证各路公平分享工作进程）
+FACE_MATCH_MAX_DIST = 0.5  # 相邻帧人脸匹配的最大中心距离（相对人脸宽度）
+FACE_TRACK_TTL = 30        # 人脸连续多少帧未出现后移除其分析器
+
+# 本机检测服务配置：多个程序通过Unix套接字共用一份人脸检测模型
+DETECTOR_SOCKET = "/tmp/fatigue_detector.sock"  # 检测服务的套接字路径
+USE_DETECTOR_SERVICE = False  # 主程序是否使用检测服务（True时不在本进程加载模型）
+
+# 会话事件日志配置：事件以定长二进制记录追加写入，供车队统计批量扫描
+SESSION_LOG_DIR = "./sessions"    # 日志目录，空字符串表示不记录
+SESSION_LOG_FLUSH_INTERVAL = 1.0  # 后台线程批量写入的间隔（秒）
+SESSION_LOG_FSYNC_INTERVAL = 10   # fsync间隔（秒），即断电时最多丢失的时长
+SESSION_LOG_MAX_PENDING = 65536   # 待写入记录上限，磁盘阻塞时超出的记录丢弃
+VEHICLE_ID = ""  # 车辆编号（写入日志文件头，最多16字节）
+ROUTE_ID = ""    # 线路编号
+DRIVER_ID = ""   # 驾驶员编号
+
+# 特征点缓存目录（按视频内容哈希保存检测结果，用于调参时回放）
+LANDMARK_CACHE_DIR = "./landmark_cache"
+
+# 运行指标导出配置（Prometheus文本格式）
+METRICS_HTTP_PORT = 0         # 本机HTTP端点端口（http://127.0.0.1:端口/metrics），0表示不启用
+METRICS_TEXTFILE = ""         # 定期写入的指标文件路径，空字符串表示不写文件
+METRICS_EXPORT_INTERVAL = 10  # 写指标文件的间隔（秒）
+
 # 疲劳程度阈值
 FATIGUE_THRESH_MILD = 30
 FATIGUE_THRESH_MODERATE = 55
@@ -56,6 +151,10 @@ K = [6.5308391993466671e+002, 0.0, 3.1950000000000000e+002,
 # 图像中心坐标系(uv)：相机畸变参数[k1, k2, p1, p2, k3]
 D = [7.0834633684407095e-002, 6.9140193737175351e-002, 0.0, 0.0, -1.3073460323689292e+000]
 
+# 快速姿态估计：以上一帧的外参作为solvePnP初值，欧拉角由旋转矩阵闭式求解，
+# 重投影立方体仅在需要绘制时计算
+POSE_FAST = True
+
 # 重新投影3D点的世界坐标轴以验证结果姿势
 REPROJECTSRC = np.float32([[10.0, 10.0, 10.0],
                            [10.0, 10.0, -10.0],
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""本机人脸检测服务
+
+同一台设备上的多个程序（驾驶员监测界面、录像、离线分析工具等）各自创建
+FaceDetector时，每个进程都要加载一份约100MB的68点特征点模型。检测服务在一个
+进程中持有HOG检测器和特征点模型，通过Unix套接字为多个客户端提供特征点和头部
+姿态检测：
+
+- 视频帧放在客户端创建的共享内存中，请求里只传共享内存的名字和帧的形状，服务端
+  直接在共享内存上做灰度转换，帧数据不经过套接字；
+- 每个客户端连接对应服务端的一个FaceDetector（与共享的模型共用，见FaceDetector的
+  shared参数），跟踪和姿态估计的帧间状态按连接各自保存；
+- 请求和应答为4字节长度前缀的JSON，只包含特征点、纵横比和姿态等少量数据。
+
+DetectorClient提供与FaceDetector相同的detect_face/detect_faces/reset_tracking/
+reset_pose接口，可以直接替换FaceDetector使用。
+
+启动服务：
+    python detector_service.py --predictor ./model/shape_predictor_68_face_landmarks.dat
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import config
+import landmark_features
+import metrics
+
+PROTOCOL_VERSION = 1
+
+# 消息长度前缀（网络字节序的无符号32位整数）
+_HEADER = struct.Struct("!I")
+
+# 运行指标：请求数、处理耗时和当前连接的客户端数
+_REQUESTS = metrics.counter("detector_service_requests_total", "检测服务处理的请求数", ["op"])
+_REQUEST_SECONDS = metrics.histogram("detector_service_request_seconds", "检测服务处理请求的耗时（秒）", ["op"])
+_CLIENTS = metrics.gauge("detector_service_clients", "检测服务当前连接的客户端数")
+
+
+def _send(sock, message):
+    """发送一条JSON消息"""
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock, size):
+    """接收恰好size字节，连接关闭时返回None"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return buffer
+
+
+def _recv(sock):
+    """接收一条JSON消息，连接关闭时返回None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode("utf-8"))
+
+
+def _attach(name):
+    """打开客户端创建的共享内存（不登记到本进程的resource_tracker，退出时不会删除它）"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python 3.13之前没有track参数
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _encode_face(box, features):
+    """把一个人脸的检测结果编码为JSON对象"""
+    shape, _, _, _, ear, mar, (reprojectdst, euler_angle) = features
+    return {
+        "box": box,
+        "shape": shape.tolist(),
+        "ear": float(ear),
+        "mar": float(mar),
+        "euler": np.asarray(euler_angle, dtype=np.float64).ravel().tolist(),
+        "cube": None if reprojectdst is None else [list(map(float, p)) for p in reprojectdst],
+    }
+
+
+def _decode_face(face):
+    """把JSON对象还原为与FaceDetector相同的结果元组（不含是否检出的标志）"""
+    shape = np.array(face["shape"], dtype=int)
+    cube = None if face["cube"] is None else tuple(map(tuple, face["cube"]))
+    euler_angle = np.array(face["euler"], dtype=np.float64).reshape(3, 1)
+    return (shape, shape[landmark_features.LEFT_EYE], shape[landmark_features.RIGHT_EYE],
+            shape[landmark_features.MOUTH], face["ear"], face["mar"], (cube, euler_angle))
+
+
+class DetectorService:
+    """持有人脸检测模型、为多个客户端提供检测的服务"""
+
+    def __init__(self, socket_path=None, predictor_path="./model/shape_predictor_68_face_landmarks.dat",
+                 detect_scale=None):
+        """加载模型并创建监听套接字（调用serve_forever()或start()后开始服务）
+
+        Args:
+            socket_path: Unix套接字路径，None表示使用配置文件中的DETECTOR_SOCKET
+            predictor_path: 68点特征预测模型路径
+            detect_scale: 默认的人脸检测缩放比例，None表示使用配置文件中的设置
+        """
+        import face_detector
+        self.face_detector = face_detector
+        self.socket_path = socket_path or config.DETECTOR_SOCKET
+        # 所有连接共用的模型
+        self.models = face_detector.FaceDetector(predictor_path, tracking=False, detect_scale=detect_scale)
+        # dlib检测期间不释放GIL，串行调用不损失吞吐，加锁保证共享的模型不会被并发调用
+        self._model_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._clients = 0
+        self._clients_lock = threading.Lock()
+        _CLIENTS.set_function(lambda: self._clients)
+        self.sock = self._listen()
+
+    def _listen(self):
+        """创建监听套接字，清理上次异常退出残留的套接字文件"""
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"检测服务已在运行: {self.socket_path}")
+            finally:
+                probe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.socket_path)
+        sock.listen()
+        return sock
+
+    def start(self):
+        """在后台线程中提供服务，返回self"""
+        self._thread = threading.Thread(target=self.serve_forever, name="detector-service", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """接受客户端连接，每个连接一个处理线程，直到stop()"""
+        while not self._stopped.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_client, args=(conn,), name="detector-client", daemon=True).start()
+
+    def stop(self):
+        """停止接受新连接并删除套接字文件"""
+        self._stopped.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _serve_client(self, conn):
+        """处理一个客户端连接上的请求"""
+        session = {"detector": None, "shm": None}
+        with self._clients_lock:
+            self._clients += 1
+        try:
+            while True:
+                request = _recv(conn)
+                if request is None:
+                    break
+                op = request.get("op")
+                start = time.perf_counter()
+                try:
+                    reply = self._handle(session, request)
+                except Exception as e:
+                    metrics.ERRORS.labels("detector_service").inc()
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                _REQUESTS.labels(str(op)).inc()
+                _REQUEST_SECONDS.labels(str(op)).observe(time.perf_counter() - start)
+                _send(conn, reply)
+        except OSError as e:
+            print(f"检测服务连接错误: {str(e)}")
+        finally:
+            if session["shm"] is not None:
+                session["shm"].close()
+            conn.close()
+            with self._clients_lock:
+                self._clients -= 1
+
+    def _handle(self, session, request):
+        """处理一个请求，返回应答"""
+        op = request.get("op")
+        if op == "hello":
+            detect_scale = request.get("detect_scale")
+            session["detector"] = self.face_detector.FaceDetector(
+                tracking=request.get("tracking"),
+                detect_scale=self.models.detect_scale if detect_scale is None else detect_scale,
+                shared=self.models)
+            return {"ok": True, "version": PROTOCOL_VERSION, "predictor_path": self.models.predictor_path,
+                    "detect_scale": session["detector"].detect_scale, "tracking": session["detector"].tracking}
+
+        detector = session["detector"]
+        if detector is None:
+            raise RuntimeError("请先发送hello请求")
+
+        if op == "reset":
+            if request.get("tracking", True):
+                detector.reset_tracking()
+            if request.get("pose", True):
+                detector.reset_pose()
+            return {"ok": True}
+
+        if op in ("detect_face", "detect_faces"):
+            # 客户端换用新的共享内存时关闭旧的映射
+            shm = session["shm"]
+            if shm is None or shm.name != request["shm"]:
+                if shm is not None:
+                    shm.close()
+                    session["shm"] = None
+                shm = session["shm"] = _attach(request["shm"])
+            frame = np.ndarray(request["shape"], dtype=np.dtype(request["dtype"]), buffer=shm.buf)
+            try:
+                with self._model_lock:
+                    if op == "detect_face":
+                        result = detector.detect_face(frame)
+                        faces = [_encode_face(None, result[1:])] if result[0] else []
+                    else:
+                        faces = [_encode_face(list(map(int, face[0])), face[1:])
+                                 for face in detector.detect_faces(frame)]
+            finally:
+                # 关闭共享内存前不能保留指向它的数组
+                del frame
+            return {"ok": True, "faces": faces}
+
+        raise ValueError(f"未知的请求: {op}")
+
+
+class DetectorClient:
+    """检测服务的客户端，接口与FaceDetector相同"""
+
+    def __init__(self, socket_path=None, tracking=None, detect_scale=None, timeout=None):
+        """连接检测服务
+
+        Args:
+            socket_path: Unix套接字路径，None表示使用配置文件中的DETECTOR_SOCKET
+            tracking: 是否启用跟踪模式，None表示使用服务端配置文件中的设置
+            detect_scale: 人脸检测缩放比例，None表示使用服务的默认值
+            timeout: 请求超时时间（秒），None表示不超时
+        """
+        self.socket_path = socket_path or config.DETECTOR_SOCKET
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.socket_path)
+        self._lock = threading.Lock()
+        self._shm = None    # 本客户端的帧缓冲区（共享内存）
+        self._frame = None  # 帧缓冲区上的数组
+
+        reply = self._request({"op": "hello", "tracking": tracking, "detect_scale": detect_scale})
+        self.predictor_path = reply["predictor_path"]
+        self.detect_scale = reply["detect_scale"]
+        self.tracking = reply["tracking"]
+
+    def _request(self, message):
+        """发送请求并等待应答"""
+        with self._lock:
+            _send(self.sock, message)
+            reply = _recv(self.sock)
+        if reply is None:
+            raise ConnectionError("检测服务已断开连接")
+        if not reply["ok"]:
+            raise RuntimeError(f"检测服务错误: {reply['error']}")
+        return reply
+
+    def frame_buffer(self, shape, dtype=np.uint8):
+        """返回共享内存上的帧缓冲区，直接写入其中的帧提交检测时不需要复制
+
+        例如 capture.read(client.frame_buffer((480, 640, 3)))
+
+        Args:
+            shape: 帧的形状
+            dtype: 帧的数据类型
+
+        Returns:
+            ndarray: 共享内存上的数组，形状或类型变化时重新分配
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        if self._frame is not None and self._frame.shape == shape and self._frame.dtype == dtype:
+            return self._frame
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if self._shm is None or self._shm.size < nbytes:
+            self._release_buffer()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        self._frame = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+        return self._frame
+
+    def _release_buffer(self):
+        """释放帧缓冲区"""
+        self._frame = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _submit(self, op, frame):
+        """把帧放入共享内存（已在其中时不复制）并发送检测请求"""
+        buffer = self.frame_buffer(frame.shape, frame.dtype)
+        if buffer.ctypes.data != frame.ctypes.data:
+            buffer[...] = frame
+        return self._request({"op": op, "shm": self._shm.name, "shape": list(frame.shape),
+                              "dtype": frame.dtype.str})["faces"]
+
+    def detect_face(self, frame):
+        """检测人脸并提取特征，返回值与FaceDetector.detect_face相同"""
+        faces = self._submit("detect_face", frame)
+        if not faces:
+            return False, None, None, None, None, None, None, None
+        return (True,) + _decode_face(faces[0])
+
+    def detect_faces(self, frame):
+        """检测画面中的所有人脸，返回值与FaceDetector.detect_faces相同"""
+        return [(tuple(face["box"]),) + _decode_face(face) for face in self._submit("detect_faces", frame)]
+
+    def reset_tracking(self):
+        """清除服务端的跟踪状态"""
+        self._request({"op": "reset", "tracking": True, "pose": False})
+
+    def reset_pose(self):
+        """清除服务端上一帧的姿态结果"""
+        self._request({"op": "reset", "tracking": False, "pose": True})
+
+    def draw_face_features(self, frame, shape, leftEye, rightEye, mouth):
+        """在图像上绘制人脸特征（只用到OpenCV，不加载模型）"""
+        import face_detector
+        return face_detector.FaceDetector.draw_face_features(self, frame, shape, leftEye, rightEye, mouth)
+
+    def close(self):
+        """断开连接并释放帧缓冲区"""
+        try:
+            self.sock.close()
+        finally:
+            self._release_buffer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本机人脸检测服务（多个程序共用一份模型）")
+    parser.add_argument("--socket", help="Unix套接字路径，默认使用配置文件中的DETECTOR_SOCKET")
+    parser.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                        help="68点特征预测模型路径")
+    parser.add_argument("--detect-scale", type=float, help="默认的人脸检测缩放比例，默认使用配置文件中的DETECT_SCALE")
+    parser.add_argument("--metrics-port", type=int, help="运行指标HTTP端口，默认使用配置文件中的METRICS_HTTP_PORT")
+    parser.add_argument("--metrics-file", help="运行指标文件路径，默认使用配置文件中的METRICS_TEXTFILE")
+    args = parser.parse_args()
+
+    service = DetectorService(args.socket, args.predictor, args.detect_scale)
+    metrics.start_exporter(args.metrics_port, args.metrics_file)
+    print(f"检测服务已启动: {service.socket_path}")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        metrics.stop_exporter()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""事件频率估计模块
+
+用固定容量的环形缓冲区保存事件时间戳，可在任意时间窗口上查询事件频率：
+记录事件为O(1)，查询为O(log n)的二分查找，不需要任何线程等待或睡眠。
+时间戳既可以是实时时钟（time.monotonic），也可以是离线视频的帧时间戳。
+"""
+
+
+class EventRateEstimator:
+    """事件时间戳环形缓冲区"""
+
+    def __init__(self, capacity=4096):
+        """初始化
+
+        Args:
+            capacity: 最多保留的事件数，超出后覆盖最早的事件
+        """
+        self.capacity = capacity
+        self.times = [0.0] * capacity
+        self.start = 0   # 最早事件在缓冲区中的位置
+        self.count = 0   # 缓冲区中的事件数
+        self.total = 0   # 累计事件总数（包括已被覆盖的）
+
+    def add(self, timestamp):
+        """记录一次事件，时间戳需单调不减
+
+        Args:
+            timestamp: 事件发生的时间（秒）
+        """
+        if self.count < self.capacity:
+            self.times[(self.start + self.count) % self.capacity] = timestamp
+            self.count += 1
+        else:
+            self.times[self.start] = timestamp
+            self.start = (self.start + 1) % self.capacity
+        self.total += 1
+
+    def clear(self):
+        """清空所有事件"""
+        self.start = 0
+        self.count = 0
+        self.total = 0
+
+    def _count_after(self, timestamp):
+        """统计时间戳大于timestamp的事件数（二分查找）"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[(self.start + mid) % self.capacity] <= timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.count - lo
+
+    def count_between(self, begin, end):
+        """统计时间区间(begin, end]内的事件数"""
+        return self._count_after(begin) - self._count_after(end)
+
+    def rate(self, now, window):
+        """查询时间窗口内的事件频率
+
+        Args:
+            now: 窗口结束时间
+            window: 窗口长度（秒）
+
+        Returns:
+            float: 窗口(now - window, now]内的事件频率（次/秒）
+        """
+        if window <= 0:
+            return 0.0
+        return self.count_between(now - window, now) / window
+
+    def last(self):
+        """最近一次事件的时间戳，没有事件时返回None"""
+        if self.count == 0:
+            return None
+        return self.times[(self.start + self.count - 1) % self.capacity]
+
+    def since(self, timestamp):
+        """时间戳大于timestamp的事件（按时间顺序）"""
+        after = self._count_after(timestamp)
+        return [self.times[(self.start + i) % self.capacity] for i in range(self.count - after, self.count)]
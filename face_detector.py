@@ -3,18 +3,65 @@
 import dlib
 import cv2
 import numpy as np
-from scipy.spatial import distance as dist
 from imutils import face_utils
 import math
+import time
+import landmark_features
+import metrics
+from landmark_filter import LandmarkFilter
+
+# 运行指标：各阶段耗时、检出情况和人脸定位方式
+_STAGE_SECONDS = metrics.histogram("detect_stage_seconds", "人脸检测各阶段耗时（秒）", ["stage"])
+_STAGE_GRAY = _STAGE_SECONDS.labels("cvtColor")
+_STAGE_LOCATE = _STAGE_SECONDS.labels("locate")
+_STAGE_PREDICT = _STAGE_SECONDS.labels("shape_predictor")
+_STAGE_FEATURES = _STAGE_SECONDS.labels("features")
+_DETECT_FRAMES = metrics.counter("detector_frames_total", "人脸检测的帧数（按是否检出人脸）", ["result"])
+_FRAMES_FACE = _DETECT_FRAMES.labels("face")
+_FRAMES_NO_FACE = _DETECT_FRAMES.labels("no_face")
+_LOCATE = metrics.counter("detector_locate_total", "人脸定位方式（全图检测或跟踪）", ["method"])
+_LOCATE_DETECT = _LOCATE.labels("detect")
+_LOCATE_TRACK = _LOCATE.labels("track")
+_LOCATE_ROI = _LOCATE.labels("roi")
+_LOCATE_FILTER = _LOCATE.labels("filter")
+
+
+def shape_to_np(shape, offset=None):
+    """将dlib特征点结果转换为(68, 2)的整数数组
+
+    与face_utils.shape_to_np结果相同。dlib的points没有缓冲区接口，坐标仍需逐点读取，
+    这里只是省去了逐行写入NumPy数组的开销（见benchmark.py的shape_to_np阶段）
+
+    Args:
+        shape: dlib.full_object_detection
+        offset: 加到所有坐标上的偏移(x, y)（在裁剪区域上预测时为裁剪区域左上角）
+
+    Returns:
+        ndarray: 特征点坐标
+    """
+    parts = shape.parts()
+    coords = np.fromiter((v for p in parts for v in (p.x, p.y)), dtype=int, count=2 * len(parts))
+    coords = coords.reshape(-1, 2)
+    if offset is not None:
+        coords += offset
+    return coords
 
 class FaceDetector:
     """人脸检测和特征提取模块"""
     
-    def __init__(self, predictor_path="./model/shape_predictor_68_face_landmarks.dat"):
-        # 使用人脸检测器get_frontal_face_detector
-        self.detector = dlib.get_frontal_face_detector()
-        # dlib的68点模型，使用作者训练好的特征预测器
-        self.predictor = dlib.shape_predictor(predictor_path)
+    def __init__(self, predictor_path="./model/shape_predictor_68_face_landmarks.dat", tracking=None,
+                 detect_scale=None, shared=None):
+        if shared is not None:
+            # 与另一个检测器共用HOG检测器和特征点模型（只读），跟踪和姿态状态各自独立
+            self.detector = shared.detector
+            self.predictor_path = shared.predictor_path
+            self.predictor = shared.predictor
+        else:
+            # 使用人脸检测器get_frontal_face_detector
+            self.detector = dlib.get_frontal_face_detector()
+            # dlib的68点模型，使用作者训练好的特征预测器
+            self.predictor_path = predictor_path
+            self.predictor = dlib.shape_predictor(predictor_path)
         
         # 分别获取左右眼面部标志的索引
         (self.lStart, self.lEnd) = face_utils.FACIAL_LANDMARKS_IDXS["left_eye"]
@@ -23,6 +70,9 @@ class FaceDetector:
         
         # 姿态估计相关参数
         self.init_pose_params()
+        
+        # 人脸检测与跟踪相关参数
+        self.init_detection_params(tracking, detect_scale)
     
     def init_pose_params(self):
         """初始化姿态估计相关参数"""
@@ -45,10 +95,323 @@ class FaceDetector:
         self.reprojectsrc = config.REPROJECTSRC
         # 绘制正方体12轴
         self.line_pairs = config.LINE_PAIRS
+        
+        # 快速姿态估计模式及上一帧的外参（用于solvePnP热启动）
+        self.pose_fast = config.POSE_FAST
+        self.pose_warm_start = True
+        self.reset_pose()
+    
+    def make_stateless(self):
+        """关闭所有依赖前一帧的状态（跟踪、特征点滤波和姿态热启动），每帧的结果只取决于该帧本身
+        
+        多进程流水线的工作进程使用该设置（相邻帧落在不同进程）；串行模式使用同样的设置时，
+        逐帧结果与流水线模式完全相同
+        """
+        self.tracking = False
+        self.landmark_filter = None
+        self.pose_warm_start = False
+        self.reset_tracking()
+        self.reset_pose()
+    
+    def reset_pose(self):
+        """清除上一帧的姿态结果，下一帧从零开始求解"""
+        self.last_rvec = None
+        self.last_tvec = None
+    
+    def init_detection_params(self, tracking=None, detect_scale=None):
+        """初始化人脸检测与跟踪相关参数
+        
+        Args:
+            tracking: 是否启用跟踪模式，None表示使用配置文件中的设置
+            detect_scale: 人脸检测缩放比例，None表示使用配置文件中的设置
+        """
+        import config
+        
+        # 人脸检测缩放比例
+        self.detect_scale = config.DETECT_SCALE if detect_scale is None else detect_scale
+        
+        # ROI模式：跟踪帧只在人脸附近的裁剪区域上转灰度和预测特征点，开销随人脸大小而非画面大小变化
+        self.roi_mode = config.ROI_MODE
+        self.roi_padding = config.ROI_PADDING
+        self.roi_buffer = np.empty(0, dtype=np.uint8)  # 复用的灰度裁剪缓冲区
+        
+        # 跟踪模式参数
+        self.tracking = config.TRACKING_ENABLED if tracking is None else tracking
+        # ROI帧没有整幅灰度图，无法更新相关滤波跟踪器，ROI模式下人脸框总是由上一帧特征点推算
+        self.track_method = "landmarks" if self.roi_mode else config.TRACK_METHOD
+        self.detect_interval = config.DETECT_INTERVAL
+        self.track_min_psr = config.TRACK_MIN_PSR
+        self.track_min_iou = config.TRACK_MIN_IOU
+        
+        # 特征点滤波：平滑特征点，并可每隔filter_interval帧才运行一次特征点预测（其余帧外推）
+        self.landmark_filter = None
+        if config.LANDMARK_FILTER:
+            self.landmark_filter = LandmarkFilter(config.LANDMARK_PROCESS_NOISE, config.LANDMARK_MEASUREMENT_NOISE)
+        self.filter_interval = max(1, config.LANDMARK_FILTER_INTERVAL)
+        self.filter_frame = 0
+        
+        # 相关滤波跟踪器（仅在correlation方式下使用）
+        self.tracker = dlib.correlation_tracker() if self.track_method == "correlation" else None
+        self.reset_tracking()
+    
+    def reset_tracking(self):
+        """清除跟踪状态，下一帧将进行全图检测"""
+        self.track_active = False     # 当前是否处于跟踪状态
+        self.track_rect = None        # landmarks方式下一帧使用的人脸框
+        self.track_offset = None      # 检测框相对特征点外接框的偏移（按外接框宽高归一化）
+        self.last_landmark_box = None  # 上一帧特征点外接框
+        self.frames_since_detect = 0  # 距离上次全图检测的帧数
+        self.last_tracked = False     # 上一帧是否由跟踪得到
+        # 人脸丢失后滤波器从新的观测重新开始
+        if self.landmark_filter is not None:
+            self.landmark_filter.reset()
+    
+    @staticmethod
+    def _landmark_box(shape):
+        """计算特征点外接框 (left, top, right, bottom)"""
+        left, top = shape.min(axis=0)
+        right, bottom = shape.max(axis=0)
+        return int(left), int(top), int(right), int(bottom)
+    
+    @staticmethod
+    def _box_iou(a, b):
+        """计算两个框 (left, top, right, bottom) 的交并比"""
+        ix = min(a[2], b[2]) - max(a[0], b[0])
+        iy = min(a[3], b[3]) - max(a[1], b[1])
+        if ix <= 0 or iy <= 0:
+            return 0.0
+        inter = ix * iy
+        union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+        return inter / union if union > 0 else 0.0
+    
+    def _detect_faces(self, gray):
+        """在（可能缩小的）灰度图上进行HOG人脸检测
+        
+        Args:
+            gray: 原始分辨率灰度图
+            
+        Returns:
+            list: 原图坐标系下的人脸框列表
+        """
+        scale = self.detect_scale
+        if scale == 1.0:
+            return list(self.detector(gray, 0))
+        
+        # 缩小后检测，检测代价约随缩放比例平方下降
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return [dlib.rectangle(int(f.left() / scale), int(f.top() / scale),
+                               int(f.right() / scale), int(f.bottom() / scale))
+                for f in self.detector(small, 0)]
     
-    def get_head_pose(self, shape):
+    def _track_face(self, gray):
+        """用跟踪代替全图检测
+        
+        Args:
+            gray: 灰度图
+            
+        Returns:
+            dlib.rectangle: 跟踪得到的人脸框，跟踪置信度不足时返回None
+        """
+        if self.track_method == "correlation":
+            psr = self.tracker.update(gray)
+            if psr < self.track_min_psr:
+                return None
+            pos = self.tracker.get_position()
+            return dlib.rectangle(int(pos.left()), int(pos.top()), int(pos.right()), int(pos.bottom()))
+        return self.track_rect
+    
+    def _locate_face(self, gray):
+        """定位人脸：跟踪有效时直接使用跟踪结果，否则进行全图HOG检测
+        
+        Args:
+            gray: 灰度图
+            
+        Returns:
+            dlib.rectangle: 人脸框，未找到人脸时返回None
+        """
+        if self.tracking and self.track_active and self.frames_since_detect < self.detect_interval:
+            face = self._track_face(gray)
+            if face is not None:
+                self.frames_since_detect += 1
+                self.last_tracked = True
+                _LOCATE_TRACK.inc()
+                return face
+        
+        self.last_tracked = False
+        self.frames_since_detect = 0
+        _LOCATE_DETECT.inc()
+        faces = self._detect_faces(gray)
+        if len(faces) == 0:
+            self.reset_tracking()
+            self.reset_pose()
+            return None
+        
+        # 获取第一个人脸
+        face = faces[0]
+        if self.tracking:
+            self.track_active = True
+            if self.track_method == "correlation":
+                self.tracker.start_track(gray, face)
+        return face
+    
+    def _update_track(self, face, shape):
+        """根据本帧特征点更新跟踪状态，并检查跟踪置信度
+        
+        Args:
+            face: 本帧使用的人脸框
+            shape: 本帧人脸特征点坐标
+        """
+        if not self.tracking:
+            return
+        box = self._landmark_box(shape)
+        width = max(box[2] - box[0], 1)
+        height = max(box[3] - box[1], 1)
+        
+        if not self.last_tracked:
+            # 全图检测帧：记录检测框与特征点外接框的相对关系，跟踪时保持相同的框形状
+            self.track_offset = ((face.left() - box[0]) / width, (face.top() - box[1]) / height,
+                                 (face.right() - box[2]) / width, (face.bottom() - box[3]) / height)
+        elif self.last_landmark_box is not None and self._box_iou(box, self.last_landmark_box) < self.track_min_iou:
+            # 特征点框突变，说明跟踪已经偏离人脸，下一帧重新检测
+            self.track_active = False
+        
+        self.last_landmark_box = box
+        if self.track_method == "landmarks":
+            dl, dt, dr, db = self.track_offset
+            self.track_rect = dlib.rectangle(int(box[0] + dl * width), int(box[1] + dt * height),
+                                             int(box[2] + dr * width), int(box[3] + db * height))
+    
+    def _roi_gray(self, frame, face):
+        """裁剪人脸附近区域并转换为灰度图，写入复用的缓冲区
+        
+        Args:
+            frame: 视频帧（BGR）
+            face: 原图坐标系下的人脸框
+            
+        Returns:
+            tuple: (灰度裁剪图, 裁剪区域左上角(x, y))，人脸框不在画面内时返回(None, None)
+        """
+        height, width = frame.shape[:2]
+        pad_x = int((face.right() - face.left()) * self.roi_padding)
+        pad_y = int((face.bottom() - face.top()) * self.roi_padding)
+        x0, y0 = max(face.left() - pad_x, 0), max(face.top() - pad_y, 0)
+        x1, y1 = min(face.right() + pad_x, width), min(face.bottom() + pad_y, height)
+        if x1 <= x0 or y1 <= y0:
+            return None, None
+        
+        size = (y1 - y0) * (x1 - x0)
+        if self.roi_buffer.size < size:
+            self.roi_buffer = np.empty(size, dtype=np.uint8)
+        gray = self.roi_buffer[:size].reshape(y1 - y0, x1 - x0)
+        gray = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY, dst=gray)
+        return gray, (x0, y0)
+    
+    def _detect_roi(self, frame):
+        """ROI模式：由上一帧特征点推算人脸框，只在其附近的裁剪区域上预测特征点
+        
+        Args:
+            frame: 视频帧（BGR）
+            
+        Returns:
+            tuple: (人脸框, 人脸特征点)，不满足ROI条件时返回None，由调用方进行全图处理
+        """
+        if not (self.tracking and self.track_active and self.track_rect is not None
+                and self.frames_since_detect < self.detect_interval):
+            return None
+        face = self.track_rect
+        gray, origin = self._roi_gray(frame, face)
+        if gray is None:
+            # 推算的人脸框已移出画面，本帧重新进行全图检测
+            self.track_active = False
+            return None
+        x0, y0 = origin
+        
+        local = dlib.rectangle(face.left() - x0, face.top() - y0, face.right() - x0, face.bottom() - y0)
+        shape = shape_to_np(self.predictor(gray, local), (x0, y0))
+        self.frames_since_detect += 1
+        self.last_tracked = True
+        _LOCATE_ROI.inc()
+        return face, shape
+    
+    def get_head_pose(self, shape, reproject=None):
         """头部姿态估计
         
+        Args:
+            shape: 人脸特征点坐标
+            reproject: 是否计算重投影立方体，None表示快速模式下不计算、普通模式下计算
+            
+        Returns:
+            tuple: (投影误差，欧拉角)，未计算重投影时投影误差为None
+        """
+        if not self.pose_fast:
+            return self._get_head_pose_full(shape)
+        
+        # （像素坐标集合）填写2D参考点
+        image_pts = landmark_features.pose_image_points(shape)
+        
+        if self.pose_warm_start and self.last_rvec is not None:
+            # 以上一帧的外参为初值迭代求解，相邻帧姿态变化很小，收敛更快
+            _, rotation_vec, translation_vec = cv2.solvePnP(self.object_pts, image_pts, self.cam_matrix,
+                                                            self.dist_coeffs, self.last_rvec.copy(),
+                                                            self.last_tvec.copy(), True)
+            # 解落到相机后方说明初值已失效，退回冷启动
+            if translation_vec[2, 0] <= 0:
+                _, rotation_vec, translation_vec = cv2.solvePnP(self.object_pts, image_pts, self.cam_matrix,
+                                                                self.dist_coeffs)
+        else:
+            _, rotation_vec, translation_vec = cv2.solvePnP(self.object_pts, image_pts, self.cam_matrix,
+                                                            self.dist_coeffs)
+        self.last_rvec = rotation_vec
+        self.last_tvec = translation_vec
+        
+        # 由旋转矩阵闭式求解欧拉角，结果与decomposeProjectionMatrix一致
+        rotation_mat, _ = cv2.Rodrigues(rotation_vec)
+        euler_angle = self.rotation_to_euler(rotation_mat)
+        
+        reprojectdst = None
+        if reproject:
+            reprojectdst = self.project_cube(rotation_vec, translation_vec)
+        return reprojectdst, euler_angle
+    
+    @staticmethod
+    def rotation_to_euler(rotation_mat):
+        """将旋转矩阵转换为欧拉角
+        
+        与cv2.decomposeProjectionMatrix（RQDecomp3x3）的约定相同：R = Rz * Ry * Rx
+        
+        Args:
+            rotation_mat: 3x3旋转矩阵
+            
+        Returns:
+            ndarray: 形状(3, 1)的欧拉角（度），依次为绕x、y、z轴的角度
+        """
+        r = rotation_mat
+        x = math.atan2(r[2, 1], r[2, 2])
+        y = math.atan2(-r[2, 0], math.hypot(r[2, 1], r[2, 2]))
+        z = math.atan2(r[1, 0], r[0, 0])
+        return np.degrees(np.array([[x], [y], [z]]))
+    
+    def project_cube(self, rotation_vec=None, translation_vec=None):
+        """计算重投影立方体的8个顶点，仅在需要绘制时调用
+        
+        Args:
+            rotation_vec: 旋转向量，None表示使用上一帧的结果
+            translation_vec: 平移向量，None表示使用上一帧的结果
+            
+        Returns:
+            tuple: 8个顶点的像素坐标，没有姿态结果时返回None
+        """
+        if rotation_vec is None:
+            rotation_vec, translation_vec = self.last_rvec, self.last_tvec
+        if rotation_vec is None:
+            return None
+        reprojectdst, _ = cv2.projectPoints(self.reprojectsrc, rotation_vec, translation_vec, self.cam_matrix,
+                                            self.dist_coeffs)
+        return tuple(map(tuple, reprojectdst.reshape(8, 2)))
+    
+    def _get_head_pose_full(self, shape):
+        """头部姿态估计（普通模式：每帧冷启动求解并计算重投影）
+        
         Args:
             shape: 人脸特征点坐标
             
@@ -58,9 +421,7 @@ class FaceDetector:
         # （像素坐标集合）填写2D参考点，注释遵循https://ibug.doc.ic.ac.uk/resources/300-W/
         # 17左眉左上角/21左眉右角/22右眉左上角/26右眉右上角/36左眼左上角/39左眼右上角/42右眼左上角/
         # 45右眼右上角/31鼻子左上角/35鼻子右上角/48左上角/54嘴右上角/57嘴中央下角/8下巴角
-        image_pts = np.float32([shape[17], shape[21], shape[22], shape[26], shape[36],
-                                shape[39], shape[42], shape[45], shape[31], shape[35],
-                                shape[48], shape[54], shape[57], shape[8]])
+        image_pts = landmark_features.pose_image_points(shape)
         # solvePnP计算姿势——求解旋转和平移矩阵：
         # rotation_vec表示旋转矩阵，translation_vec表示平移矩阵，cam_matrix与K矩阵对应，dist_coeffs与D矩阵对应。
         _, rotation_vec, translation_vec = cv2.solvePnP(self.object_pts, image_pts, self.cam_matrix, self.dist_coeffs)
@@ -76,13 +437,6 @@ class FaceDetector:
         # decomposeProjectionMatrix将投影矩阵分解为旋转矩阵和相机矩阵
         _, _, _, _, _, _, euler_angle = cv2.decomposeProjectionMatrix(pose_mat)
 
-        pitch, yaw, roll = [math.radians(_.item()) for _ in euler_angle]
-
-        pitch = math.degrees(math.asin(math.sin(pitch)))
-        roll = -math.degrees(math.asin(math.sin(roll)))
-        yaw = math.degrees(math.asin(math.sin(yaw)))
-        # print('pitch:{}, yaw:{}, roll:{}'.format(pitch, yaw, roll))
-
         return reprojectdst, euler_angle  # 投影误差，欧拉角
 
     def eye_aspect_ratio(self, eye):
@@ -95,11 +449,11 @@ class FaceDetector:
             float: 眼睛纵横比
         """
         # 垂直眼标志（X，Y）坐标
-        A = dist.euclidean(eye[1], eye[5])  # 计算两个集合之间的欧式距离
-        B = dist.euclidean(eye[2], eye[4])
+        A = np.linalg.norm(eye[1] - eye[5])  # 计算两个集合之间的欧式距离
+        B = np.linalg.norm(eye[2] - eye[4])
         # 计算水平之间的欧几里得距离
         # 水平眼标志（X，Y）坐标
-        C = dist.euclidean(eye[0], eye[3])
+        C = np.linalg.norm(eye[0] - eye[3])
         # 眼睛长宽比的计算
         ear = (A + B) / (2.0 * C)
         # 返回眼睛的长宽比
@@ -129,23 +483,85 @@ class FaceDetector:
         Returns:
             tuple: (是否检测到人脸, 人脸特征点, 左眼坐标, 右眼坐标, 嘴部坐标, 眼睛纵横比, 嘴部纵横比, 头部姿态)
         """
+        t0 = time.perf_counter()
+        
+        # 特征点滤波的外推帧：跟踪中的人脸不运行检测和特征点预测，由滤波器按速度外推
+        if self.landmark_filter is not None:
+            self.filter_frame += 1
+            if self.filter_frame % self.filter_interval and self.track_active and self.landmark_filter.ready():
+                points = self.landmark_filter.predict()
+                self.frames_since_detect += 1
+                _LOCATE_FILTER.inc()
+                _FRAMES_FACE.inc()
+                features = self._extract_features(np.rint(points).astype(int), points)
+                _STAGE_FEATURES.observe(time.perf_counter() - t0)
+                return (True,) + features
+        
+        # ROI模式的跟踪帧：不转换整幅画面，只在人脸附近的裁剪区域上预测特征点
+        if self.roi_mode:
+            located = self._detect_roi(frame)
+            if located is not None:
+                face, shape = located
+                t1 = time.perf_counter()
+                _STAGE_PREDICT.observe(t1 - t0)
+                _FRAMES_FACE.inc()
+                return self._finish(face, shape, t1)
+        
         # 转换为灰度图
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t1 = time.perf_counter()
+        _STAGE_GRAY.observe(t1 - t0)
         
-        # 检测人脸
-        faces = self.detector(gray, 0)
+        # 定位人脸（跟踪模式下大部分帧跳过全图检测）
+        face = self._locate_face(gray)
+        t2 = time.perf_counter()
+        _STAGE_LOCATE.observe(t2 - t1)
         
         # 如果没有检测到人脸
-        if len(faces) == 0:
+        if face is None:
+            _FRAMES_NO_FACE.inc()
             return False, None, None, None, None, None, None, None
+        _FRAMES_FACE.inc()
         
-        # 获取第一个人脸
-        face = faces[0]
+        # 获取人脸特征点（在原始分辨率灰度图上精修）
+        shape = shape_to_np(self.predictor(gray, face))
+        t3 = time.perf_counter()
+        _STAGE_PREDICT.observe(t3 - t2)
+        return self._finish(face, shape, t3)
+    
+    def _finish(self, face, shape, start):
+        """由本帧预测的特征点更新跟踪状态和特征点滤波，并计算特征
+        
+        Args:
+            face: 本帧使用的人脸框
+            shape: 特征点预测器给出的坐标
+            start: 计算特征的开始时刻（用于阶段耗时）
+            
+        Returns:
+            tuple: 与detect_face相同
+        """
+        # 更新跟踪状态（使用未滤波的观测）
+        self._update_track(face, shape)
         
-        # 获取人脸特征点
-        shape = self.predictor(frame, face)
-        shape = face_utils.shape_to_np(shape)
+        points = None
+        if self.landmark_filter is not None:
+            points = self.landmark_filter.update(shape)
+            shape = np.rint(points).astype(int)
         
+        features = self._extract_features(shape, points)
+        _STAGE_FEATURES.observe(time.perf_counter() - start)
+        return (True,) + features
+    
+    def _extract_features(self, shape, points=None):
+        """由特征点计算各部位坐标、纵横比和头部姿态
+        
+        Args:
+            shape: 人脸特征点坐标
+            points: 滤波后的浮点坐标，给出时纵横比和姿态由它计算（保留亚像素精度）
+            
+        Returns:
+            tuple: (人脸特征点, 左眼坐标, 右眼坐标, 嘴部坐标, 眼睛纵横比, 嘴部纵横比, 头部姿态)
+        """
         # 获取左眼和右眼坐标
         leftEye = shape[self.lStart:self.lEnd]
         rightEye = shape[self.rStart:self.rEnd]
@@ -153,18 +569,37 @@ class FaceDetector:
         # 获取嘴部坐标
         mouth = shape[self.mStart:self.mEnd]
         
-        # 计算眼睛纵横比
-        leftEAR = self.eye_aspect_ratio(leftEye)
-        rightEAR = self.eye_aspect_ratio(rightEye)
-        ear = (leftEAR + rightEAR) / 2.0
+        if points is None:
+            points = shape
         
-        # 计算嘴部纵横比
-        mar = self.mouth_aspect_ratio(mouth)
+        # 一次向量化计算眼睛纵横比和嘴部纵横比
+        ear, mar = landmark_features.frame_features(points)
         
         # 获取头部姿态
-        pose = self.get_head_pose(shape)
+        pose = self.get_head_pose(points)
+        
+        return shape, leftEye, rightEye, mouth, ear, mar, pose
+    
+    def detect_faces(self, frame):
+        """检测画面中的所有人脸并提取特征（每次都进行全图检测，不使用跟踪）
+        
+        Args:
+            frame: 视频帧
+            
+        Returns:
+            list: 每个人脸一个元组 (人脸框, 人脸特征点, 左眼坐标, 右眼坐标, 嘴部坐标, 眼睛纵横比, 嘴部纵横比, 头部姿态)，
+                  人脸框为 (left, top, right, bottom)
+        """
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        return True, shape, leftEye, rightEye, mouth, ear, mar, pose
+        results = []
+        for face in self._detect_faces(gray):
+            shape = shape_to_np(self.predictor(gray, face))
+            # 多人脸之间不能共用上一帧的姿态初值
+            self.reset_pose()
+            box = (face.left(), face.top(), face.right(), face.bottom())
+            results.append((box,) + self._extract_features(shape))
+        return results
     
     def draw_face_features(self, frame, shape, leftEye, rightEye, mouth):
         """在图像上绘制人脸特征
@@ -3,23 +3,54 @@
 import time
 import config
 import speech_utils
+import metrics
+import fatigue_scoring
+from event_rate import EventRateEstimator
+from frame_history import FrameHistory
+from quantile_sketch import P2Quantile
+
+# 运行指标：分析器产生的各类事件数
+_EVENTS = metrics.counter("analyzer_events_total", "疲劳分析器产生的事件数", ["event"])
 
 class FatigueAnalyzer:
     """疲劳分析模块，负责检测和评估驾驶员疲劳状态"""
+
+    # 多路视频时每张人脸一个分析器，固定属性集合以减少内存并避免拼写错误的属性
+    __slots__ = (
+        "ui_callback", "enable_speech", "listeners",
+        "EYE_AR_THRESH", "EYE_AR_CONSEC_FRAMES", "MAR_THRESH", "MOUTH_AR_CONSEC_FRAMES",
+        "HAR_THRESH", "NOD_AR_CONSEC_FRAMES", "AR_CONSEC_FRAMES_check", "OUT_AR_CONSEC_FRAMES_check",
+        "FREQ_WINDOW", "SCORE_INTERVAL", "ALERT_INTERVAL", "PERCLOS_WINDOW",
+        "COUNTER", "TOTAL", "mCOUNTER", "mTOTAL", "hCOUNTER", "hTOTAL", "oCOUNTER",
+        "blink_events", "yawn_events", "nod_events",
+        "frequency", "hfrequency", "yfrequency", "score",
+        "last_score_time", "last_alert_time", "pending_event_time", "score_latency",
+        "history",
+        "calibrating", "calibration_start", "ear_sketch", "mar_sketch",
+    )
     
-    def __init__(self, ui_callback=None):
+    def __init__(self, ui_callback=None, enable_speech=True, calibrate=None):
         """初始化疲劳分析器
         
         Args:
             ui_callback: 用于更新UI的回调函数
+            enable_speech: 是否进行语音播报（离线处理时关闭）
+            calibrate: 是否进行驾驶员基线标定，None表示使用配置文件中的设置
         """
         self.ui_callback = ui_callback
+        self.enable_speech = enable_speech
+        
+        # 事件监听器，回调参数为(事件名, 时间戳, 数值)
+        self.listeners = []
         
         # 初始化阈值参数
         self.init_thresholds()
         
         # 初始化计数器
         self.init_counters()
+        
+        # 初始化驾驶员基线标定
+        self.init_calibration(calibrate)
     
     def init_thresholds(self):
         """初始化检测阈值"""
@@ -38,6 +69,12 @@ class FatigueAnalyzer:
         # 无人驾驶检测阈值
         self.AR_CONSEC_FRAMES_check = config.AR_CONSEC_FRAMES_CHECK
         self.OUT_AR_CONSEC_FRAMES_check = config.OUT_AR_CONSEC_FRAMES_CHECK
+        
+        # 频率统计窗口及评分、警报的调度间隔
+        self.FREQ_WINDOW = config.FREQ_WINDOW
+        self.SCORE_INTERVAL = config.SCORE_INTERVAL
+        self.ALERT_INTERVAL = config.ALERT_INTERVAL
+        self.PERCLOS_WINDOW = config.PERCLOS_WINDOW
     
     def init_counters(self):
         """初始化计数器"""
@@ -56,6 +93,14 @@ class FatigueAnalyzer:
         # 无人驾驶计数器
         self.oCOUNTER = 0
         
+        # 事件时间戳（用于按时间窗口计算频率）
+        self.blink_events = EventRateEstimator()
+        self.yawn_events = EventRateEstimator()
+        self.nod_events = EventRateEstimator()
+        
+        # 逐帧历史（EAR/MAR/俯仰角），用于平均EAR、PERCLOS等趋势查询
+        self.history = FrameHistory(config.HISTORY_CAPACITY)
+        
         # 频率计算
         self.frequency = 0   # 眨眼频率
         self.hfrequency = 0  # 点头频率
@@ -63,12 +108,76 @@ class FatigueAnalyzer:
         
         # 疲劳评分
         self.score = 0
+        
+        # 调度状态
+        self.last_score_time = None     # 上次更新评分的时间
+        self.last_alert_time = None     # 上次检查警报的时间
+        self.pending_event_time = None  # 尚未计入评分的最早事件时间
+        self.score_latency = 0.0        # 最近一次事件从发生到计入评分的延迟（秒）
+    
+    def init_calibration(self, enabled=None):
+        """初始化驾驶员基线标定
+        
+        Args:
+            enabled: 是否进行标定，None表示使用配置文件中的设置
+        """
+        self.calibrating = config.CALIBRATION_ENABLED if enabled is None else enabled
+        self.calibration_start = None  # 标定开始时间（第一帧检出人脸的时间）
+        # 流式分位数估计，内存与标定帧数无关
+        self.ear_sketch = P2Quantile(0.5)                             # 睁眼EAR的中位数
+        self.mar_sketch = P2Quantile(config.CALIBRATION_MAR_QUANTILE)  # 闭嘴（含说话）MAR的高分位数
+    
+    def start_calibration(self):
+        """重新开始标定（如更换驾驶员），标定完成前沿用当前阈值"""
+        self.init_calibration(True)
+    
+    def update_calibration(self, ear, mar, timestamp=None):
+        """标定阶段记录一帧的EAR和MAR，达到标定时长后设置本次行程的阈值
+        
+        Args:
+            ear: 眼睛纵横比
+            mar: 嘴部纵横比
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
+            
+        Returns:
+            bool: 本帧是否完成了标定
+        """
+        now = self._now(timestamp)
+        if self.calibration_start is None:
+            self.calibration_start = now
+        self.ear_sketch.add(ear)
+        self.mar_sketch.add(mar)
+        if (now - self.calibration_start >= config.CALIBRATION_SECONDS
+                and self.ear_sketch.count >= config.CALIBRATION_MIN_FRAMES):
+            self.finish_calibration(now)
+            return True
+        return False
     
-    def update_blink(self, ear):
+    def finish_calibration(self, timestamp=None):
+        """由标定得到的分布设置EAR和MAR阈值
+        
+        Args:
+            timestamp: 完成标定的时间（秒），None表示使用当前时钟
+        """
+        self.calibrating = False
+        if self.ear_sketch.count == 0:
+            return
+        low, high = config.EAR_THRESH_RANGE
+        self.EYE_AR_THRESH = min(max(self.ear_sketch.value() * config.CALIBRATION_EAR_RATIO, low), high)
+        low, high = config.MAR_THRESH_RANGE
+        self.MAR_THRESH = min(max(self.mar_sketch.value() + config.CALIBRATION_MAR_MARGIN, low), high)
+        
+        self._emit("calibrated", self._now(timestamp), self.EYE_AR_THRESH)
+        if self.ui_callback:
+            self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime())
+                             + u"驾驶员基线标定完成：EAR阈值%.3f，MAR阈值%.3f\n" % (self.EYE_AR_THRESH, self.MAR_THRESH))
+    
+    def update_blink(self, ear, timestamp=None):
         """更新眨眼检测
         
         Args:
             ear: 眼睛纵横比
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
             
         Returns:
             bool: 是否检测到眨眼
@@ -81,6 +190,7 @@ class FatigueAnalyzer:
             # 如果连续多帧都小于阈值，则表示进行了一次眨眼活动
             if self.COUNTER >= self.EYE_AR_CONSEC_FRAMES:
                 self.TOTAL += 1
+                self._record_event("blink", self.blink_events, timestamp, ear)
                 blinked = True
                 if self.ui_callback:
                     self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + u"眨眼\n")
@@ -89,11 +199,12 @@ class FatigueAnalyzer:
         
         return blinked
     
-    def update_yawn(self, mar):
+    def update_yawn(self, mar, timestamp=None):
         """更新打哈欠检测
         
         Args:
             mar: 嘴部纵横比
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
             
         Returns:
             bool: 是否检测到打哈欠
@@ -106,6 +217,7 @@ class FatigueAnalyzer:
             # 如果连续多帧都大于阈值，则表示打了一次哈欠
             if self.mCOUNTER >= self.MOUTH_AR_CONSEC_FRAMES:
                 self.mTOTAL += 1
+                self._record_event("yawn", self.yawn_events, timestamp, mar)
                 yawned = True
                 if self.ui_callback:
                     self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + u"打哈欠\n")
@@ -114,11 +226,12 @@ class FatigueAnalyzer:
         
         return yawned
     
-    def update_nod(self, euler_angle):
+    def update_nod(self, euler_angle, timestamp=None):
         """更新点头检测
         
         Args:
             euler_angle: 欧拉角
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
             
         Returns:
             bool: 是否检测到点头
@@ -132,6 +245,7 @@ class FatigueAnalyzer:
             # 如果连续多帧都大于阈值，则表示瞌睡点头一次
             if self.hCOUNTER >= self.NOD_AR_CONSEC_FRAMES:
                 self.hTOTAL += 1
+                self._record_event("nod", self.nod_events, timestamp, har)
                 nodded = True
                 if self.ui_callback:
                     self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + u"瞌睡点头\n")
@@ -140,9 +254,12 @@ class FatigueAnalyzer:
         
         return nodded
     
-    def update_no_face(self):
+    def update_no_face(self, timestamp=None):
         """更新无人脸检测
         
+        Args:
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
+            
         Returns:
             bool: 是否检测到无人驾驶状态
         """
@@ -151,75 +268,158 @@ class FatigueAnalyzer:
         self.oCOUNTER += 1
         if self.oCOUNTER >= self.OUT_AR_CONSEC_FRAMES_check:
             no_driver = True
+            self._emit("no_driver", self._now(timestamp))
             if self.ui_callback:
                 self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + u"无人驾驶状态!!!\n")
             self.oCOUNTER = 0
         
         return no_driver
+
+    def update(self, face_detected, ear=None, mar=None, euler_angle=None, timestamp=None):
+        """根据一帧的检测结果更新全部状态
+
+        Args:
+            face_detected: 是否检测到人脸
+            ear: 眼睛纵横比
+            mar: 嘴部纵横比
+            euler_angle: 欧拉角
+            timestamp: 帧时间戳（秒），None表示使用当前时钟
+
+        Returns:
+            dict: 本帧触发的事件 {"blink", "yawn", "nod", "no_driver"}
+        """
+        events = {"blink": False, "yawn": False, "nod": False, "no_driver": False}
+
+        now = self._now(timestamp)
+        if face_detected:
+            pitch = euler_angle[0, 0] if euler_angle is not None else None
+            self.history.append(now, True, ear, mar, pitch)
+            # 标定与检测同时进行，标定完成前沿用当前阈值
+            if self.calibrating:
+                self.update_calibration(ear, mar, now)
+        else:
+            self.history.append(now, False)
+
+        if face_detected:
+            events["blink"] = self.update_blink(ear, timestamp)
+            events["yawn"] = self.update_yawn(mar, timestamp)
+            events["nod"] = self.update_nod(euler_angle, timestamp)
+        else:
+            events["no_driver"] = self.update_no_face(timestamp)
+
+        return events
+
+    @staticmethod
+    def _now(timestamp=None):
+        """返回事件时间：离线处理使用帧时间戳，实时检测使用单调时钟"""
+        return time.monotonic() if timestamp is None else timestamp
     
-    def calculate_frequencies(self):
-        """计算眨眼、点头和打哈欠的频率"""
-        # 记录初始值
-        fTOTAL = self.TOTAL
-        fmTOTAL = self.mTOTAL
-        fhTOTAL = self.hTOTAL
+    def add_listener(self, callback):
+        """注册事件监听器
         
-        # 等待5秒
-        time.sleep(5)
+        Args:
+            callback: 回调函数，参数为(事件名, 时间戳, 数值)，
+                      事件名为"blink"/"yawn"/"nod"/"no_driver"/"level"/"score"/"calibrated"
+        """
+        self.listeners.append(callback)
+    
+    def _emit(self, event, timestamp, value=None):
+        """通知所有事件监听器"""
+        _EVENTS.labels(event).inc()
+        for callback in self.listeners:
+            try:
+                callback(event, timestamp, value)
+            except Exception as e:
+                metrics.ERRORS.labels("listener").inc()
+                print(f"事件监听器错误: {str(e)}")
+    
+    def _record_event(self, event, estimator, timestamp, value):
+        """记录一次眨眼/打哈欠/点头事件"""
+        now = self._now(timestamp)
+        estimator.add(now)
+        if self.pending_event_time is None:
+            self.pending_event_time = now
+        self._emit(event, now, value)
+    
+    def tick(self, now=None):
+        """调度节拍，由帧循环在每帧处理后调用
         
-        # 记录5秒后的值
-        lTOTAL = self.TOTAL
-        lmTOTAL = self.mTOTAL
-        lhTOTAL = self.hTOTAL
+        按SCORE_INTERVAL更新频率和疲劳评分，按ALERT_INTERVAL检查警报，
+        不需要额外的轮询线程。事件从发生到计入评分的延迟不超过SCORE_INTERVAL
+        加一帧的处理时间，实际值记录在score_latency中。
         
-        # 计算频率（次数/秒）
-        self.frequency = (lTOTAL - fTOTAL) / 5    # 眨眼频率
-        self.hfrequency = (lhTOTAL - fhTOTAL) / 5  # 点头频率
-        self.yfrequency = (lmTOTAL - fmTOTAL) / 5  # 打哈欠频率
-    
-    def update_fatigue_score(self):
-        """更新疲劳评分"""
-        # 确保分数在0-100之间
-        if self.score >= 100:
-            self.score = 100
-        if self.score <= 0:
-            self.score = 0
+        Args:
+            now: 当前时间（秒），None表示使用当前时钟
             
-        # 根据眨眼频率更新分数
-        if self.frequency > 0.47 and self.frequency < 0.61:
-            self.score = self.score + 10
-        elif self.frequency > 0.62 and self.frequency < 0.95:
-            self.score = self.score + 15
-        elif self.frequency > 0.96:
-            self.score = self.score + 20
-        elif self.frequency < 0.47 and self.score >= 0:
-            self.score = self.score - 5
+        Returns:
+            bool: 本次是否更新了评分
+        """
+        now = self._now(now)
+        if self.last_score_time is None:
+            self.last_score_time = now
+            self.last_alert_time = now
+            return False
+        
+        scored = False
+        if now - self.last_score_time >= self.SCORE_INTERVAL:
+            level = self.get_fatigue_level()
+            self.calculate_frequencies(now)
+            self.update_fatigue_score()
+            self.last_score_time = now
+            scored = True
+            self._emit("score", now, self.score)
             
-        # 根据打哈欠频率更新分数
-        if self.yfrequency >= 0.2 and self.yfrequency <= 0.4:
-            self.score = self.score + 10
-        elif self.yfrequency > 0.4 and self.yfrequency <= 0.6:
-            self.score = self.score + 15
-        elif self.yfrequency > 0.6:
-            self.score = self.score + 20
-        elif self.yfrequency < 0.2 and self.score >= 0:
-            self.score = self.score - 10
+            if self.pending_event_time is not None:
+                self.score_latency = now - self.pending_event_time
+                self.pending_event_time = None
             
-        # 根据点头频率更新分数
-        if self.hfrequency >= 0.2 and self.hfrequency <= 0.4:
-            self.score = self.score + 15
-        elif self.hfrequency > 0.4 and self.hfrequency <= 0.6:
-            self.score = self.score + 20
-        elif self.hfrequency > 0.6:
-            self.score = self.score + 25
-        elif self.hfrequency < 0.2 and self.score >= 0:
-            self.score = self.score - 20
+            new_level = self.get_fatigue_level()
+            if new_level != level:
+                self._emit("level", now, self.score)
+        
+        if now - self.last_alert_time >= self.ALERT_INTERVAL:
+            self.check_and_alert()
+            self.last_alert_time = now
+        
+        return scored
+    
+    def calculate_frequencies(self, now=None, window=None):
+        """计算眨眼、点头和打哈欠的频率
+        
+        基于事件时间戳在滑动窗口内计数，不阻塞调用线程
+        
+        Args:
+            now: 窗口结束时间（秒），None表示使用当前时钟
+            window: 窗口长度（秒），None表示使用配置文件中的FREQ_WINDOW
+        """
+        now = self._now(now)
+        window = window or self.FREQ_WINDOW
+        
+        # 计算频率（次数/秒）
+        self.frequency = self.blink_events.rate(now, window)   # 眨眼频率
+        self.hfrequency = self.nod_events.rate(now, window)    # 点头频率
+        self.yfrequency = self.yawn_events.rate(now, window)   # 打哈欠频率
+    
+    def get_rates(self, window, now=None):
+        """查询任意时间窗口内的事件频率，不改变当前评分所用的频率
+        
+        Args:
+            window: 窗口长度（秒）
+            now: 窗口结束时间（秒），None表示使用当前时钟
             
-        # 确保分数在0-100之间
-        if self.score >= 100:
-            self.score = 100
-        if self.score <= 0:
-            self.score = 0
+        Returns:
+            dict: {"blink", "yawn", "nod"}，单位为次/秒
+        """
+        now = self._now(now)
+        return {
+            "blink": self.blink_events.rate(now, window),
+            "yawn": self.yawn_events.rate(now, window),
+            "nod": self.nod_events.rate(now, window),
+        }
+    
+    def update_fatigue_score(self):
+        """更新疲劳评分（评分规则见fatigue_scoring.update_score）"""
+        self.score = fatigue_scoring.update_score(self.score, self.frequency, self.yfrequency, self.hfrequency)
     
     def get_fatigue_level(self):
         """获取疲劳等级
@@ -227,14 +427,7 @@ class FatigueAnalyzer:
         Returns:
             str: 疲劳等级 ("normal", "mild", "moderate", "severe")
         """
-        if self.score < 30:
-            return "normal"
-        elif self.score >= 30 and self.score <= 55:
-            return "mild"
-        elif self.score > 55 and self.score <= 75:
-            return "moderate"
-        else:  # self.score > 75
-            return "severe"
+        return fatigue_scoring.fatigue_level(self.score)
     
     def check_and_alert(self):
         """检查疲劳状态并发出警报"""
@@ -244,19 +437,22 @@ class FatigueAnalyzer:
             if self.ui_callback:
                 self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + 
                                u"警报警报已进入轻度疲劳，请打起精神！！\n准备开始语音播报\n")
-            speech_utils.speak(speech_utils.MESSAGES["fatigue_mild"])
+            if self.enable_speech:
+                speech_utils.announce("fatigue_mild")
         
         elif fatigue_level == "moderate":
             if self.ui_callback:
                 self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + 
                                u"警报警报已进入中度疲劳，请尽快打起精神！！！\n准备开始语音播报\n")
-            speech_utils.speak(speech_utils.MESSAGES["fatigue_moderate"])
+            if self.enable_speech:
+                speech_utils.announce("fatigue_moderate")
         
         elif fatigue_level == "severe":
             if self.ui_callback:
                 self.ui_callback(time.strftime('%Y-%m-%d %H:%M ', time.localtime()) + 
                                u"警报警报已进入重度疲劳，请靠边停车，已为您自动报警\n准备开始语音播报\n")
-            speech_utils.speak(speech_utils.MESSAGES["fatigue_severe"])
+            if self.enable_speech:
+                speech_utils.announce("fatigue_severe")
     
     def get_status_info(self):
         """获取当前状态信息
@@ -272,5 +468,36 @@ class FatigueAnalyzer:
             "yawn_frequency": self.yfrequency,
             "nod_frequency": self.hfrequency,
             "fatigue_score": self.score,
-            "fatigue_level": self.get_fatigue_level()
-        }
\ No newline at end of file
+            "fatigue_level": self.get_fatigue_level(),
+            "score_latency": self.score_latency,
+            "mean_ear": self.mean_ear(),
+            "perclos": self.perclos(),
+            "calibrating": self.calibrating,
+            "ear_thresh": self.EYE_AR_THRESH,
+            "mar_thresh": self.MAR_THRESH
+        }
+
+    def mean_ear(self, window=None, now=None):
+        """最近一段时间内检出人脸的帧的平均眼睛纵横比
+
+        Args:
+            window: 统计窗口（秒），None表示PERCLOS_WINDOW
+            now: 窗口结束时间，None表示最近一帧的时间
+
+        Returns:
+            float: 平均EAR，窗口内没有检出人脸时返回None
+        """
+        return self.history.mean_ear(self.PERCLOS_WINDOW if window is None else window, now)
+
+    def perclos(self, window=None, now=None):
+        """最近一段时间内眼睛闭合（EAR小于EYE_AR_THRESH）的帧所占比例
+
+        Args:
+            window: 统计窗口（秒），None表示PERCLOS_WINDOW
+            now: 窗口结束时间，None表示最近一帧的时间
+
+        Returns:
+            float: 0-1之间的比例，窗口内没有检出人脸时返回None
+        """
+        return self.history.perclos(self.PERCLOS_WINDOW if window is None else window,
+                                    self.EYE_AR_THRESH, now)
\ No newline at end of file
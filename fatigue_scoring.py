@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""疲劳评分规则
+
+FatigueAnalyzer.update_fatigue_score使用的评分规则，以及对同一规则的NumPy
+向量化实现：一次计算成千上万组参数（或多个会话）的评分，结果与逐个调用
+update_score完全相同。参数扫描和车队统计都复用这里的实现，保证离线结果与
+车载实时评分一致。
+"""
+
+import numpy as np
+
+# 疲劳等级（下标即fatigue_level_index的返回值）
+LEVELS = ("normal", "mild", "moderate", "severe")
+
+
+def _clamp(score):
+    """确保分数在0-100之间"""
+    if score >= 100:
+        score = 100
+    if score <= 0:
+        score = 0
+    return score
+
+
+def update_score(score, blink_freq, yawn_freq, nod_freq):
+    """按眨眼、打哈欠和点头频率更新一次疲劳评分
+
+    Args:
+        score: 当前评分
+        blink_freq: 眨眼频率（次/秒）
+        yawn_freq: 打哈欠频率（次/秒）
+        nod_freq: 点头频率（次/秒）
+
+    Returns:
+        int: 更新后的评分（0-100）
+    """
+    score = _clamp(score)
+
+    # 根据眨眼频率更新分数
+    if blink_freq > 0.47 and blink_freq < 0.61:
+        score = score + 10
+    elif blink_freq > 0.62 and blink_freq < 0.95:
+        score = score + 15
+    elif blink_freq > 0.96:
+        score = score + 20
+    elif blink_freq < 0.47 and score >= 0:
+        score = score - 5
+
+    # 根据打哈欠频率更新分数
+    if yawn_freq >= 0.2 and yawn_freq <= 0.4:
+        score = score + 10
+    elif yawn_freq > 0.4 and yawn_freq <= 0.6:
+        score = score + 15
+    elif yawn_freq > 0.6:
+        score = score + 20
+    elif yawn_freq < 0.2 and score >= 0:
+        score = score - 10
+
+    # 根据点头频率更新分数
+    if nod_freq >= 0.2 and nod_freq <= 0.4:
+        score = score + 15
+    elif nod_freq > 0.4 and nod_freq <= 0.6:
+        score = score + 20
+    elif nod_freq > 0.6:
+        score = score + 25
+    elif nod_freq < 0.2 and score >= 0:
+        score = score - 20
+
+    return _clamp(score)
+
+
+def fatigue_level(score):
+    """由评分得到疲劳等级 ("normal", "mild", "moderate", "severe")"""
+    if score < 30:
+        return "normal"
+    elif score >= 30 and score <= 55:
+        return "mild"
+    elif score > 55 and score <= 75:
+        return "moderate"
+    else:  # score > 75
+        return "severe"
+
+
+def update_scores(scores, blink_freq, yawn_freq, nod_freq):
+    """update_score的向量化版本，参数按NumPy规则广播
+
+    Args:
+        scores: 当前评分数组（整数）
+        blink_freq: 眨眼频率数组
+        yawn_freq: 打哈欠频率数组
+        nod_freq: 点头频率数组
+
+    Returns:
+        ndarray: 更新后的评分，形状为各参数广播后的形状
+    """
+    scores = np.clip(scores, 0, 100)
+
+    b = np.asarray(blink_freq)
+    scores = scores + np.select(
+        [(b > 0.47) & (b < 0.61), (b > 0.62) & (b < 0.95), b > 0.96, (b < 0.47) & (scores >= 0)],
+        [10, 15, 20, -5], 0)
+
+    y = np.asarray(yawn_freq)
+    scores = scores + np.select(
+        [(y >= 0.2) & (y <= 0.4), (y > 0.4) & (y <= 0.6), y > 0.6, (y < 0.2) & (scores >= 0)],
+        [10, 15, 20, -10], 0)
+
+    n = np.asarray(nod_freq)
+    scores = scores + np.select(
+        [(n >= 0.2) & (n <= 0.4), (n > 0.4) & (n <= 0.6), n > 0.6, (n < 0.2) & (scores >= 0)],
+        [15, 20, 25, -20], 0)
+
+    return np.clip(scores, 0, 100)
+
+
+def fatigue_level_index(scores):
+    """fatigue_level的向量化版本，返回LEVELS中的下标数组"""
+    scores = np.asarray(scores)
+    return np.select([scores < 30, scores <= 55, scores <= 75], [0, 1, 2], 3)
+
+
+def score_series(scores, blink_rates, yawn_rates, nod_rates):
+    """按评分节拍依次更新评分
+
+    Args:
+        scores: 初始评分数组（可广播到各频率数组除最后一维外的形状）
+        blink_rates: 形状(..., T)的眨眼频率，最后一维为评分节拍
+        yawn_rates: 形状(..., T)的打哈欠频率
+        nod_rates: 形状(..., T)的点头频率
+
+    Returns:
+        ndarray: 形状(..., T)的每个节拍更新后的评分
+    """
+    blink_rates, yawn_rates, nod_rates = np.broadcast_arrays(blink_rates, yawn_rates, nod_rates)
+    ticks = blink_rates.shape[-1]
+    scores = np.broadcast_to(np.asarray(scores, dtype=np.int64), blink_rates.shape[:-1])
+    history = np.empty(blink_rates.shape, dtype=np.int64)
+    for t in range(ticks):
+        scores = update_scores(scores, blink_rates[..., t], yawn_rates[..., t], nod_rates[..., t])
+        history[..., t] = scores
+    return history
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""车队统计
+
+对大量会话日志（session_log）按线路和时段（一天中的小时）统计眨眼/打哈欠/点头
+频率和疲劳评分分布，如“各线路每个小时的P95疲劳评分”。
+
+评分分布按日志中记录的评分（"score"事件，即FatigueAnalyzer实际的评分节拍和
+评分）统计。同时由事件时间戳计算各节拍的频率（与EventRateEstimator.rate一致），
+用fatigue_scoring.score_series重新计算评分轨迹：一批会话的评分按节拍同时更新，
+规则与FatigueAnalyzer.update_fatigue_score完全相同，初始评分和会话开始前
+FREQ_WINDOW内的事件取自日志中记录的分析器延续状态（见session_log）。重算结果
+与记录不一致的节拍数单独统计，用于发现评分规则或配置的差异。
+
+会话日志分批交给进程池处理，每批得到可合并的部分统计（每个线路、小时的101格
+评分直方图、事件数和时长），主进程只做数组加法。评分为0-100的整数，合并后的
+直方图给出精确的分位数，不需要保存逐节拍的评分。各批之间没有依赖，吞吐量随
+CPU核数线性增长，直到磁盘读取成为瓶颈。
+
+用法:
+    python fleet_analytics.py ./sessions /data/fleet --since 20240101 --until 20240331 \\
+        --workers 8 -o fleet.csv
+"""
+
+import os
+import csv
+import math
+import time
+import argparse
+import functools
+import multiprocessing
+import numpy as np
+import config
+import fatigue_scoring
+import param_sweep
+import session_log
+
+# 统计的事件类型
+RATE_EVENTS = ("blink", "yawn", "nod")
+
+# 评分直方图的格数（评分0-100）
+SCORE_BINS = 101
+
+# 结果中的统计列
+RESULT_FIELDS = ["route", "hour", "sessions", "hours", "blink_per_min", "yawn_per_min", "nod_per_min",
+                 "ticks", "mean_score", "p50_score", "p95_score", "max_score", "alert_fraction"]
+
+
+class RouteStats:
+    """一条线路按小时（0-23）的部分统计，可直接相加合并"""
+
+    __slots__ = ("scores", "events", "exposure", "sessions")
+
+    def __init__(self):
+        self.scores = np.zeros((24, SCORE_BINS), dtype=np.int64)         # 各小时的评分直方图
+        self.events = np.zeros((len(RATE_EVENTS), 24), dtype=np.int64)  # 各小时的事件数
+        self.exposure = np.zeros(24)                                     # 各小时的会话时长（秒）
+        self.sessions = np.zeros(24, dtype=np.int64)                     # 各小时有记录的会话数
+
+    def merge(self, other):
+        self.scores += other.scores
+        self.events += other.events
+        self.exposure += other.exposure
+        self.sessions += other.sessions
+
+
+class FleetAggregate:
+    """按线路的部分统计，以及处理的会话数、节拍数和重算评分不一致的节拍数、视频流数"""
+
+    def __init__(self):
+        self.routes = {}
+        self.sessions = 0
+        self.records = 0
+        self.ticks = 0
+        self.mismatches = 0
+        self.mismatched_streams = 0
+        self.errors = []
+
+    def route(self, name):
+        stats = self.routes.get(name)
+        if stats is None:
+            stats = self.routes[name] = RouteStats()
+        return stats
+
+    def merge(self, other):
+        """合并另一份部分统计"""
+        for name, stats in other.routes.items():
+            self.route(name).merge(stats)
+        self.sessions += other.sessions
+        self.records += other.records
+        self.ticks += other.ticks
+        self.mismatches += other.mismatches
+        self.mismatched_streams += other.mismatched_streams
+        self.errors.extend(other.errors)
+
+    def rows(self):
+        """逐行输出每条线路、每个小时的统计结果"""
+        for name in sorted(self.routes):
+            stats = self.routes[name]
+            for hour in range(24):
+                hist = stats.scores[hour]
+                ticks = int(hist.sum())
+                exposure = float(stats.exposure[hour])
+                if ticks == 0 and exposure <= 0:
+                    continue
+                minutes = exposure / 60 if exposure > 0 else float("nan")
+                row = {"route": name or "-", "hour": hour, "sessions": int(stats.sessions[hour]),
+                       "hours": round(exposure / 3600, 3)}
+                for event, count in zip(RATE_EVENTS, stats.events[:, hour]):
+                    row[f"{event}_per_min"] = round(int(count) / minutes, 3)
+                row.update(ticks=ticks, **score_summary(hist))
+                yield row
+
+
+def percentile(hist, q):
+    """由评分直方图求最近秩分位数（与对全部评分排序后取第ceil(q/100*n)个相同）
+
+    Args:
+        hist: 评分直方图（下标为评分）
+        q: 百分位（0-100）
+
+    Returns:
+        int: 分位数，直方图为空时返回None
+    """
+    total = int(hist.sum())
+    if total == 0:
+        return None
+    rank = max(math.ceil(q / 100 * total), 1)
+    return int(np.searchsorted(np.cumsum(hist), rank))
+
+
+def score_summary(hist):
+    """评分直方图的均值、P50、P95、最大值和疲劳（mild及以上）节拍比例"""
+    total = int(hist.sum())
+    if total == 0:
+        return {"mean_score": None, "p50_score": None, "p95_score": None, "max_score": None,
+                "alert_fraction": None}
+    scores = np.arange(SCORE_BINS)
+    alert = hist[fatigue_scoring.fatigue_level_index(scores) > 0].sum()
+    return {
+        "mean_score": round(float(hist @ scores) / total, 2),
+        "p50_score": percentile(hist, 50),
+        "p95_score": percentile(hist, 95),
+        "max_score": int(scores[hist > 0][-1]),
+        "alert_fraction": round(int(alert) / total, 4),
+    }
+
+
+def _utc_offsets(times):
+    """各Unix时间的本地时区偏移（秒）
+
+    会话远短于两次夏令时切换的间隔，首尾偏移相同时整个会话都使用该偏移，
+    否则（会话中切换了夏令时）逐个换算。
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) == 0:
+        return np.zeros(0)
+    first = time.localtime(times.min()).tm_gmtoff
+    if time.localtime(times.max()).tm_gmtoff == first:
+        return np.full(len(times), float(first))
+    return np.array([time.localtime(t).tm_gmtoff for t in times], dtype=np.float64)
+
+
+def _hours(start_time, offsets):
+    """会话内相对时间对应的本地时间小时（0-23）
+
+    Args:
+        start_time: 会话开始的Unix时间
+        offsets: 相对会话开始的秒数数组
+    """
+    times = start_time + np.asarray(offsets, dtype=np.float64)
+    return ((times + _utc_offsets(times)) // 3600 % 24).astype(np.int64)
+
+
+def _exposure(start_time, duration):
+    """会话时长按本地时间小时划分（秒），形状(24,)"""
+    exposure = np.zeros(24)
+    t = 0.0
+    while t < duration:
+        # 每段重新取时区偏移，夏令时切换（在整点）之后的时段计入切换后的小时
+        local = start_time + t + time.localtime(start_time + t).tm_gmtoff
+        end = min(t + (math.floor(local / 3600) + 1) * 3600 - local, duration)
+        exposure[int(local // 3600 % 24)] += end - t
+        t = end
+    return exposure
+
+
+def read_session(path):
+    """读取一个会话日志中评分重算需要的数据
+
+    Returns:
+        dict: {"start_time", "route", "duration", "records",
+               "streams": [{"initial", "ticks", "logged", "events": {事件名: 时间数组}}]}，
+              initial为该视频流的初始评分，events包含会话开始前延续的事件（时间戳为负）
+    """
+    with session_log.SessionLogReader(path) as reader:
+        records = reader.records
+        codes = records["event"]
+        stamps = records["timestamp"]
+        streams = []
+        for stream in np.unique(records["stream"]):
+            mine = records["stream"] == stream
+            ticks = mine & (codes == session_log.EVENT_CODES["score"])
+            starts = records["score"][mine & (codes == session_log.EVENT_CODES["start"])]
+            entry = {"initial": int(starts[-1]) if len(starts) else 0,
+                     "ticks": stamps[ticks].copy(), "logged": records["score"][ticks].astype(np.int64),
+                     "events": {}}
+            for event in RATE_EVENTS:
+                entry["events"][event] = stamps[mine & (codes == session_log.EVENT_CODES[event])].copy()
+            streams.append(entry)
+        return {"start_time": reader.start_time, "route": reader.route, "duration": reader.duration(),
+                "records": len(records), "streams": streams}
+
+
+def analyze_sessions(paths, freq_window=None):
+    """统计一批会话日志（进程池中的一个任务）
+
+    Args:
+        paths: 会话日志路径列表
+        freq_window: 重算评分的频率窗口（秒），None表示使用配置文件中的FREQ_WINDOW
+
+    Returns:
+        FleetAggregate: 这批会话的部分统计
+    """
+    freq_window = freq_window or config.FREQ_WINDOW
+    result = FleetAggregate()
+    sessions = []
+    for path in paths:
+        try:
+            sessions.append(read_session(path))
+        except (OSError, ValueError) as e:
+            result.errors.append(f"{path}: {str(e)}")
+
+    # 全部会话（每路视频一行）的频率排成(会话数, 最大节拍数)，评分按节拍同时更新
+    entries = [(session, entry) for session in sessions for entry in session["streams"]]
+    longest = max((len(entry["ticks"]) for _, entry in entries), default=0)
+    rates = np.zeros((len(RATE_EVENTS), len(entries), longest))
+    for row, (_, entry) in enumerate(entries):
+        ticks = entry["ticks"]
+        events = [entry["events"][event] for event in RATE_EVENTS]
+        rates[:, row, :len(ticks)] = param_sweep.event_rates(events, ticks, freq_window)
+    initial = np.array([entry["initial"] for _, entry in entries], dtype=np.int64)
+    scores = fatigue_scoring.score_series(initial, rates[0], rates[1], rates[2])
+
+    for session in sessions:
+        stats = result.route(session["route"])
+        exposure = _exposure(session["start_time"], session["duration"])
+        stats.exposure += exposure
+        stats.sessions += exposure > 0
+        result.sessions += 1
+        result.records += session["records"]
+    for row, (session, entry) in enumerate(entries):
+        stats = result.route(session["route"])
+        ticks = entry["ticks"]
+        logged = entry["logged"]
+        hours = _hours(session["start_time"], ticks)
+        stats.scores += np.bincount(hours * SCORE_BINS + logged,
+                                    minlength=24 * SCORE_BINS).reshape(24, SCORE_BINS)
+        for i, event in enumerate(RATE_EVENTS):
+            times = entry["events"][event]
+            # 会话开始前延续的事件只用于频率窗口
+            stats.events[i] += np.bincount(_hours(session["start_time"], times[times >= 0]), minlength=24)
+        result.ticks += len(ticks)
+        mismatches = int(np.count_nonzero(scores[row, :len(ticks)] != logged))
+        result.mismatches += mismatches
+        result.mismatched_streams += mismatches > 0
+    return result
+
+
+def list_logs(directories, since=None, until=None):
+    """列出开始日期在[since, until]内的会话日志（YYYYMMDD，按文件名中的开始时间）"""
+    paths = session_log.list_sessions(directories)
+    if since or until:
+        paths = [p for p in paths
+                 if (since or "") <= os.path.basename(p)[:8] <= (until or "99999999")]
+    return paths
+
+
+def analyze(paths, workers=None, chunk_size=32, freq_window=None):
+    """用进程池统计全部会话日志并合并
+
+    Args:
+        paths: 会话日志路径列表
+        workers: 工作进程数，None表示CPU核数，1表示在当前进程中处理
+        chunk_size: 每个任务处理的会话数
+        freq_window: 重算评分的频率窗口（秒），None表示使用配置文件中的FREQ_WINDOW
+
+    Returns:
+        FleetAggregate: 合并后的统计
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    task = functools.partial(analyze_sessions, freq_window=freq_window)
+    result = FleetAggregate()
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            result.merge(task(chunk))
+        return result
+    with multiprocessing.Pool(min(workers, len(chunks))) as pool:
+        for partial in pool.imap_unordered(task, chunks):
+            result.merge(partial)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="车队会话日志统计")
+    parser.add_argument("dirs", nargs="+", help="会话日志目录（递归查找）")
+    parser.add_argument("--since", help="只统计该日（YYYYMMDD）及之后开始的会话")
+    parser.add_argument("--until", help="只统计该日（YYYYMMDD）及之前开始的会话")
+    parser.add_argument("--workers", type=int, help="工作进程数，默认为CPU核数，1表示不使用进程池")
+    parser.add_argument("--chunk-size", type=int, default=32, help="每个任务处理的会话数")
+    parser.add_argument("--freq-window", type=float,
+                        help="重算评分的频率窗口（秒），默认使用配置文件中的FREQ_WINDOW")
+    parser.add_argument("-o", "--output", help="结果的CSV输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = list_logs(args.dirs, args.since, args.until)
+    start = time.time()
+    result = analyze(paths, args.workers, args.chunk_size, args.freq_window)
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"{result.sessions}个会话, {result.records}条记录, {result.ticks}个评分节拍, "
+          f"用时{elapsed:.2f}s ({result.sessions / elapsed:.0f}会话/s)")
+    if result.mismatches:
+        print(f"警告: {result.mismatched_streams}路视频的{result.mismatches}个节拍重算评分与日志记录不一致"
+              "（评分规则或配置可能已改变），评分分布按日志记录统计")
+    for error in result.errors:
+        print(f"读取失败 {error}")
+
+    rows = list(result.rows())
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    for row in rows:
+        print(", ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
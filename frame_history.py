@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""逐帧历史记录
+
+固定容量、预先分配的NumPy环形缓冲区，保存最近若干帧的时间戳、是否检出人脸、
+EAR、MAR和俯仰角。记录一帧只是几次数组元素赋值，内存占用与运行时长无关（12小时
+连续运行也不会增长）；按时间窗口的趋势查询（平均EAR、PERCLOS等）先二分查找
+窗口起点，再对窗口内的连续切片做一次向量化计算。
+"""
+
+import numpy as np
+
+
+class FrameHistory:
+    """逐帧信号的环形缓冲区"""
+
+    __slots__ = ("capacity", "timestamps", "face", "ear", "mar", "pitch", "start", "count", "total")
+
+    def __init__(self, capacity):
+        """初始化并预先分配全部内存
+
+        Args:
+            capacity: 最多保留的帧数，超出后覆盖最早的帧
+        """
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.face = np.zeros(capacity, dtype=bool)
+        self.ear = np.full(capacity, np.nan, dtype=np.float32)
+        self.mar = np.full(capacity, np.nan, dtype=np.float32)
+        self.pitch = np.full(capacity, np.nan, dtype=np.float32)
+        self.start = 0   # 最早一帧在缓冲区中的位置
+        self.count = 0   # 缓冲区中的帧数
+        self.total = 0   # 累计记录的帧数（包括已被覆盖的）
+
+    def append(self, timestamp, face, ear=None, mar=None, pitch=None):
+        """记录一帧，时间戳需单调不减
+
+        Args:
+            timestamp: 帧时间戳（秒）
+            face: 是否检出人脸
+            ear: 眼睛纵横比，未检出人脸时为None
+            mar: 嘴部纵横比，未检出人脸时为None
+            pitch: 俯仰角（度），未检出人脸时为None
+        """
+        if self.count < self.capacity:
+            i = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            i = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.timestamps[i] = timestamp
+        self.face[i] = face
+        self.ear[i] = np.nan if ear is None else ear
+        self.mar[i] = np.nan if mar is None else mar
+        self.pitch[i] = np.nan if pitch is None else pitch
+        self.total += 1
+
+    def clear(self):
+        """清空所有记录"""
+        self.start = 0
+        self.count = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.count
+
+    def _index_after(self, timestamp):
+        """时间戳大于timestamp的第一帧在时间顺序中的序号（二分查找）"""
+        if self.count < self.capacity:  # 未写满时start始终为0
+            return int(np.searchsorted(self.timestamps[:self.count], timestamp, side="right"))
+        # 写满后按时间顺序为[start:]和[:start]两段，各自有序
+        older = self.timestamps[self.start:]
+        index = int(np.searchsorted(older, timestamp, side="right"))
+        if index < len(older):
+            return index
+        return len(older) + int(np.searchsorted(self.timestamps[:self.start], timestamp, side="right"))
+
+    def _slices(self, begin, end):
+        """时间顺序中[begin, end)对应的缓冲区切片（环形缓冲区最多分成两段）"""
+        first = (self.start + begin) % self.capacity
+        length = end - begin
+        if length <= 0:
+            return []
+        if first + length <= self.capacity:
+            return [slice(first, first + length)]
+        return [slice(first, self.capacity), slice(0, first + length - self.capacity)]
+
+    def window(self, seconds, now=None):
+        """取出时间窗口(now - seconds, now]内的数据（按时间顺序的副本）
+
+        Args:
+            seconds: 窗口长度（秒）
+            now: 窗口结束时间，None表示最近一帧的时间
+
+        Returns:
+            dict: {"timestamps", "face", "ear", "mar", "pitch"}
+        """
+        begin, end = self._window_range(seconds, now)
+        parts = self._slices(begin, end)
+        return {name: np.concatenate([getattr(self, name)[s] for s in parts]) if parts
+                else getattr(self, name)[:0].copy()
+                for name in ("timestamps", "face", "ear", "mar", "pitch")}
+
+    def _window_range(self, seconds, now=None):
+        if self.count == 0:
+            return 0, 0
+        if now is None:
+            now = self.timestamps[(self.start + self.count - 1) % self.capacity]
+        return self._index_after(now - seconds), self._index_after(now)
+
+    def _reduce(self, seconds, now, func):
+        """在窗口内的各段上计算(分子, 分母)并求和，避免复制数据"""
+        begin, end = self._window_range(seconds, now)
+        numerator, denominator = 0.0, 0
+        for s in self._slices(begin, end):
+            n, d = func(s)
+            numerator += n
+            denominator += d
+        return numerator / denominator if denominator else None
+
+    def mean(self, signal, seconds, now=None):
+        """窗口内检出人脸的帧的信号均值
+
+        Args:
+            signal: "ear"、"mar"或"pitch"
+            seconds: 窗口长度（秒）
+            now: 窗口结束时间，None表示最近一帧的时间
+
+        Returns:
+            float: 均值，窗口内没有检出人脸的帧时返回None
+        """
+        values = getattr(self, signal)
+
+        def func(s):
+            face = self.face[s]
+            return float(values[s][face].sum(dtype=np.float64)), int(face.sum())
+        return self._reduce(seconds, now, func)
+
+    def mean_ear(self, seconds, now=None):
+        """窗口内的平均眼睛纵横比"""
+        return self.mean("ear", seconds, now)
+
+    def perclos(self, seconds, threshold, now=None):
+        """PERCLOS：窗口内检出人脸的帧中眼睛闭合（EAR小于阈值）的比例
+
+        Args:
+            seconds: 窗口长度（秒）
+            threshold: 眼睛闭合的EAR阈值
+            now: 窗口结束时间，None表示最近一帧的时间
+
+        Returns:
+            float: 0-1之间的比例，窗口内没有检出人脸的帧时返回None
+        """
+        def func(s):
+            face = self.face[s]
+            return int((self.ear[s][face] < threshold).sum()), int(face.sum())
+        return self._reduce(seconds, now, func)
+
+    def face_ratio(self, seconds, now=None):
+        """窗口内检出人脸的帧的比例，窗口内没有帧时返回None"""
+        def func(s):
+            return int(self.face[s].sum()), s.stop - s.start
+        return self._reduce(seconds, now, func)
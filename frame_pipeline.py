@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""多进程帧处理流水线
+
+采集阶段按顺序把视频帧分发给一组工作进程，每个工作进程持有自己的FaceDetector；
+检测结果经过重排序缓冲区后按帧序号依次交还调用方，因此FatigueAnalyzer的
+update_blink/update_yawn/update_nod仍然按帧顺序执行。
+
+相邻帧会被分发到不同的进程，帧间状态无法延续，工作进程的检测器使用无状态设置
+（FaceDetector.make_stateless：关闭跟踪、特征点滤波和姿态估计的热启动，每帧都进行
+全图检测）。串行模式使用同样的设置时（offline_processor --stateless），逐帧结果和
+计数与流水线模式完全相同；默认配置下串行模式使用跟踪、滤波和热启动，特征点和
+计数会有少量差异。
+"""
+
+import os
+import queue
+import multiprocessing
+import config
+import face_detector
+import metrics
+
+# 运行指标：在处理中的帧数和重排序缓冲区中等待的结果数（在主进程中记录）
+_QUEUE_DEPTH = metrics.gauge("queue_depth", "各队列中等待处理的数量", ["queue"])
+_IN_FLIGHT = _QUEUE_DEPTH.labels("pipeline_in_flight")
+_REORDER = _QUEUE_DEPTH.labels("pipeline_reorder")
+
+# 工作进程内的人脸检测器（每个进程一个）
+_worker_detector = None
+
+
+def _init_worker(predictor_path, detect_scale):
+    """工作进程初始化：加载本进程自己的人脸检测器"""
+    global _worker_detector
+    _worker_detector = face_detector.FaceDetector(predictor_path, tracking=False, detect_scale=detect_scale)
+    # 相邻帧落在不同进程，不使用任何帧间状态
+    _worker_detector.make_stateless()
+
+
+def _detect_worker(seq, frame):
+    """工作进程中执行的检测任务
+
+    Returns:
+        tuple: (帧序号, detect_face的返回值)，检测出错时返回值为None
+    """
+    try:
+        return seq, _worker_detector.detect_face(frame)
+    except Exception as e:
+        print(f"工作进程检测错误(帧{seq}): {str(e)}")
+        return seq, None
+
+
+def detect_faces_task(key, seq, frame):
+    """工作进程中执行的多人脸检测任务
+
+    Returns:
+        tuple: (来源标识, 帧序号, detect_faces的返回值)，检测出错时返回空列表
+    """
+    try:
+        return key, seq, _worker_detector.detect_faces(frame)
+    except Exception as e:
+        print(f"工作进程检测错误({key}帧{seq}): {str(e)}")
+        return key, seq, []
+
+
+def failure_callback(results, item):
+    """生成apply_async的error_callback
+
+    任务在_detect_worker的异常处理之外失败时（如参数无法传给工作进程）不会调用
+    callback，这里放入与检测出错相同的失败结果，等待结果的一方不会永久阻塞。
+
+    Args:
+        results: 结果队列
+        item: 失败时放入队列的结果
+    """
+    def on_error(error):
+        metrics.ERRORS.labels("pipeline").inc()
+        print(f"检测任务失败: {str(error)}")
+        results.put(item)
+    return on_error
+
+
+class ReorderBuffer:
+    """重排序缓冲区：乱序到达的结果按帧序号连续输出"""
+
+    def __init__(self, start=0):
+        self.next_seq = start  # 下一个应输出的帧序号
+        self.pending = {}      # 已到达但还不能输出的结果
+
+    def push(self, seq, item):
+        """放入一个结果"""
+        self.pending[seq] = item
+
+    def pop_ready(self):
+        """取出从next_seq开始连续可输出的结果
+
+        Yields:
+            tuple: (帧序号, 结果)
+        """
+        while self.next_seq in self.pending:
+            seq = self.next_seq
+            self.next_seq += 1
+            yield seq, self.pending.pop(seq)
+
+    def __len__(self):
+        return len(self.pending)
+
+
+def create_pool(workers, predictor_path="./model/shape_predictor_68_face_landmarks.dat", detect_scale=None):
+    """创建检测工作进程池，每个进程加载自己的人脸检测器
+
+    Args:
+        workers: 工作进程数
+        predictor_path: 68点特征预测模型路径
+        detect_scale: 人脸检测缩放比例，None表示使用配置文件中的设置
+
+    Returns:
+        multiprocessing.Pool: 工作进程池
+    """
+    return multiprocessing.Pool(workers, initializer=_init_worker, initargs=(predictor_path, detect_scale))
+
+
+class FramePipeline:
+    """多进程帧处理流水线"""
+
+    def __init__(self, workers=None, predictor_path="./model/shape_predictor_68_face_landmarks.dat",
+                 detect_scale=None, max_in_flight=None):
+        """初始化流水线
+
+        Args:
+            workers: 工作进程数，None表示使用CPU核数
+            predictor_path: 68点特征预测模型路径
+            detect_scale: 人脸检测缩放比例，None表示使用配置文件中的设置
+            max_in_flight: 同时在处理中的最大帧数，限制内存占用并形成背压
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.task_timeout = config.PIPELINE_TASK_TIMEOUT
+        self.pool = create_pool(self.workers, predictor_path, detect_scale)
+
+    def process(self, frames):
+        """按顺序处理帧序列
+
+        Args:
+            frames: 可迭代对象，每个元素为(附加信息, 视频帧)
+
+        Yields:
+            tuple: (附加信息, 视频帧, detect_face的返回值)，顺序与输入一致
+        """
+        results = queue.Queue()
+        buffer = ReorderBuffer()
+        pending = {}  # 帧序号 -> (附加信息, 视频帧)
+        frames = iter(frames)
+        exhausted = False
+        seq = 0
+
+        while True:
+            # 采集阶段：在处理中的帧数未达上限时继续分发
+            while not exhausted and len(pending) < self.max_in_flight:
+                try:
+                    meta, frame = next(frames)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[seq] = (meta, frame)
+                self.pool.apply_async(_detect_worker, (seq, frame), callback=results.put,
+                                      error_callback=failure_callback(results, (seq, None)))
+                seq += 1
+
+            _IN_FLIGHT.set(len(pending))
+            if not pending:
+                break
+
+            # 等待任意一个结果，放入重排序缓冲区后按顺序输出
+            try:
+                done_seq, result = results.get(timeout=self.task_timeout)
+            except queue.Empty:
+                # 工作进程异常退出时任务丢失、不会有结果：最早未完成的帧按检测失败处理
+                done_seq, result = buffer.next_seq, None
+                metrics.ERRORS.labels("pipeline_timeout").inc()
+                print(f"检测任务超时(帧{done_seq})")
+            if done_seq < buffer.next_seq:
+                continue  # 已按超时处理的帧迟到的结果
+            buffer.push(done_seq, result)
+            for ready_seq, ready_result in buffer.pop_ready():
+                meta, frame = pending.pop(ready_seq)
+                yield meta, frame, ready_result
+            _REORDER.set(len(buffer))
+
+    def close(self):
+        """关闭工作进程池"""
+        self.pool.terminate()
+        self.pool.join()
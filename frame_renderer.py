@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""显示渲染模块
+
+检测循环只把最新一帧及其分析结果交给渲染器（不复制、不等待），渲染线程按
+独立的显示帧率取最新一帧绘制特征点和信息框，并缩放、转换到预分配的显示画布上，
+再交给界面显示。窗口最小化或无界面运行时不进行任何渲染，分析吞吐量不再受
+显示开销影响。本模块不依赖wxPython，显示由调用方提供的回调完成。
+"""
+
+import time
+import threading
+import cv2
+import numpy as np
+import metrics
+
+# 半透明信息框区域 (left, top, right, bottom)，与原界面一致
+INFO_BOX = (5, 5, 300, 180)
+# 信息框内保留的原图亮度（等价于黑色底框以0.3的权重叠加）
+INFO_ALPHA = 0.7
+
+# 运行指标：渲染耗时、已渲染和跳过的帧数
+_RENDER_SECONDS = metrics.histogram("render_seconds", "渲染一帧（绘制、叠加和显示转换）的耗时（秒）")
+_RENDERED = metrics.counter("frames_rendered_total", "已渲染显示的帧数")
+_RENDER_SKIPPED = metrics.counter("frames_render_skipped_total", "未渲染的帧数（按原因）", ["reason"])
+_SKIP_REPLACED = _RENDER_SKIPPED.labels("replaced")
+_SKIP_HIDDEN = _RENDER_SKIPPED.labels("hidden")
+_SKIP_BUSY = _RENDER_SKIPPED.labels("busy")
+
+
+class FrameRenderer:
+    """按显示帧率渲染最新一帧"""
+
+    def __init__(self, detector, present, get_size=None, is_visible=None, fps=15):
+        """初始化渲染器
+
+        Args:
+            detector: 人脸检测器实例（用于绘制人脸特征）
+            present: 显示回调，参数为(RGB画布, 宽, 高, 状态信息)；界面使用完画布后需调用release()
+            get_size: 返回显示区域(宽, 高)的函数，None表示使用帧的原始尺寸
+            is_visible: 返回当前是否需要显示的函数（如窗口未最小化），None表示始终显示
+            fps: 显示帧率
+        """
+        self.detector = detector
+        self.present = present
+        self.get_size = get_size
+        self.is_visible = is_visible
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+
+        self.lock = threading.Lock()
+        self.latest = None            # 最新提交的 (帧, 人脸特征, 状态信息, FPS)
+        self.present_pending = False  # 画布是否仍在被界面使用
+        self.running = False
+        self.thread = None
+
+        # 预分配的缓冲区，尺寸变化时才重新分配
+        self._info_buf = None
+        self._layout_key = None
+        self._layout = None
+        self._resized = None
+        self._rgb = None
+        self._canvas = None
+
+    def start(self):
+        """启动渲染线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止渲染线程"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(1.0)
+            self.thread = None
+
+    def submit(self, frame, face, status, fps):
+        """提交最新一帧（只保存引用，调用方之后不能再修改该帧）
+
+        Args:
+            frame: 视频帧
+            face: (shape, leftEye, rightEye, mouth)，未检测到人脸时为None
+            status: 疲劳分析器的状态信息
+            fps: 分析帧率
+        """
+        with self.lock:
+            if self.latest is not None:
+                # 上一帧还没来得及渲染就被新帧替换
+                _SKIP_REPLACED.inc()
+            self.latest = (frame, face, status, fps)
+
+    def release(self):
+        """界面已使用完画布，可以渲染下一帧"""
+        self.present_pending = False
+
+    def _run(self):
+        """渲染线程主循环"""
+        while self.running:
+            start = time.perf_counter()
+            with self.lock:
+                item, self.latest = self.latest, None
+
+            visible = self.is_visible is None or self.is_visible()
+            if item is not None and visible and not self.present_pending:
+                try:
+                    self.render(*item)
+                    _RENDERED.inc()
+                    _RENDER_SECONDS.observe(time.perf_counter() - start)
+                except Exception as e:
+                    metrics.ERRORS.labels("render").inc()
+                    print(f"渲染错误: {str(e)}")
+            elif item is not None:
+                (_SKIP_HIDDEN if not visible else _SKIP_BUSY).inc()
+
+            # 按显示帧率休眠，剩余时间不足时直接进入下一轮
+            remaining = self.interval - (time.perf_counter() - start)
+            time.sleep(remaining if remaining > 0 else 0.001)
+
+    def render(self, frame, face, status, fps):
+        """绘制并显示一帧"""
+        self.annotate(frame, face, status, fps)
+
+        if self.get_size is not None:
+            width, height = self.get_size()
+        else:
+            height, width = frame.shape[:2]
+        canvas = self.to_display(frame, width, height)
+
+        self.present_pending = True
+        self.present(canvas, width, height, status)
+
+    def annotate(self, frame, face, status, fps):
+        """在帧上绘制人脸特征、疲劳程度和半透明信息框（原地修改）"""
+        if face is not None:
+            shape, leftEye, rightEye, mouth = face
+            self.detector.draw_face_features(frame, shape, leftEye, rightEye, mouth)
+        else:
+            cv2.putText(frame, "No Face", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3, cv2.LINE_AA)
+
+        # 在图像上显示疲劳程度
+        fatigue_level = status["fatigue_level"]
+        if fatigue_level == "mild":
+            cv2.putText(frame, "轻度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+        elif fatigue_level == "moderate":
+            cv2.putText(frame, "中度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+        elif fatigue_level == "severe":
+            cv2.putText(frame, "重度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+
+        # 半透明背景只在信息框区域内计算，不复制整帧
+        self.blend_info_box(frame)
+
+        # 添加信息文本 - 使用英文显示，避免中文乱码问题
+        cv2.putText(frame, "Blinks: {}".format(status["blinks"]), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, "Nods: {}".format(status["nods"]), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, "Yawns: {}".format(status["yawns"]), (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, "Blink Freq: {:.2f}".format(status["blink_frequency"]), (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, "Fatigue: {}".format(status["fatigue_score"]), (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        cv2.putText(frame, 'FPS: %.2f' % (fps), (frame.shape[1] - 120, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        latency = status.get("capture_latency")
+        if latency is not None:
+            # 从采集到做出判断的延迟，反映警报落后于实际画面的时间
+            cv2.putText(frame, 'Lag: %dms' % (latency * 1000), (frame.shape[1] - 120, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        return frame
+
+    def blend_info_box(self, frame):
+        """将信息框区域调暗，效果与整帧叠加黑色矩形相同"""
+        left, top, right, bottom = INFO_BOX
+        roi = frame[top:min(bottom + 1, frame.shape[0]), left:min(right + 1, frame.shape[1])]
+        if roi.size == 0:
+            return
+        if self._info_buf is None or self._info_buf.shape != roi.shape:
+            self._info_buf = np.empty_like(roi)
+        cv2.convertScaleAbs(roi, dst=self._info_buf, alpha=INFO_ALPHA)
+        roi[...] = self._info_buf
+
+    def _update_layout(self, frame_width, frame_height, width, height):
+        """显示尺寸或帧尺寸变化时重新计算布局并分配缓冲区"""
+        key = (frame_width, frame_height, width, height)
+        if key == self._layout_key:
+            return
+        aspect_ratio = frame_width / frame_height
+        if aspect_ratio > width / height:
+            # 视频帧更宽，以宽度为基准，垂直居中
+            new_width = width
+            new_height = max(int(new_width / aspect_ratio), 1)
+            x_offset, y_offset = 0, (height - new_height) // 2
+        else:
+            # 视频帧更高，以高度为基准，水平居中
+            new_height = height
+            new_width = max(int(new_height * aspect_ratio), 1)
+            x_offset, y_offset = (width - new_width) // 2, 0
+
+        self._layout_key = key
+        self._layout = (new_width, new_height, x_offset, y_offset)
+        self._resized = np.empty((new_height, new_width, 3), dtype=np.uint8)
+        self._rgb = np.empty((new_height, new_width, 3), dtype=np.uint8)
+        self._canvas = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def to_display(self, frame, width, height):
+        """将帧按比例缩放到显示区域并转换为RGB，写入复用的画布
+
+        Returns:
+            ndarray: 形状(height, width, 3)的RGB画布（每次调用返回同一块内存）
+        """
+        if width <= 0 or height <= 0:
+            width, height = 640, 480
+        frame_height, frame_width = frame.shape[:2]
+        self._update_layout(frame_width, frame_height, width, height)
+        new_width, new_height, x_offset, y_offset = self._layout
+
+        cv2.resize(frame, (new_width, new_height), dst=self._resized)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        self._canvas[y_offset:y_offset + new_height, x_offset:x_offset + new_width] = self._rgb
+        return self._canvas
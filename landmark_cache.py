@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+"""特征点缓存
+
+dlib检测结果（每帧的时间戳、是否检出人脸、68点特征点和头部姿态欧拉角）按视频
+内容哈希保存到磁盘，每个数组一个.npy文件，读取时以内存映射方式打开。调整
+EYE_AR_THRESH、MAR_THRESH、HAR_THRESH或评分规则时直接从缓存回放，不需要重新
+运行人脸检测：直接使用保存的EAR/MAR，FatigueAnalyzer按帧时间戳逐帧更新，
+速度只受内存限制。
+
+缓存目录结构:
+    <缓存目录>/<视频内容哈希>-<检测参数哈希>/
+        meta.json        视频信息和检测参数
+        timestamps.npy   float64 (N,)        帧时间戳（秒）
+        face.npy         bool    (N,)        是否检出人脸
+        landmarks.npy    int16   (N, 68, 2)  特征点坐标，未检出人脸的帧为0
+        euler.npy        float64 (N, 3, 1)   欧拉角（度），未检出人脸的帧为NaN
+        ear.npy          float64 (N,)        检测时的眼睛纵横比，未检出人脸的帧为NaN
+        mar.npy          float64 (N,)        检测时的嘴部纵横比，未检出人脸的帧为NaN
+
+启用特征点滤波时实时检测的EAR/MAR由亚像素的滤波特征点计算，取整保存的特征点
+无法复现，因此同时保存检测时的EAR/MAR，回放直接使用，眨眼判断与实时检测一致。
+
+回放只使用与给定检测参数（--predictor、--detect-scale、--no-tracking、--stateless及
+配置文件中的检测设置）哈希相同的缓存，与offline_processor --cache的查找方式一致。
+
+用法:
+    python landmark_cache.py build video.mp4
+    python landmark_cache.py replay video.mp4 --ear-thresh 0.22 --mar-thresh 0.6
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import config
+import landmark_features
+
+# 缓存格式版本，格式变化时递增，旧缓存自动失效
+CACHE_VERSION = 2
+
+# 各数组的文件名
+ARRAYS = ("timestamps", "face", "landmarks", "euler", "ear", "mar")
+
+
+def video_hash(path, chunk_size=1 << 20):
+    """计算视频文件内容的blake2b哈希
+
+    Args:
+        path: 视频文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: 32位十六进制哈希
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detection_params(predictor_path="./model/shape_predictor_68_face_landmarks.dat", detect_scale=None,
+                     tracking=None, stateless=False):
+    """影响检测结果的参数，不同参数的结果分别缓存
+
+    Args:
+        predictor_path: 68点特征预测模型路径
+        detect_scale: 人脸检测缩放比例，None表示使用配置文件中的设置
+        tracking: 是否启用跟踪模式，None表示使用配置文件中的设置
+        stateless: 检测器是否使用无状态设置（FaceDetector.make_stateless，流水线模式的工作进程），
+                   此时不使用跟踪、特征点滤波和姿态热启动
+
+    Returns:
+        dict: 检测参数
+    """
+    tracking = False if stateless else config.TRACKING_ENABLED if tracking is None else tracking
+    landmark_filter = config.LANDMARK_FILTER and not stateless
+    params = {
+        "version": CACHE_VERSION,
+        "predictor": os.path.basename(predictor_path),
+        "detect_scale": config.DETECT_SCALE if detect_scale is None else detect_scale,
+        "tracking": bool(tracking),
+        "pose_fast": config.POSE_FAST,
+    }
+    if stateless:
+        params.update(stateless=True)
+    if tracking:
+        # ROI模式下不使用相关滤波跟踪器（见FaceDetector.init_detection_params）
+        params.update(track_method="landmarks" if config.ROI_MODE else config.TRACK_METHOD,
+                      detect_interval=config.DETECT_INTERVAL,
+                      track_min_psr=config.TRACK_MIN_PSR, track_min_iou=config.TRACK_MIN_IOU)
+        if config.ROI_MODE:
+            params.update(roi_padding=config.ROI_PADDING)
+    if landmark_filter:
+        params.update(filter_interval=config.LANDMARK_FILTER_INTERVAL,
+                      filter_process_noise=config.LANDMARK_PROCESS_NOISE,
+                      filter_measurement_noise=config.LANDMARK_MEASUREMENT_NOISE)
+    return params
+
+
+def _params_hash(params):
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest()
+
+
+class CacheWriter:
+    """逐帧收集检测结果，close()时一次性写入缓存目录"""
+
+    def __init__(self, path, meta):
+        """初始化
+
+        Args:
+            path: 缓存目录
+            meta: 写入meta.json的信息
+        """
+        self.path = path
+        self.meta = meta
+        self.timestamps = []
+        self.face = []
+        self.landmarks = []
+        self.euler = []
+        self.ear = []
+        self.mar = []
+
+    def add(self, timestamp, result):
+        """记录一帧detect_face的结果
+
+        Args:
+            timestamp: 帧时间戳（秒）
+            result: detect_face的返回值，检测出错时为None
+        """
+        detected = result is not None and result[0]
+        self.timestamps.append(timestamp)
+        self.face.append(detected)
+        if detected:
+            self.landmarks.append(np.asarray(result[1], dtype=np.int16))
+            self.euler.append(np.asarray(result[7][1], dtype=np.float64).reshape(3, 1))
+            self.ear.append(result[5])
+            self.mar.append(result[6])
+        else:
+            self.landmarks.append(np.zeros((68, 2), dtype=np.int16))
+            self.euler.append(np.full((3, 1), np.nan))
+            self.ear.append(np.nan)
+            self.mar.append(np.nan)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def close(self):
+        """写入缓存：先写到临时目录再重命名，中途失败不会留下不完整的缓存"""
+        count = len(self.timestamps)
+        arrays = {
+            "timestamps": np.asarray(self.timestamps, dtype=np.float64),
+            "face": np.asarray(self.face, dtype=bool),
+            "landmarks": np.stack(self.landmarks) if count else np.zeros((0, 68, 2), dtype=np.int16),
+            "euler": np.stack(self.euler) if count else np.zeros((0, 3, 1)),
+            "ear": np.asarray(self.ear, dtype=np.float64),
+            "mar": np.asarray(self.mar, dtype=np.float64),
+        }
+        tmp = f"{self.path}.tmp-{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), array)
+            meta = dict(self.meta, frames=count, created=time.strftime("%Y-%m-%dT%H:%M:%S"))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            if os.path.exists(self.path):
+                # 其他进程已写入相同的缓存
+                shutil.rmtree(tmp)
+            else:
+                os.rename(tmp, self.path)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+
+class LandmarkCache:
+    """以内存映射方式打开的特征点缓存"""
+
+    def __init__(self, path):
+        """打开缓存目录
+
+        Args:
+            path: 缓存目录
+        """
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"), mmap_mode="r")
+        self.face = np.load(os.path.join(path, "face.npy"), mmap_mode="r")
+        self.landmarks = np.load(os.path.join(path, "landmarks.npy"), mmap_mode="r")
+        self.euler = np.load(os.path.join(path, "euler.npy"), mmap_mode="r")
+        self.ear = np.load(os.path.join(path, "ear.npy"), mmap_mode="r")
+        self.mar = np.load(os.path.join(path, "mar.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def features(self):
+        """各帧检测时的眼睛纵横比和嘴部纵横比
+
+        Returns:
+            tuple: (ear, mar)，形状(N,)的数组，未检出人脸的帧为NaN
+        """
+        return np.array(self.ear), np.array(self.mar)
+
+    def results(self):
+        """按detect_face的返回格式逐帧输出缓存的结果
+
+        Yields:
+            tuple: ((帧序号, 时间戳), None, detect_face格式的结果)，重投影立方体为None
+        """
+        ear, mar = self.features()
+        no_face = (False, None, None, None, None, None, None, None)
+        for index in range(len(self)):
+            timestamp = float(self.timestamps[index])
+            if not self.face[index]:
+                yield (index, timestamp), None, no_face
+                continue
+            shape = np.asarray(self.landmarks[index], dtype=np.int64)
+            result = (True, shape, shape[landmark_features.LEFT_EYE], shape[landmark_features.RIGHT_EYE],
+                      shape[landmark_features.MOUTH], float(ear[index]), float(mar[index]),
+                      (None, np.asarray(self.euler[index])))
+            yield (index, timestamp), None, result
+
+
+class LandmarkCacheStore:
+    """缓存目录：按视频内容哈希和检测参数查找、创建缓存"""
+
+    def __init__(self, cache_dir=None, params=None):
+        """初始化
+
+        Args:
+            cache_dir: 缓存目录，None表示使用配置文件中的LANDMARK_CACHE_DIR
+            params: detection_params()的返回值，None表示使用默认检测参数
+        """
+        self.cache_dir = cache_dir or config.LANDMARK_CACHE_DIR
+        self.params = params or detection_params()
+        self._hashes = {}
+
+    def _video_hash(self, video):
+        # 同一视频在一次运行中只计算一次哈希
+        stat = os.stat(video)
+        key = (os.path.abspath(video), stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            self._hashes[key] = video_hash(video)
+        return self._hashes[key]
+
+    def path_for(self, video):
+        """视频对应的缓存目录路径"""
+        return os.path.join(self.cache_dir, f"{self._video_hash(video)}-{_params_hash(self.params)}")
+
+    def lookup(self, video):
+        """查找视频的缓存
+
+        Returns:
+            LandmarkCache: 缓存，不存在时返回None
+        """
+        path = self.path_for(video)
+        if not os.path.isfile(os.path.join(path, "meta.json")):
+            return None
+        return LandmarkCache(path)
+
+    def writer(self, video, fps=None):
+        """创建视频的缓存写入器"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta = {"video": os.path.basename(video), "hash": self._video_hash(video), "fps": fps,
+                "params": self.params}
+        return CacheWriter(self.path_for(video), meta)
+
+    def find(self, video):
+        """查找视频的所有缓存（不论检测参数），按创建时间从新到旧排列"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        prefix = self._video_hash(video) + "-"
+        paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                 if name.startswith(prefix) and os.path.isfile(os.path.join(self.cache_dir, name, "meta.json"))]
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def build(video, store, detector):
+    """运行人脸检测并写入缓存
+
+    Args:
+        video: 视频文件路径
+        store: LandmarkCacheStore
+        detector: 人脸检测器实例
+
+    Returns:
+        LandmarkCache: 写入的缓存
+    """
+    import cv2
+    from offline_processor import iter_frames
+
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise IOError(f"无法打开视频文件: {video}")
+    detector.reset_tracking()
+    detector.reset_pose()
+    writer = store.writer(video, cap.get(cv2.CAP_PROP_FPS))
+    try:
+        for _, timestamp, frame in iter_frames(cap):
+            writer.add(timestamp, detector.detect_face(frame))
+    finally:
+        cap.release()
+    writer.close()
+    return LandmarkCache(writer.path)
+
+
+def replay(cache, analyzer=None):
+    """从缓存回放，逐帧更新疲劳分析器
+
+    Args:
+        cache: LandmarkCache
+        analyzer: 疲劳分析器，None表示新建一个（不播报语音）
+
+    Returns:
+        FatigueAnalyzer: 回放后的分析器
+    """
+    if analyzer is None:
+        import fatigue_analyzer
+        analyzer = fatigue_analyzer.FatigueAnalyzer(enable_speech=False)
+
+    ear, mar = cache.features()
+    # 一次读入内存后逐帧遍历，避免每帧访问内存映射的开销
+    timestamps = np.asarray(cache.timestamps).tolist()
+    face = np.asarray(cache.face).tolist()
+    euler = np.asarray(cache.euler)
+    ear = ear.tolist()
+    mar = mar.tolist()
+    for index, timestamp in enumerate(timestamps):
+        if face[index]:
+            analyzer.update(True, ear[index], mar[index], euler[index], timestamp)
+        else:
+            analyzer.update(False, timestamp=timestamp)
+        analyzer.tick(timestamp)
+    return analyzer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="特征点缓存：构建缓存或从缓存回放疲劳分析")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="运行人脸检测并写入缓存")
+    build_parser.add_argument("--force", action="store_true", help="已有缓存时重新构建")
+
+    replay_parser = sub.add_parser("replay", help="从缓存回放（使用与检测参数对应的缓存）")
+    replay_parser.add_argument("--ear-thresh", type=float, help="眼睛长宽比阈值，默认使用配置文件中的EYE_AR_THRESH")
+    replay_parser.add_argument("--mar-thresh", type=float, help="打哈欠长宽比阈值，默认使用配置文件中的MAR_THRESH")
+    replay_parser.add_argument("--har-thresh", type=float, help="点头角度阈值，默认使用配置文件中的HAR_THRESH")
+
+    # 检测参数决定使用哪个缓存，与offline_processor --cache的参数相同
+    for p in (build_parser, replay_parser):
+        p.add_argument("videos", nargs="+", help="视频文件路径")
+        p.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                       help="68点特征预测模型路径")
+        p.add_argument("--detect-scale", type=float, help="人脸检测缩放比例，默认使用配置文件中的DETECT_SCALE")
+        p.add_argument("--no-tracking", action="store_true", help="关闭跟踪模式，每帧都进行全图人脸检测")
+        p.add_argument("--stateless", action="store_true",
+                       help="无状态检测设置（offline_processor --workers或--stateless构建的缓存）")
+        p.add_argument("--cache-dir", help="缓存目录，默认使用配置文件中的LANDMARK_CACHE_DIR")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    tracking = False if args.no_tracking else None
+    store = LandmarkCacheStore(args.cache_dir, detection_params(args.predictor, args.detect_scale, tracking,
+                                                                args.stateless))
+
+    if args.command == "build":
+        import face_detector
+        detector = None
+        for video in args.videos:
+            path = store.path_for(video)
+            if os.path.exists(path):
+                if not args.force:
+                    print(f"{video}: 已有缓存 {path}")
+                    continue
+                shutil.rmtree(path)
+            if detector is None:
+                detector = face_detector.FaceDetector(args.predictor, tracking=tracking,
+                                                      detect_scale=args.detect_scale)
+                if args.stateless:
+                    detector.make_stateless()
+            start = time.time()
+            cache = build(video, store, detector)
+            print(f"{video}: {len(cache)}帧, 用时{time.time() - start:.1f}s -> {cache.path}")
+        return
+
+    import fatigue_analyzer
+    missing = False
+    for video in args.videos:
+        cache = store.lookup(video)
+        if cache is None:
+            # 不回放其他检测参数的缓存，避免调参时混用不同检测设置的特征点
+            missing = True
+            print(f"{video}: 没有与当前检测参数对应的缓存，请先用相同的参数运行 python landmark_cache.py build")
+            for path in store.find(video):
+                with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                    print(f"  已有缓存 {path}: {json.dumps(json.load(f)['params'], sort_keys=True)}")
+            continue
+        analyzer = fatigue_analyzer.FatigueAnalyzer(enable_speech=False)
+        if args.ear_thresh is not None:
+            analyzer.EYE_AR_THRESH = args.ear_thresh
+        if args.mar_thresh is not None:
+            analyzer.MAR_THRESH = args.mar_thresh
+        if args.har_thresh is not None:
+            analyzer.HAR_THRESH = args.har_thresh
+        start = time.time()
+        replay(cache, analyzer)
+        elapsed = time.time() - start
+        status = analyzer.get_status_info()
+        print(f"{video}: {len(cache)}帧, 回放用时{elapsed:.2f}s, 眨眼{status['blinks']}次, "
+              f"打哈欠{status['yawns']}次, 点头{status['nods']}次, 疲劳评分{status['fatigue_score']}")
+    if missing:
+        raise SystemExit("部分视频没有与当前检测参数对应的缓存")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""基于68点特征点数组的批量特征计算
+
+输入为形状(N, 68, 2)的特征点数组，一次NumPy向量化运算得到N帧的眼睛纵横比(EAR)、
+嘴部纵横比(MAR)以及头部姿态估计所需的2D参考点，供离线重处理、缓存回放和多路
+视频服务批量使用。单帧计算也复用同一实现（N=1）。
+"""
+
+import numpy as np
+
+# 68点模型中各部位的索引（与imutils.face_utils.FACIAL_LANDMARKS_IDXS一致）
+RIGHT_EYE = slice(36, 42)
+LEFT_EYE = slice(42, 48)
+MOUTH = slice(48, 68)
+
+# 计算纵横比所用的特征点对（绝对索引）
+# 左眼：垂直43-47、44-46，水平42-45；右眼：垂直37-41、38-40，水平36-39
+# 嘴部：垂直50-57（51, 59）、52-55（53, 57），水平48-54（49, 55）
+_PAIRS = np.array([[43, 47], [44, 46], [42, 45],
+                   [37, 41], [38, 40], [36, 39],
+                   [50, 57], [52, 55], [48, 54]])
+
+# 头部姿态估计的14个2D参考点，顺序与config.OBJECT_PTS对应
+# 17左眉左上角/21左眉右角/22右眉左上角/26右眉右上角/36左眼左上角/39左眼右上角/42右眼左上角/
+# 45右眼右上角/31鼻子左上角/35鼻子右上角/48左上角/54嘴右上角/57嘴中央下角/8下巴角
+POSE_IDXS = np.array([17, 21, 22, 26, 36, 39, 42, 45, 31, 35, 48, 54, 57, 8])
+
+
+def _as_batch(landmarks):
+    """将特征点整理为(N, 68, 2)的float64数组"""
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[np.newaxis]
+    return landmarks
+
+
+def pair_distances(landmarks):
+    """一次计算所有特征点对的欧式距离
+
+    Args:
+        landmarks: 形状(N, 68, 2)或(68, 2)的特征点数组
+
+    Returns:
+        ndarray: 形状(N, 9)的距离数组，列顺序与_PAIRS一致
+    """
+    landmarks = _as_batch(landmarks)
+    diff = landmarks[:, _PAIRS[:, 0]] - landmarks[:, _PAIRS[:, 1]]
+    return np.sqrt(np.einsum("npk,npk->np", diff, diff))
+
+
+def compute_features(landmarks):
+    """批量计算眼睛纵横比和嘴部纵横比
+
+    Args:
+        landmarks: 形状(N, 68, 2)或(68, 2)的特征点数组
+
+    Returns:
+        dict: {"left_ear", "right_ear", "ear", "mar"}，每项为形状(N,)的数组
+    """
+    d = pair_distances(landmarks)
+    left_ear = (d[:, 0] + d[:, 1]) / (2.0 * d[:, 2])
+    right_ear = (d[:, 3] + d[:, 4]) / (2.0 * d[:, 5])
+    mar = (d[:, 6] + d[:, 7]) / (2.0 * d[:, 8])
+    return {
+        "left_ear": left_ear,
+        "right_ear": right_ear,
+        "ear": (left_ear + right_ear) / 2.0,
+        "mar": mar,
+    }
+
+
+def eye_aspect_ratio_batch(landmarks):
+    """批量计算双眼平均纵横比，返回形状(N,)的数组"""
+    return compute_features(landmarks)["ear"]
+
+
+def mouth_aspect_ratio_batch(landmarks):
+    """批量计算嘴部纵横比，返回形状(N,)的数组"""
+    return compute_features(landmarks)["mar"]
+
+
+def frame_features(shape):
+    """计算单帧的眼睛纵横比和嘴部纵横比
+
+    Args:
+        shape: 形状(68, 2)的人脸特征点坐标
+
+    Returns:
+        tuple: (眼睛纵横比, 嘴部纵横比)
+    """
+    features = compute_features(shape)
+    return float(features["ear"][0]), float(features["mar"][0])
+
+
+def pose_image_points(landmarks):
+    """批量提取头部姿态估计所需的2D参考点
+
+    Args:
+        landmarks: 形状(N, 68, 2)或(68, 2)的特征点数组
+
+    Returns:
+        ndarray: 输入为单帧时形状(14, 2)，否则形状(N, 14, 2)，类型float32
+    """
+    landmarks = np.asarray(landmarks)
+    return landmarks[..., POSE_IDXS, :].astype(np.float32)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""特征点时域滤波
+
+对68个特征点的每个坐标分量使用匀速（位置+速度）卡尔曼滤波：平滑特征点抖动，
+使EAR在EYE_AR_THRESH附近不再来回跳动；并可在没有观测的帧上按速度外推特征点，
+让特征点预测器只在每隔N帧的帧上运行。
+
+所有坐标分量使用相同的运动模型和噪声参数，初始化方式也相同，因此它们的2x2
+协方差矩阵和卡尔曼增益始终相同：只需维护一份协方差，状态更新是对(68, 2)数组的
+几次向量化运算。时间以帧为单位。
+"""
+
+import numpy as np
+
+# 观测与预测的平均偏差超过特征点外接框宽度的该比例时，认为人脸发生跳变（如换人或
+# 跟踪重新定位），直接以观测值重新初始化
+RESET_RATIO = 0.1
+
+
+class LandmarkFilter:
+    """68点特征点的匀速卡尔曼滤波器"""
+
+    def __init__(self, process_noise=1.0, measurement_noise=1.0):
+        """初始化滤波器
+
+        Args:
+            process_noise: 过程噪声（加速度噪声谱密度，像素²/帧³），越大越跟随观测
+            measurement_noise: 观测噪声方差（像素²），越大越平滑
+        """
+        self.q = float(process_noise)
+        self.r = float(measurement_noise)
+        # 匀速模型的状态转移矩阵和单位时间的过程噪声
+        self.F = np.array([[1.0, 1.0], [0.0, 1.0]])
+        self.Q = self.q * np.array([[1.0 / 3, 1.0 / 2], [1.0 / 2, 1.0]])
+        self.reset()
+
+    def reset(self):
+        """清除状态，下一次观测直接作为初值"""
+        self.position = None   # (68, 2) 位置估计
+        self.velocity = None   # (68, 2) 速度估计（像素/帧）
+        self.P = None          # 所有坐标分量共用的2x2协方差矩阵
+        self.predicted = 0     # 上次观测后连续外推的帧数
+
+    def ready(self):
+        """是否已有状态，可以外推"""
+        return self.position is not None
+
+    def _predict_step(self):
+        """状态和协方差前进一帧"""
+        self.position = self.position + self.velocity
+        self.P = self.F @ self.P @ self.F.T + self.Q
+
+    def predict(self):
+        """没有观测时外推一帧
+
+        Returns:
+            ndarray: (68, 2) 外推的特征点坐标（浮点数）
+        """
+        self._predict_step()
+        self.predicted += 1
+        return self.position
+
+    def update(self, shape):
+        """用一帧观测更新滤波器
+
+        Args:
+            shape: (68, 2) 特征点预测器给出的坐标
+
+        Returns:
+            ndarray: (68, 2) 滤波后的特征点坐标（浮点数）
+        """
+        z = np.asarray(shape, dtype=np.float64)
+        if self.position is None:
+            return self._init(z)
+
+        self._predict_step()
+        innovation = z - self.position
+        width = max(float(np.ptp(z[:, 0])), 1.0)
+        if np.abs(innovation).mean() > RESET_RATIO * width:
+            return self._init(z)
+
+        # 观测矩阵H = [1, 0]，增益对所有坐标分量相同
+        S = self.P[0, 0] + self.r
+        K = self.P[:, 0] / S
+        self.position = self.position + K[0] * innovation
+        self.velocity = self.velocity + K[1] * innovation
+        self.P = self.P - np.outer(K, self.P[0, :])
+        self.predicted = 0
+        return self.position
+
+    def _init(self, z):
+        """以观测值初始化状态，速度为0"""
+        self.position = z.copy()
+        self.velocity = np.zeros_like(z)
+        self.P = np.array([[self.r, 0.0], [0.0, self.r + self.q]])
+        self.predicted = 0
+        return self.position
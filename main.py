@@ -1,26 +1,40 @@
 # -*- coding: utf-8 -*-
 
+import time
+_START = time.perf_counter()  # 冷启动计时起点
+
 import wx
-import face_detector
 import fatigue_analyzer
+import model_loader
 import ui_components
+import metrics
+
+# 运行指标：从进程启动到窗口显示、到模型就绪的耗时
+_STARTUP_SECONDS = metrics.gauge("startup_seconds", "启动各阶段耗时（秒）", ["stage"])
 
 class FatigueDetectionApp(wx.App):
     """疲劳驾驶检测应用程序"""
-    
+
     def OnInit(self):
         """初始化应用程序"""
-        # 创建人脸检测器
-        detector = face_detector.FaceDetector()
-        
+        # 按配置启动运行指标导出（本机HTTP端点或指标文件）
+        metrics.start_exporter()
+
+        # 人脸检测器（dlib等模块及特征点模型）在后台加载，不阻塞界面显示
+        loader = model_loader.ModelLoader(started=_START)
+
         # 创建疲劳分析器
         analyzer = fatigue_analyzer.FatigueAnalyzer()
-        
+
         # 创建UI界面
-        self.frame = ui_components.FatigueDetectionUI(parent=None, title="疲劳驾驶检测", detector=detector, analyzer=analyzer)
+        self.frame = ui_components.FatigueDetectionUI(parent=None, title="疲劳驾驶检测", analyzer=analyzer, loader=loader)
         self.frame.Show(True)
+        _STARTUP_SECONDS.labels("window_shown").set(time.perf_counter() - _START)
+
+        # 窗口显示后再开始加载模型
+        wx.CallAfter(loader.start)
         return True
 
 if __name__ == "__main__":
     app = FatigueDetectionApp()
-    app.MainLoop()
\ No newline at end of file
+    app.MainLoop()
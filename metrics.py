@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""轻量级运行指标模块
+
+提供计数器(Counter)、仪表(Gauge)和直方图(Histogram)三种指标，记录一次只是
+几次整数/浮点加法（直方图多一次二分查找），可以在全帧率下常开。指标按
+Prometheus文本格式导出：定期写入文本文件（供node_exporter的textfile收集器
+读取），或通过仅监听本机地址的HTTP端点提供。
+
+记录时不加锁：CPython中并发的+=极少数情况下可能丢失一次计数，对监控指标
+可以接受；导出时读取的是各数值的快照。多进程流水线中工作进程内记录的指标
+属于各自进程，不会汇总到主进程。
+
+用法:
+    import metrics
+    FRAMES = metrics.counter("frames_processed_total", "已处理的帧数")
+    STAGE = metrics.histogram("stage_seconds", "各阶段耗时", ["stage"])
+    FRAMES.inc()
+    STAGE.labels("detect").observe(0.012)
+    metrics.start_exporter(http_port=9108)
+"""
+
+import os
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 所有指标名的统一前缀
+PREFIX = "fatigue_"
+
+# 默认的耗时直方图分桶（秒），覆盖0.5ms到2.5s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标族：无标签时自身即可记录，有标签时通过labels()获取子指标"""
+
+    TYPE = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        """获取指定标签值的子指标（首次使用时创建，之后直接从字典取出）"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}需要{len(self.labelnames)}个标签值")
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self):
+        """导出用的样本：(名称后缀, 标签名, 标签值, 附加标签, 数值)"""
+        if not self.labelnames:
+            yield from self._child_samples(self, ())
+            return
+        for values, child in list(self.children.items()):
+            yield from self._child_samples(child, values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        for suffix, values, extra, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(_Metric, _CounterChild):
+    """只增不减的计数器"""
+
+    TYPE = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        _Metric.__init__(self, name, help_text, labelnames)
+        _CounterChild.__init__(self)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _child_samples(self, child, values):
+        yield "", values, None, child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "func")
+
+    def __init__(self):
+        self.value = 0
+        self.func = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, func):
+        """导出时调用func获取数值（如队列长度），记录路径上没有任何开销"""
+        self.func = func
+
+    def get(self):
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Gauge(_Metric, _GaugeChild):
+    """可增可减的瞬时值"""
+
+    TYPE = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        _Metric.__init__(self, name, help_text, labelnames)
+        _GaugeChild.__init__(self)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def _child_samples(self, child, values):
+        yield "", values, None, child.get()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个为+Inf桶
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        """计时上下文管理器，退出时记录耗时"""
+        return _Timer(self)
+
+
+class Histogram(_Metric, _HistogramChild):
+    """分桶直方图（导出时计算累计计数）"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        _Metric.__init__(self, name, help_text, labelnames)
+        _HistogramChild.__init__(self, self.buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _child_samples(self, child, values):
+        counts = list(child.counts)
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            total += count
+            yield "_bucket", values, ("le", _format_value(float(bound))), total
+        yield "_sum", values, None, child.sum
+        yield "_count", values, None, total
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标{name}已以不同的类型或标签注册")
+            return metric
+
+    def render(self):
+        """生成Prometheus文本格式的全部指标"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    def write_textfile(self, path):
+        """原子地写入指标文件（先写临时文件再替换，读取方不会读到半个文件）"""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+# 默认注册表
+REGISTRY = Registry()
+
+
+def counter(name, help_text, labelnames=()):
+    """获取（或创建）默认注册表中的计数器"""
+    return REGISTRY._get_or_create(Counter, name, help_text, labelnames)
+
+
+def gauge(name, help_text, labelnames=()):
+    """获取（或创建）默认注册表中的仪表"""
+    return REGISTRY._get_or_create(Gauge, name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    """获取（或创建）默认注册表中的直方图"""
+    return REGISTRY._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+
+# 通用的错误计数，source为出错的位置
+ERRORS = counter("errors_total", "各处捕获的异常数", ["source"])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不在控制台输出每次抓取的访问日志
+        pass
+
+
+class MetricsExporter:
+    """指标导出：本机HTTP端点和/或定期写入的文本文件"""
+
+    def __init__(self, http_port=0, textfile=None, interval=10.0, registry=REGISTRY, address="127.0.0.1"):
+        """初始化
+
+        Args:
+            http_port: HTTP端口，0表示不启用
+            textfile: 指标文本文件路径，None或空字符串表示不写文件
+            interval: 写文件的间隔（秒）
+            registry: 指标注册表
+            address: HTTP监听地址，默认只监听本机
+        """
+        self.http_port = http_port
+        self.textfile = textfile
+        self.interval = interval
+        self.registry = registry
+        self.address = address
+        self.server = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.http_port:
+            handler = type("Handler", (_MetricsHandler,), {"registry": self.registry})
+            self.server = ThreadingHTTPServer((self.address, self.http_port), handler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        if self.textfile:
+            self.thread = threading.Thread(target=self._write_loop, daemon=True)
+            self.thread.start()
+        return self
+
+    def _write_loop(self):
+        while not self.stop_event.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            self.registry.write_textfile(self.textfile)
+        except OSError as e:
+            print(f"写入指标文件失败: {e}")
+
+    def stop(self):
+        """停止导出，文本文件在停止前再写一次"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(1.0)
+            self._write()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+_exporter = None
+
+
+def start_exporter(http_port=None, textfile=None, interval=None):
+    """按配置启动默认的指标导出（重复调用时返回已启动的导出器）
+
+    Args:
+        http_port: HTTP端口，None表示使用配置文件中的METRICS_HTTP_PORT
+        textfile: 指标文本文件路径，None表示使用配置文件中的METRICS_TEXTFILE
+        interval: 写文件的间隔（秒），None表示使用配置文件中的METRICS_EXPORT_INTERVAL
+
+    Returns:
+        MetricsExporter: 导出器，两种导出方式都未启用时返回None
+    """
+    global _exporter
+    import config
+    http_port = config.METRICS_HTTP_PORT if http_port is None else http_port
+    textfile = config.METRICS_TEXTFILE if textfile is None else textfile
+    interval = config.METRICS_EXPORT_INTERVAL if interval is None else interval
+    if _exporter is None and (http_port or textfile):
+        _exporter = MetricsExporter(http_port, textfile, interval).start()
+    return _exporter
+
+
+def stop_exporter():
+    """停止默认的指标导出"""
+    global _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.stop()
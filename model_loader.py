@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""后台模型加载
+
+界面先显示出来，人脸检测相关的重量级模块（dlib、cv2、imutils）和约100MB的
+68点特征预测模型在后台线程中加载，加载进度通过回调报告给界面。
+
+dlib反序列化模型时不释放GIL，无法分段报告进度；因此先按块读取模型文件（磁盘
+读取释放GIL，冷启动时这是主要耗时，按已读字节报告进度），文件进入系统缓存后
+再交给dlib加载。各阶段耗时记录在timings中，并作为运行指标导出。
+
+直接运行本文件可在全新的解释器进程中多次测量冷启动各阶段耗时，并与原来的同步
+启动方式（窗口显示前导入检测模块并加载模型）比较窗口显示和模型就绪的时间：
+    python model_loader.py --runs 5 --drop-caches
+"""
+
+import time
+_PROCESS_START = time.perf_counter()  # 测量子进程的计时起点（与main.py的_START相同）
+
+import os
+import sys
+import json
+import argparse
+import threading
+import subprocess
+import config
+import metrics
+
+DEFAULT_PREDICTOR_PATH = "./model/shape_predictor_68_face_landmarks.dat"
+
+# 按块读取模型文件的块大小
+READ_CHUNK = 4 * 1024 * 1024
+
+# 进度回调的最小间隔（比例）
+PROGRESS_STEP = 0.05
+
+# 运行指标：启动各阶段耗时
+_STARTUP_SECONDS = metrics.gauge("startup_seconds", "启动各阶段耗时（秒）", ["stage"])
+
+# 冷启动测量的启动方式：baseline为原来的同步启动（窗口显示前加载模型），background为后台加载
+MODES = ("baseline", "background")
+
+# 冷启动测量的阶段（与timings中的键一致）：window_shown和ready从进程启动算起，
+# 其余为各阶段本身的耗时（同步启动没有单独的读取阶段）
+STAGES = ("window_shown", "ready", "import", "read", "predictor", "total")
+
+
+class ModelLoader:
+    """在后台线程中导入检测模块并创建FaceDetector"""
+
+    def __init__(self, predictor_path=DEFAULT_PREDICTOR_PATH, progress_callback=None, started=None,
+                 service=None, **detector_kwargs):
+        """初始化加载器（调用start()后开始加载）
+
+        Args:
+            predictor_path: 68点特征预测模型路径
+            progress_callback: 进度回调，参数为(提示文本, 进度0-1)，在加载线程中调用
+            started: 进程启动时刻（time.perf_counter），设置后额外记录从启动到模型就绪的耗时
+            service: 是否连接本机检测服务而不在本进程加载模型，None表示使用配置文件中的设置
+            **detector_kwargs: 传给FaceDetector的其他参数
+        """
+        self.predictor_path = predictor_path
+        self.progress_callback = progress_callback
+        self.started = started
+        self.service = config.USE_DETECTOR_SERVICE if service is None else service
+        self.detector_kwargs = detector_kwargs
+
+        self.detector = None
+        self.error = None
+        self.timings = {}   # 各阶段耗时（秒）
+        self.message = ""   # 最近一次的进度提示
+        self.progress = 0.0
+        self._thread = None
+        self._done = threading.Event()
+
+    def start(self):
+        """启动加载线程，返回self"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def ready(self):
+        """模型是否已加载完成（无论成功与否）"""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """等待加载完成并返回检测器
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            FaceDetector: 加载好的检测器，超时返回None
+
+        Raises:
+            Exception: 加载失败时抛出加载线程中的异常
+        """
+        self.start()
+        if not self._done.wait(timeout):
+            return None
+        if self.error is not None:
+            raise self.error
+        return self.detector
+
+    def _report(self, message, progress):
+        """记录并报告加载进度"""
+        self.message = message
+        self.progress = progress
+        if self.progress_callback:
+            try:
+                self.progress_callback(message, progress)
+            except Exception as e:
+                metrics.ERRORS.labels("model_loader").inc()
+                print(f"模型加载进度回调错误: {str(e)}")
+
+    def _timed(self, stage, start):
+        """记录一个阶段的耗时，返回当前时刻"""
+        now = time.perf_counter()
+        self.timings[stage] = now - start
+        _STARTUP_SECONDS.labels(stage).set(self.timings[stage])
+        return now
+
+    def _read_model(self):
+        """按块读取模型文件，把文件读入系统缓存并报告进度"""
+        size = os.path.getsize(self.predictor_path)
+        done = 0
+        reported = 0.0
+        with open(self.predictor_path, "rb", buffering=0) as f:
+            while True:
+                n = len(f.read(READ_CHUNK))
+                if n == 0:
+                    break
+                done += n
+                fraction = done / size if size else 1.0
+                if fraction - reported >= PROGRESS_STEP or done >= size:
+                    reported = fraction
+                    # 读取文件占整体进度的10%-80%
+                    self._report(u"正在读取模型文件 %d%%" % int(fraction * 100), 0.1 + 0.7 * fraction)
+
+    def _connect_service(self, begin):
+        """连接本机检测服务，模型由服务进程持有"""
+        self._report(u"正在连接检测服务", 0.0)
+        import detector_service
+        self.detector = detector_service.DetectorClient(**self.detector_kwargs)
+        self._timed("total", begin)
+        if self.started is not None:
+            self._timed("ready", self.started)
+        self._report(u"已连接检测服务（%.1f秒）" % self.timings["total"], 1.0)
+
+    def _run(self):
+        begin = start = time.perf_counter()
+        try:
+            if self.service:
+                self._connect_service(begin)
+                return
+            self._report(u"正在加载检测模块", 0.0)
+            import face_detector
+            start = self._timed("import", start)
+
+            self._read_model()
+            start = self._timed("read", start)
+
+            self._report(u"正在初始化特征点模型", 0.8)
+            self.detector = face_detector.FaceDetector(self.predictor_path, **self.detector_kwargs)
+            self._timed("predictor", start)
+            self._timed("total", begin)
+            if self.started is not None:
+                self._timed("ready", self.started)
+            self._report(u"模型加载完成（%.1f秒）" % self.timings["total"], 1.0)
+        except Exception as e:
+            metrics.ERRORS.labels("model_loader").inc()
+            self.error = e
+            self._report(u"模型加载失败: %s" % str(e), self.progress)
+        finally:
+            self._done.set()
+
+
+def _show_window(analyzer, detector=None, loader=None):
+    """创建并显示主窗口（与main.py相同），未安装wxPython时返回False"""
+    try:
+        import wx
+        import ui_components
+    except ImportError:
+        return False
+    app = wx.App(False)
+    frame = ui_components.FatigueDetectionUI(parent=None, title="疲劳驾驶检测", detector=detector,
+                                             analyzer=analyzer, loader=loader)
+    frame.Show(True)
+    app.frame = frame
+    return True
+
+
+def _measure_once(predictor_path, mode):
+    """在当前（新启动的）进程中按一种启动方式启动一次，返回各阶段耗时
+
+    Args:
+        predictor_path: 68点特征预测模型路径
+        mode: 启动方式（MODES之一）
+
+    Returns:
+        dict: {阶段: 耗时（秒）}，另有"window"表示是否创建了窗口
+    """
+    import fatigue_analyzer
+    analyzer = fatigue_analyzer.FatigueAnalyzer(enable_speech=False)
+    if mode == "baseline":
+        # 原来的OnInit：先导入检测模块并加载模型，再创建窗口
+        start = time.perf_counter()
+        import face_detector
+        timings = {"import": time.perf_counter() - start}
+        detector = face_detector.FaceDetector(predictor_path)
+        timings["total"] = time.perf_counter() - start
+        timings["predictor"] = timings["total"] - timings["import"]
+        timings["ready"] = time.perf_counter() - _PROCESS_START
+        timings["window"] = _show_window(analyzer, detector=detector)
+        timings["window_shown"] = time.perf_counter() - _PROCESS_START
+        return timings
+    loader = ModelLoader(predictor_path, started=_PROCESS_START, service=False)
+    window = _show_window(analyzer, loader=loader)
+    window_shown = time.perf_counter() - _PROCESS_START
+    loader.wait()
+    return dict(loader.timings, window_shown=window_shown, window=window)
+
+
+def _drop_caches():
+    """清空系统文件缓存（Linux，需要root权限），使下一次测量从磁盘读取模型文件"""
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def measure_cold_start(predictor_path=DEFAULT_PREDICTOR_PATH, runs=5, drop_caches=False):
+    """在全新的解释器进程中多次测量两种启动方式的各阶段耗时
+
+    两种方式交替运行，每次都使用新的解释器进程。
+
+    Args:
+        predictor_path: 68点特征预测模型路径
+        runs: 每种方式的测量次数
+        drop_caches: 每次测量前是否清空系统文件缓存
+
+    Returns:
+        tuple: ({方式: {阶段: [每次的耗时（秒）]}}, 是否创建了窗口)
+    """
+    results = {mode: {stage: [] for stage in STAGES + ("process",)} for mode in MODES}
+    script = os.path.abspath(__file__)
+    window = True
+    for _ in range(runs):
+        for mode in MODES:
+            if drop_caches:
+                _drop_caches()
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, script, "--child", mode, "--predictor", predictor_path],
+                                    check=True, capture_output=True, text=True,
+                                    cwd=os.path.dirname(script)).stdout
+            elapsed = time.perf_counter() - start
+            timings = json.loads(output.strip().splitlines()[-1])
+            window = window and timings.pop("window")
+            for stage in STAGES:
+                if stage in timings:
+                    results[mode][stage].append(timings[stage])
+            results[mode]["process"].append(elapsed)  # 包括解释器启动和退出
+    return results, window
+
+
+def main():
+    parser = argparse.ArgumentParser(description="测量人脸检测模型的冷启动耗时（与同步启动方式比较）")
+    parser.add_argument("--predictor", default=DEFAULT_PREDICTOR_PATH, help="68点特征预测模型路径")
+    parser.add_argument("--runs", type=int, default=5, help="每种启动方式的测量次数（每次使用新的解释器进程）")
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="每次测量前清空系统文件缓存（Linux，需要root权限），测量真正的冷启动")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_measure_once(args.predictor, args.child)))
+        return
+
+    results, window = measure_cold_start(args.predictor, args.runs, args.drop_caches)
+    print("阶段          启动方式      最小(ms)    中位数(ms)  最大(ms)")
+    for stage in STAGES + ("process",):
+        for mode in MODES:
+            values = sorted(results[mode][stage])
+            if values:
+                print("%-12s %-12s %10.1f %10.1f %10.1f" % (stage, mode, values[0] * 1000,
+                                                            values[len(values) // 2] * 1000, values[-1] * 1000))
+    if not window:
+        print("注：未安装wxPython，window_shown不含创建窗口的耗时（两种方式相同）")
+    if not args.drop_caches:
+        print("注：第一次运行之后模型文件已在系统缓存中，开机冷启动请使用--drop-caches")
+
+
+if __name__ == "__main__":
+    main()
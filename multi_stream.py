@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""多路视频、多人脸疲劳监测（无界面）
+
+一台计算单元同时监测多路车内摄像头：每路视频由独立的采集线程读取，所有视频
+共享一个有界的人脸检测工作进程池，调度器按轮询方式公平分配，每路视频同时在
+处理中的帧数不超过STREAM_MAX_IN_FLIGHT，因此固定的核数可以为N路视频提供可预期
+的单路帧率。每路视频中的每个人脸按位置跨帧关联，并拥有独立的FatigueAnalyzer。
+
+用法:
+    python multi_stream.py --source 0 --source 1 --source rtsp://... --workers 4
+"""
+
+import os
+import time
+import queue
+import argparse
+import config
+import capture
+import fatigue_analyzer
+import frame_pipeline
+import metrics
+
+# 运行指标（按视频源区分，采集相关的指标由capture模块记录）
+_FRAMES_PROCESSED = metrics.counter("frames_processed_total", "完成分析的视频帧数", ["stream"])
+_QUEUE_DEPTH = metrics.gauge("queue_depth", "各队列中等待处理的数量", ["queue"])
+
+
+class FaceTrack:
+    """一路视频中被跨帧关联的一个人脸"""
+
+    def __init__(self, track_id, box, analyzer):
+        self.track_id = track_id
+        self.box = box
+        self.analyzer = analyzer
+        self.missed = 0  # 连续未出现的帧数
+
+
+class StreamState:
+    """一路视频的调度和分析状态"""
+
+    def __init__(self, key, name, reader):
+        self.key = key
+        self.name = name
+        self.reader = reader
+        self.seq = 0
+        self.in_flight = 0
+        self.reorder = frame_pipeline.ReorderBuffer()
+        self.timestamps = {}  # 帧序号 -> (时间戳, 采集时刻)
+        self.dispatched = {}  # 帧序号 -> 分发时刻（用于检测丢失的任务）
+        self.tracks = []
+        self.next_track_id = 0
+        self.processed = 0
+        self.report_processed = 0
+        self.processed_metric = _FRAMES_PROCESSED.labels(name)
+
+
+def _box_center(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+class MultiStreamMonitor:
+    """多路视频疲劳监测调度器"""
+
+    def __init__(self, sources, workers=None, predictor_path="./model/shape_predictor_68_face_landmarks.dat",
+                 detect_scale=None, max_in_flight=None, event_callback=None):
+        """初始化
+
+        Args:
+            sources: 视频源列表
+            workers: 共享的检测工作进程数，None表示使用CPU核数
+            predictor_path: 68点特征预测模型路径
+            detect_scale: 人脸检测缩放比例，None表示使用配置文件中的设置
+            max_in_flight: 每路视频同时在处理中的最大帧数，None表示使用配置文件中的设置
+            event_callback: 事件文本回调，参数为(视频名, 人脸编号, 文本)，None表示打印到控制台
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers * 2
+        self.max_in_flight = max_in_flight or config.STREAM_MAX_IN_FLIGHT
+        self.event_callback = event_callback or (lambda name, tid, text: print(f"[{name}#{tid}] {text}", end=""))
+        self.pool = frame_pipeline.create_pool(self.workers, predictor_path, detect_scale)
+        self.results = queue.Queue()
+        self.task_timeout = config.PIPELINE_TASK_TIMEOUT
+        self.in_flight = 0
+        self.rr = 0  # 轮询起点
+        self.streams = [StreamState(i, str(source), capture.FrameCapture(source).start())
+                        for i, source in enumerate(sources)]
+        _QUEUE_DEPTH.labels("pool_in_flight").set_function(lambda: self.in_flight)
+
+    def _schedule(self):
+        """轮询各路视频，为有新帧且未达并发上限的视频分发检测任务"""
+        n = len(self.streams)
+        for k in range(n):
+            if self.in_flight >= self.capacity:
+                break
+            stream = self.streams[(self.rr + k) % n]
+            if stream.in_flight >= self.max_in_flight:
+                continue
+            item = stream.reader.take()
+            if item is None:
+                continue
+            frame, timestamp, capture_time = item
+            seq = stream.seq
+            stream.seq += 1
+            stream.timestamps[seq] = (timestamp, capture_time)
+            stream.dispatched[seq] = time.monotonic()
+            stream.in_flight += 1
+            self.in_flight += 1
+            self.pool.apply_async(frame_pipeline.detect_faces_task, (stream.key, seq, frame),
+                                  callback=self.results.put,
+                                  error_callback=frame_pipeline.failure_callback(self.results, (stream.key, seq, [])))
+        # 下一轮从下一路视频开始，避免排在前面的视频总是优先
+        self.rr = (self.rr + 1) % n
+
+    def _collect(self, timeout):
+        """收集检测结果，按每路视频的帧顺序交给分析器"""
+        try:
+            item = self.results.get(timeout=timeout)
+        except queue.Empty:
+            self._expire()
+            return
+        while item is not None:
+            key, seq, faces = item
+            self._complete(self.streams[key], seq, faces)
+            try:
+                item = self.results.get_nowait()
+            except queue.Empty:
+                item = None
+        self._expire()
+
+    def _complete(self, stream, seq, faces):
+        """一个检测任务完成，按帧顺序交给分析器"""
+        if stream.dispatched.pop(seq, None) is None:
+            return  # 已按超时处理的帧迟到的结果
+        stream.in_flight -= 1
+        self.in_flight -= 1
+        stream.reorder.push(seq, faces)
+        for ready_seq, ready_faces in stream.reorder.pop_ready():
+            timestamp, capture_time = stream.timestamps.pop(ready_seq)
+            self._analyze(stream, ready_faces, timestamp)
+            stream.reader.record_decision(capture_time)
+
+    def _expire(self):
+        """工作进程异常退出时任务丢失、不会有结果：超时的帧按未检出人脸处理，该路视频不会停滞"""
+        now = time.monotonic()
+        for stream in self.streams:
+            seq = stream.reorder.next_seq
+            dispatched = stream.dispatched.get(seq)
+            if dispatched is not None and now - dispatched > self.task_timeout:
+                metrics.ERRORS.labels("pipeline_timeout").inc()
+                print(f"[{stream.name}] 检测任务超时(帧{seq})")
+                self._complete(stream, seq, [])
+
+    def _new_track(self, stream, box):
+        track_id = stream.next_track_id
+        stream.next_track_id += 1
+        analyzer = fatigue_analyzer.FatigueAnalyzer(
+            ui_callback=lambda text: self.event_callback(stream.name, track_id, text), enable_speech=False)
+        track = FaceTrack(track_id, box, analyzer)
+        stream.tracks.append(track)
+        return track
+
+    def _analyze(self, stream, faces, timestamp):
+        """将一帧中的人脸与已有人脸关联，并更新各自的分析器"""
+        unmatched = list(stream.tracks)
+        # 先匹配面积大的人脸（通常离摄像头更近，是驾驶员）
+        faces = sorted(faces, key=lambda f: (f[0][2] - f[0][0]) * (f[0][3] - f[0][1]), reverse=True)
+        for box, shape, leftEye, rightEye, mouth, ear, mar, pose in faces:
+            cx, cy = _box_center(box)
+            max_dist = config.FACE_MATCH_MAX_DIST * (box[2] - box[0])
+            best, best_dist = None, None
+            for track in unmatched:
+                tx, ty = _box_center(track.box)
+                dist = ((cx - tx) ** 2 + (cy - ty) ** 2) ** 0.5
+                if dist <= max_dist and (best is None or dist < best_dist):
+                    best, best_dist = track, dist
+            if best is None:
+                best = self._new_track(stream, box)
+            else:
+                unmatched.remove(best)
+            best.box = box
+            best.missed = 0
+            best.analyzer.update(True, ear, mar, pose[1], timestamp)
+            best.analyzer.tick(timestamp)
+
+        # 本帧未出现的人脸按无人脸处理，长时间未出现则移除
+        for track in unmatched:
+            track.missed += 1
+            track.analyzer.update(False, timestamp=timestamp)
+            track.analyzer.tick(timestamp)
+            if track.missed > config.FACE_TRACK_TTL:
+                stream.tracks.remove(track)
+
+        stream.processed += 1
+        stream.processed_metric.inc()
+
+    def finished(self):
+        """所有视频都已结束且没有在处理中的帧"""
+        return self.in_flight == 0 and all(s.reader.done() for s in self.streams)
+
+    def report(self, elapsed):
+        """打印各路视频的处理帧率和各人脸的疲劳状态"""
+        for stream in self.streams:
+            fps = (stream.processed - stream.report_processed) / elapsed if elapsed > 0 else 0.0
+            stream.report_processed = stream.processed
+            faces = ", ".join("#{}:{}({})".format(t.track_id, t.analyzer.score, t.analyzer.get_fatigue_level())
+                              for t in stream.tracks)
+            latency = stream.reader.last_latency
+            latency = "-" if latency is None else "%.0fms" % (latency * 1000)
+            print(f"[{stream.name}] {fps:.1f} FPS, 丢帧{stream.reader.dropped}, 延迟{latency}, 人脸: {faces or '无'}")
+
+    def run(self, duration=0, report_interval=5.0):
+        """运行调度循环
+
+        Args:
+            duration: 最长运行时间（秒），0表示直到所有视频结束
+            report_interval: 状态报告间隔（秒），0表示不报告
+        """
+        start = last_report = time.monotonic()
+        try:
+            while not self.finished():
+                self._schedule()
+                self._collect(0.005)
+                now = time.monotonic()
+                if report_interval and now - last_report >= report_interval:
+                    self.report(now - last_report)
+                    last_report = now
+                if duration and now - start >= duration:
+                    break
+        finally:
+            self.close()
+
+    def close(self):
+        for stream in self.streams:
+            stream.reader.stop()
+        self.pool.terminate()
+        self.pool.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="多路视频、多人脸疲劳监测（无界面）")
+    parser.add_argument("--source", action="append", required=True,
+                        help="视频源（摄像头编号、视频文件或网络流），可重复指定")
+    parser.add_argument("--workers", type=int, default=0, help="共享的检测工作进程数，0表示使用CPU核数")
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="每路视频同时在处理中的最大帧数，0表示使用配置文件中的设置")
+    parser.add_argument("--detect-scale", type=float, help="人脸检测缩放比例，默认使用配置文件中的DETECT_SCALE")
+    parser.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                        help="68点特征预测模型路径")
+    parser.add_argument("--duration", type=float, default=0, help="最长运行时间（秒），0表示不限制")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="状态报告间隔（秒）")
+    parser.add_argument("--metrics-port", type=int, help="运行指标HTTP端口，默认使用配置文件中的METRICS_HTTP_PORT")
+    parser.add_argument("--metrics-file", help="运行指标文件路径，默认使用配置文件中的METRICS_TEXTFILE")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.start_exporter(args.metrics_port, args.metrics_file)
+    monitor = MultiStreamMonitor(args.source, args.workers or None, args.predictor,
+                                 detect_scale=args.detect_scale, max_in_flight=args.max_in_flight or None)
+    try:
+        monitor.run(args.duration, args.report_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        metrics.stop_exporter()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""离线视频批处理入口（无界面）
+
+不依赖wxPython和摄像头，直接读取录制好的视频文件，以CPU允许的最快速度
+运行人脸检测与疲劳分析，并将逐帧的EAR/MAR/俯仰角及眨眼、打哈欠、点头事件
+写入CSV或Parquet文件。
+
+用法:
+    python offline_processor.py video1.mp4 video2.mp4 -o ./output --format csv
+"""
+
+import os
+import csv
+import time
+import argparse
+import cv2
+import config
+import face_detector
+import fatigue_analyzer
+import frame_pipeline
+import landmark_cache
+import detector_service
+import session_log
+
+# 逐帧输出的字段
+FIELDS = ["frame", "timestamp", "face", "ear", "mar", "pitch", "yaw", "roll",
+          "blink", "yawn", "nod", "no_driver",
+          "blink_rate", "yawn_rate", "nod_rate", "fatigue_score"]
+
+# 支持的视频扩展名
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".h264", ".ts")
+
+
+class CsvFrameWriter:
+    """逐帧结果的CSV写入器（流式写入，内存占用恒定）"""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetFrameWriter:
+    """逐帧结果的Parquet写入器（需要安装pandas和pyarrow）"""
+
+    def __init__(self, path):
+        try:
+            import pandas
+        except ImportError:
+            raise RuntimeError("输出Parquet需要安装pandas和pyarrow: pip install pandas pyarrow")
+        self.pandas = pandas
+        self.path = path
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+    def close(self):
+        self.pandas.DataFrame(self.rows, columns=FIELDS).to_parquet(self.path, index=False)
+        self.rows = []
+
+
+WRITERS = {
+    "csv": CsvFrameWriter,
+    "parquet": ParquetFrameWriter,
+}
+
+
+def iter_frames(cap):
+    """按顺序读取视频帧
+
+    Args:
+        cap: cv2.VideoCapture对象
+
+    Yields:
+        tuple: (帧序号, 视频时间戳(秒), 视频帧)
+    """
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    index = 0
+    while True:
+        flag, frame = cap.read()
+        if not flag or frame is None:
+            break
+        # 优先使用帧率推算时间戳，部分容器的CAP_PROP_POS_MSEC不可靠
+        if fps and fps > 0:
+            timestamp = index / fps
+        else:
+            timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        yield index, timestamp, frame
+        index += 1
+
+
+def make_row(index, timestamp, face_detected, ear, mar, pose, events, analyzer):
+    """组装一行逐帧结果
+
+    Returns:
+        dict: 与FIELDS对应的一行数据
+    """
+    row = {
+        "frame": index,
+        "timestamp": round(timestamp, 4),
+        "face": int(face_detected),
+        "ear": "",
+        "mar": "",
+        "pitch": "",
+        "yaw": "",
+        "roll": "",
+        "blink": int(events["blink"]),
+        "yawn": int(events["yawn"]),
+        "nod": int(events["nod"]),
+        "no_driver": int(events["no_driver"]),
+        "blink_rate": "",
+        "yawn_rate": "",
+        "nod_rate": "",
+        "fatigue_score": analyzer.score,
+    }
+    rates = analyzer.get_rates(config.FREQ_WINDOW, timestamp)
+    row["blink_rate"] = round(rates["blink"], 4)
+    row["yawn_rate"] = round(rates["yawn"], 4)
+    row["nod_rate"] = round(rates["nod"], 4)
+    if face_detected:
+        euler_angle = pose[1]
+        row["ear"] = round(float(ear), 5)
+        row["mar"] = round(float(mar), 5)
+        row["pitch"] = round(float(euler_angle[0, 0]), 4)
+        row["yaw"] = round(float(euler_angle[1, 0]), 4)
+        row["roll"] = round(float(euler_angle[2, 0]), 4)
+    return row
+
+
+def process_video(path, detector, writer, pipeline=None, cache_store=None, session_dir=None):
+    """处理单个视频文件
+
+    Args:
+        path: 视频文件路径
+        detector: 人脸检测器实例（串行模式使用）
+        writer: 逐帧结果写入器
+        pipeline: 多进程流水线，为None时在当前进程中串行处理
+        cache_store: 特征点缓存（LandmarkCacheStore），有缓存时直接回放，否则检测后写入缓存；None表示不使用缓存
+        session_dir: 会话日志目录，事件写入该目录下的会话日志；None表示不记录
+
+    Returns:
+        dict: 处理汇总信息
+    """
+    # 每个视频使用独立的分析器，离线处理不需要UI回调和语音播报
+    analyzer = fatigue_analyzer.FatigueAnalyzer(enable_speech=False)
+
+    cache = cache_store.lookup(path) if cache_store is not None else None
+    cache_writer = None
+    cap = None
+    if cache is not None:
+        # 缓存命中：不解码视频、不运行人脸检测
+        results = cache.results()
+    else:
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            raise IOError(f"无法打开视频文件: {path}")
+        if cache_store is not None:
+            cache_writer = cache_store.writer(path, cap.get(cv2.CAP_PROP_FPS))
+        # 不同视频之间的跟踪状态不能延续
+        if detector is not None:
+            detector.reset_tracking()
+
+        if pipeline is not None:
+            results = pipeline.process(((index, timestamp), frame) for index, timestamp, frame in iter_frames(cap))
+        else:
+            results = (((index, timestamp), frame, detector.detect_face(frame))
+                       for index, timestamp, frame in iter_frames(cap))
+
+    # 会话日志以视频时间计时，会话开始时间取视频文件的修改时间
+    log = None
+    if session_dir is not None:
+        log = session_log.open_session(session_dir, start_time=os.path.getmtime(path), origin=0.0,
+                                       analyzer=analyzer)
+
+    frames = 0
+    timestamp = 0.0
+    start = time.time()
+    try:
+        for (index, timestamp), frame, result in results:
+            if cache_writer is not None:
+                cache_writer.add(timestamp, result)
+            if result is None:
+                result = (False, None, None, None, None, None, None, None)
+            face_detected, shape, leftEye, rightEye, mouth, ear, mar, pose = result
+            if face_detected:
+                events = analyzer.update(True, ear, mar, pose[1], timestamp)
+            else:
+                events = analyzer.update(False, timestamp=timestamp)
+
+            # 评分按视频时间调度，与实时检测的节奏一致
+            analyzer.tick(timestamp)
+
+            writer.write(make_row(index, timestamp, face_detected, ear, mar, pose, events, analyzer))
+            frames += 1
+    finally:
+        if cap is not None:
+            cap.release()
+        if log is not None:
+            log.close(timestamp)
+    if cache_writer is not None:
+        cache_writer.close()
+
+    elapsed = time.time() - start
+    status = analyzer.get_status_info()
+    return {
+        "video": path,
+        "cached": cache is not None,
+        "frames": frames,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "blinks": status["blinks"],
+        "yawns": status["yawns"],
+        "nods": status["nods"],
+        "fatigue_score": status["fatigue_score"],
+    }
+
+
+def collect_videos(inputs):
+    """展开输入参数中的目录，返回视频文件列表"""
+    videos = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for name in sorted(os.listdir(item)):
+                if name.lower().endswith(VIDEO_EXTS):
+                    videos.append(os.path.join(item, name))
+        else:
+            videos.append(item)
+    return videos
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="疲劳驾驶检测离线批处理（无界面）")
+    parser.add_argument("inputs", nargs="+", help="视频文件或包含视频文件的目录")
+    parser.add_argument("-o", "--output", default="./output", help="输出目录")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv", help="输出格式")
+    parser.add_argument("--predictor", default="./model/shape_predictor_68_face_landmarks.dat",
+                        help="68点特征预测模型路径")
+    parser.add_argument("--detect-scale", type=float, help="人脸检测缩放比例，默认使用配置文件中的DETECT_SCALE")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="检测工作进程数，0表示在当前进程中串行处理")
+    parser.add_argument("--no-tracking", action="store_true", help="关闭跟踪模式，每帧都进行全图人脸检测")
+    parser.add_argument("--stateless", action="store_true",
+                        help="串行模式也使用流水线工作进程的无状态检测设置（关闭跟踪、特征点滤波和姿态热启动），"
+                             "结果与--workers完全相同，用于比较两种模式的计数")
+    parser.add_argument("--cache", action="store_true",
+                        help="使用特征点缓存：有缓存时直接回放，没有时检测后写入缓存")
+    parser.add_argument("--cache-dir", help="特征点缓存目录，默认使用配置文件中的LANDMARK_CACHE_DIR")
+    parser.add_argument("--service", nargs="?", const="", metavar="SOCKET",
+                        help="使用本机检测服务（不在本进程加载模型），可指定套接字路径，默认使用配置文件中的DETECTOR_SOCKET")
+    parser.add_argument("--session-log", nargs="?", const="", metavar="DIR",
+                        help="把事件写入会话日志，可指定目录，默认使用配置文件中的SESSION_LOG_DIR")
+    args = parser.parse_args(argv)
+    if args.workers > 0 and args.service is not None:
+        # 流水线的工作进程各自加载模型，与检测服务互斥
+        parser.error("--workers和--service不能同时使用")
+    if args.stateless and args.service is not None:
+        # 检测服务的检测器由服务进程配置
+        parser.error("--stateless和--service不能同时使用")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output, exist_ok=True)
+
+    pipeline = None
+    detector = None
+    if args.workers > 0:
+        pipeline = frame_pipeline.FramePipeline(args.workers, args.predictor, detect_scale=args.detect_scale)
+    elif args.service is not None:
+        detector = detector_service.DetectorClient(args.service or None,
+                                                   tracking=False if args.no_tracking else None,
+                                                   detect_scale=args.detect_scale)
+        # 缓存参数以服务实际使用的模型和缩放比例为准
+        args.predictor, args.detect_scale = detector.predictor_path, detector.detect_scale
+    else:
+        detector = face_detector.FaceDetector(args.predictor, tracking=False if args.no_tracking else None,
+                                              detect_scale=args.detect_scale)
+        if args.stateless:
+            detector.make_stateless()
+
+    cache_store = None
+    if args.cache or args.cache_dir:
+        # 流水线模式的工作进程使用无状态设置，检测参数需与实际运行的一致
+        cache_store = landmark_cache.LandmarkCacheStore(
+            args.cache_dir, landmark_cache.detection_params(args.predictor, args.detect_scale,
+                                                            False if args.no_tracking else None,
+                                                            args.stateless or pipeline is not None))
+
+    for video in collect_videos(args.inputs):
+        stem = os.path.splitext(os.path.basename(video))[0]
+        out_path = os.path.join(args.output, f"{stem}.{args.format}")
+        writer = WRITERS[args.format](out_path)
+        try:
+            summary = process_video(video, detector, writer, pipeline, cache_store,
+                                    None if args.session_log is None else args.session_log or config.SESSION_LOG_DIR)
+        except Exception as e:
+            print(f"处理视频失败 {video}: {e}")
+            continue
+        finally:
+            writer.close()
+        print("{video}: {frames}帧, 用时{seconds:.1f}s ({fps:.1f} FPS), "
+              "眨眼{blinks}次, 打哈欠{yawns}次, 点头{nods}次, 疲劳评分{fatigue_score}".format(**summary))
+        if summary["cached"]:
+            print("  (使用特征点缓存回放)")
+        print(f"  -> {out_path}")
+
+    if pipeline is not None:
+        pipeline.close()
+    if args.service is not None:
+        detector.close()
+
+
+if __name__ == "__main__":
+    main()
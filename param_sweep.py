@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""阈值与评分参数扫描
+
+输入每帧的EAR/MAR/俯仰角时间序列（特征点缓存或offline_processor输出的CSV），
+对EYE_AR_THRESH/EYE_AR_CONSEC_FRAMES、MAR_THRESH/MOUTH_AR_CONSEC_FRAMES、
+HAR_THRESH/NOD_AR_CONSEC_FRAMES的参数网格一次算出每组参数的眨眼/打哈欠/点头
+次数和疲劳评分。
+
+连续帧状态机用NumPy游程运算代替逐帧循环：同一阈值下所有“连续满足条件”的
+游程一次求出，长度不小于CONSEC_FRAMES且被不满足条件的帧结束的游程即为一次
+事件，事件时间为结束帧的时间戳。评分节拍、频率窗口和评分规则与FatigueAnalyzer
+完全一致（评分规则见fatigue_scoring），所有参数组合的评分按节拍同时更新。
+
+用法:
+    python param_sweep.py ./landmark_cache/<缓存目录> output/video.csv \\
+        --ear-thresh 0.15:0.30:0.01 --ear-consec 1,2,3,4 --mar-thresh 0.4:0.8:0.05 \\
+        -o sweep.csv --sort-by alert_fraction --top 20
+"""
+
+import os
+import csv
+import time
+import argparse
+import numpy as np
+import config
+import fatigue_scoring
+
+# 各事件的扫描参数：(事件名, 信号名, 阈值参数, 连续帧参数, 条件为“小于阈值”)
+SIGNALS = (
+    ("blink", "ear", "EYE_AR_THRESH", "EYE_AR_CONSEC_FRAMES", True),
+    ("yawn", "mar", "MAR_THRESH", "MOUTH_AR_CONSEC_FRAMES", False),
+    ("nod", "pitch", "HAR_THRESH", "NOD_AR_CONSEC_FRAMES", False),
+)
+
+# 结果中的统计列
+RESULT_FIELDS = ["blinks", "yawns", "nods", "final_score", "max_score", "mean_score",
+                 "alert_fraction", "alert_sessions"]
+
+
+def load_series(path):
+    """读取每帧的时间序列
+
+    Args:
+        path: 特征点缓存目录，或offline_processor输出的CSV文件
+
+    Returns:
+        dict: {"timestamps", "face", "ear", "mar", "pitch"}，形状(N,)的数组，未检出人脸的帧为NaN
+    """
+    if os.path.isdir(path):
+        import landmark_cache
+        cache = landmark_cache.LandmarkCache(path)
+        ear, mar = cache.features()
+        return {
+            "timestamps": np.asarray(cache.timestamps, dtype=np.float64),
+            "face": np.asarray(cache.face, dtype=bool),
+            "ear": ear,
+            "mar": mar,
+            "pitch": np.asarray(cache.euler[:, 0, 0], dtype=np.float64),
+        }
+
+    columns = {"timestamp": [], "face": [], "ear": [], "mar": [], "pitch": []}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            for name, values in columns.items():
+                values.append(float(row[name]) if row[name] != "" else np.nan)
+    return {
+        "timestamps": np.asarray(columns["timestamp"]),
+        "face": np.asarray(columns["face"]) > 0,
+        "ear": np.asarray(columns["ear"]),
+        "mar": np.asarray(columns["mar"]),
+        "pitch": np.asarray(columns["pitch"]),
+    }
+
+
+def parse_grid(text, cast=float):
+    """解析参数网格："start:stop:step"（包含stop）或逗号分隔的列表"""
+    if ":" in text:
+        start, stop, step = (float(v) for v in text.split(":"))
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        values = np.round(start + step * np.arange(count), 10)
+    else:
+        values = [float(v) for v in text.split(",") if v.strip()]
+    return [cast(v) for v in values]
+
+
+def event_times(values, times, thresholds, consecs, below):
+    """用游程运算求出每组(阈值, 连续帧数)的事件时间
+
+    与FatigueAnalyzer相同：只统计检出人脸的帧，未检出人脸的帧不打断计数；
+    连续满足条件的帧数不小于consec，且随后出现一帧不满足条件时记一次事件。
+
+    Args:
+        values: 检出人脸的各帧信号值，形状(N,)
+        times: 对应的时间戳，形状(N,)
+        thresholds: 阈值列表，长度K
+        consecs: 连续帧数列表，长度M
+        below: True表示条件为“信号小于阈值”，False表示“信号大于阈值”
+
+    Returns:
+        list: K*M个升序的事件时间数组，下标为k*M+m
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    n = len(values)
+    if below:
+        cond = values[np.newaxis, :] < thresholds[:, np.newaxis]
+    else:
+        cond = values[np.newaxis, :] > thresholds[:, np.newaxis]
+
+    # 两端补False后差分：+1为游程开始，-1为游程结束（结束位置即打断游程的帧）
+    padded = np.zeros((len(thresholds), n + 2), dtype=np.int8)
+    padded[:, 1:-1] = cond
+    edges = np.diff(padded, axis=1)
+    start_k, start_pos = np.nonzero(edges == 1)
+    end_k, end_pos = np.nonzero(edges == -1)
+    lengths = end_pos - start_pos
+    # 游程持续到序列末尾时没有打断帧，不计事件
+    closed = end_pos < n
+    bounds = np.searchsorted(end_k, np.arange(len(thresholds) + 1))
+
+    result = []
+    for k in range(len(thresholds)):
+        run_lengths = lengths[bounds[k]:bounds[k + 1]]
+        run_ends = end_pos[bounds[k]:bounds[k + 1]]
+        run_closed = closed[bounds[k]:bounds[k + 1]]
+        for consec in consecs:
+            result.append(times[run_ends[run_closed & (run_lengths >= consec)]])
+    return result
+
+
+def score_ticks(timestamps, interval):
+    """计算评分节拍的时间，与FatigueAnalyzer.tick的调度一致
+
+    第一帧只记录起点，之后每当距上次评分不少于interval时在该帧评分。
+    """
+    ticks = []
+    n = len(timestamps)
+    if n == 0:
+        return np.zeros(0)
+    last = timestamps[0]
+    i = 0
+    while True:
+        j = int(np.searchsorted(timestamps, last + interval, side="left"))
+        # 浮点舍入：以与tick相同的减法判断为准
+        j = max(j, i + 1)
+        while j - 1 > i and timestamps[j - 1] - last >= interval:
+            j -= 1
+        while j < n and timestamps[j] - last < interval:
+            j += 1
+        if j >= n:
+            break
+        last = timestamps[j]
+        ticks.append(last)
+        i = j
+    return np.asarray(ticks)
+
+
+def event_rates(events, ticks, window):
+    """各组事件在每个评分节拍的频率，与EventRateEstimator.rate一致
+
+    Returns:
+        ndarray: 形状(len(events), len(ticks))
+    """
+    rates = np.empty((len(events), len(ticks)))
+    begin = ticks - window
+    for i, times in enumerate(events):
+        counts = np.searchsorted(times, ticks, side="right") - np.searchsorted(times, begin, side="right")
+        rates[i] = counts / window
+    return rates
+
+
+class SweepResult:
+    """各参数组合的累计统计，形状为(blink组合数, yawn组合数, nod组合数)"""
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.shape = tuple(len(grid[name]) for name, *_ in SIGNALS)
+        self.counts = {name: np.zeros(self.shape, dtype=np.int64) for name, *_ in SIGNALS}
+        self.final_sum = np.zeros(self.shape, dtype=np.int64)
+        self.max_score = np.zeros(self.shape, dtype=np.int64)
+        self.score_sum = np.zeros(self.shape, dtype=np.int64)
+        self.alert_ticks = np.zeros(self.shape, dtype=np.int64)
+        self.alert_sessions = np.zeros(self.shape, dtype=np.int64)
+        self.ticks = 0
+        self.sessions = 0
+
+    def rows(self):
+        """逐行输出每组参数和统计结果"""
+        sessions = max(self.sessions, 1)
+        ticks = max(self.ticks, 1)
+        for index in np.ndindex(self.shape):
+            row = {}
+            for (name, _, thresh_name, consec_name, _), i in zip(SIGNALS, index):
+                row[thresh_name], row[consec_name] = self.grid[name][i]
+            row.update(
+                blinks=int(self.counts["blink"][index]),
+                yawns=int(self.counts["yawn"][index]),
+                nods=int(self.counts["nod"][index]),
+                final_score=round(self.final_sum[index] / sessions, 2),
+                max_score=int(self.max_score[index]),
+                mean_score=round(self.score_sum[index] / ticks, 2),
+                alert_fraction=round(self.alert_ticks[index] / ticks, 4),
+                alert_sessions=int(self.alert_sessions[index]),
+            )
+            yield row
+
+
+def sweep_session(series, grid, result, score_interval=None, freq_window=None):
+    """对一个会话的时间序列扫描全部参数组合，统计结果累加到result
+
+    Args:
+        series: load_series()的返回值
+        grid: {"blink"/"yawn"/"nod": [(阈值, 连续帧数), ...]}
+        result: SweepResult
+        score_interval: 评分间隔（秒），None表示使用配置文件中的SCORE_INTERVAL
+        freq_window: 频率窗口（秒），None表示使用配置文件中的FREQ_WINDOW
+    """
+    score_interval = score_interval or config.SCORE_INTERVAL
+    freq_window = freq_window or config.FREQ_WINDOW
+    timestamps = series["timestamps"]
+    face = series["face"]
+    face_times = timestamps[face]
+    ticks = score_ticks(timestamps, score_interval)
+
+    rates = []
+    for axis, (name, signal, _, _, below) in enumerate(SIGNALS):
+        pairs = grid[name]
+        thresholds = sorted(set(t for t, _ in pairs))
+        consecs = sorted(set(c for _, c in pairs))
+        events = event_times(series[signal][face], face_times, thresholds, consecs, below)
+        lookup = {(t, c): events[k * len(consecs) + m]
+                  for k, t in enumerate(thresholds) for m, c in enumerate(consecs)}
+        events = [lookup[pair] for pair in pairs]
+        counts = np.array([len(e) for e in events])
+        shape = [1, 1, 1]
+        shape[axis] = len(pairs)
+        result.counts[name] += counts.reshape(shape)
+        rates.append(event_rates(events, ticks, freq_window).reshape(shape + [len(ticks)]))
+
+    # 所有参数组合的评分按节拍同时更新，只保留累计统计
+    scores = np.zeros(result.shape, dtype=np.int64)
+    alerted = np.zeros(result.shape, dtype=bool)
+    for t in range(len(ticks)):
+        scores = fatigue_scoring.update_scores(scores, rates[0][..., t], rates[1][..., t], rates[2][..., t])
+        np.maximum(result.max_score, scores, out=result.max_score)
+        result.score_sum += scores
+        alert = scores >= 30
+        result.alert_ticks += alert
+        alerted |= alert
+    result.final_sum += scores
+    result.alert_sessions += alerted
+    result.ticks += len(ticks)
+    result.sessions += 1
+
+
+def build_grid(args):
+    """由命令行参数组成各事件的(阈值, 连续帧数)组合"""
+    def pairs(thresh_text, consec_text, thresh_default, consec_default):
+        thresholds = parse_grid(thresh_text) if thresh_text else [thresh_default]
+        consecs = parse_grid(consec_text, int) if consec_text else [consec_default]
+        if min(consecs) < 1:
+            raise SystemExit("连续帧数必须不小于1")
+        return [(t, c) for t in thresholds for c in consecs]
+
+    return {
+        "blink": pairs(args.ear_thresh, args.ear_consec, config.EYE_AR_THRESH, config.EYE_AR_CONSEC_FRAMES),
+        "yawn": pairs(args.mar_thresh, args.mar_consec, config.MAR_THRESH, config.MOUTH_AR_CONSEC_FRAMES),
+        "nod": pairs(args.har_thresh, args.nod_consec, config.HAR_THRESH, config.NOD_AR_CONSEC_FRAMES),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="阈值与评分参数扫描")
+    parser.add_argument("inputs", nargs="+", help="特征点缓存目录或offline_processor输出的CSV文件")
+    parser.add_argument("--ear-thresh", help="EYE_AR_THRESH网格，如0.15:0.30:0.01或0.18,0.2,0.22")
+    parser.add_argument("--ear-consec", help="EYE_AR_CONSEC_FRAMES网格，如1,2,3,4")
+    parser.add_argument("--mar-thresh", help="MAR_THRESH网格")
+    parser.add_argument("--mar-consec", help="MOUTH_AR_CONSEC_FRAMES网格")
+    parser.add_argument("--har-thresh", help="HAR_THRESH网格")
+    parser.add_argument("--nod-consec", help="NOD_AR_CONSEC_FRAMES网格")
+    parser.add_argument("--score-interval", type=float, help="评分间隔（秒），默认使用配置文件中的SCORE_INTERVAL")
+    parser.add_argument("--freq-window", type=float, help="频率窗口（秒），默认使用配置文件中的FREQ_WINDOW")
+    parser.add_argument("--sort-by", choices=RESULT_FIELDS, default="alert_fraction", help="打印结果的排序列")
+    parser.add_argument("--ascending", action="store_true", help="升序排列（默认降序）")
+    parser.add_argument("--top", type=int, default=10, help="打印前多少组结果")
+    parser.add_argument("-o", "--output", help="全部结果的CSV输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    grid = build_grid(args)
+    result = SweepResult(grid)
+    total = int(np.prod(result.shape))
+    print(f"参数组合: {total} (眨眼{result.shape[0]} x 打哈欠{result.shape[1]} x 点头{result.shape[2]})")
+
+    start = time.time()
+    for path in args.inputs:
+        series = load_series(path)
+        sweep_session(series, grid, result, args.score_interval, args.freq_window)
+        print(f"{path}: {len(series['timestamps'])}帧")
+    print(f"扫描用时{time.time() - start:.2f}s")
+
+    rows = list(result.rows())
+    rows.sort(key=lambda row: row[args.sort_by], reverse=not args.ascending)
+    fields = list(rows[0].keys()) if rows else []
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    for row in rows[:args.top]:
+        print(", ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""流式分位数估计
+
+P²算法（Jain & Chlamtac, 1985）：只保存5个标记点的高度和位置，每个样本O(1)时间
+更新，不保存样本本身，内存与样本数无关。用于驾驶员基线标定时在线估计EAR/MAR
+的分位数，不需要缓存标定期间的所有帧。
+"""
+
+import bisect
+
+
+class P2Quantile:
+    """单个分位数的P²估计器"""
+
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p):
+        """初始化估计器
+
+        Args:
+            p: 需要估计的分位数（0-1之间，如0.5为中位数）
+        """
+        if not 0 < p < 1:
+            raise ValueError("分位数必须在0和1之间")
+        self.p = p
+        self.count = 0
+        self.heights = []                      # 5个标记点的高度（前5个样本时为已排序的样本）
+        self.positions = [0, 1, 2, 3, 4]       # 标记点的实际位置
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]  # 标记点的期望位置
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """加入一个样本"""
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            bisect.insort(q, x)
+            return
+
+        # 找到样本所在的区间，并更新两端的极值
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x, 1, 4) - 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self.desired
+        for i in range(5):
+            desired[i] += self.increments[i]
+
+        # 调整中间3个标记点，使其位置接近期望位置
+        for i in range(1, 4):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        """分段抛物线（P²）公式预测标记点的新高度"""
+        q = self.heights
+        n = self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        """当前的分位数估计，没有样本时返回None"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            # 样本不足5个时按线性插值计算精确分位数
+            q = self.heights
+            pos = self.p * (len(q) - 1)
+            lo = int(pos)
+            hi = min(lo + 1, len(q) - 1)
+            return q[lo] + (q[hi] - q[lo]) * (pos - lo)
+        return self.heights[2]
+
+    def reset(self):
+        """清除所有样本"""
+        self.__init__(self.p)
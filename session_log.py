@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+"""会话事件日志
+
+把FatigueAnalyzer的事件（眨眼、打哈欠、点头、无人驾驶、评分和等级变化等）追加
+写入紧凑的二进制文件，程序退出后仍可查询，供车队统计等工具批量扫描。
+
+文件格式（小端序）：
+    文件头 64字节: 魔数"FLOG"、版本、记录长度、会话开始时间（Unix时间）、
+                   车辆编号、线路编号、驾驶员编号（各16字节UTF-8，不足补0）
+    记录   32字节: 序号、时间戳（相对会话开始的秒数）、数值、帧序号、视频流编号、
+                   事件类型、疲劳等级、疲劳评分、CRC32（前28字节）
+
+界面在整个运行期间复用同一个分析器，每次开始检测打开一个新日志，因此分析器
+接入日志时先写入它的延续状态：一条该视频流的"start"记录（评分字段为当前评分），
+以及会话开始前FREQ_WINDOW内的眨眼/打哈欠/点头记录（时间戳为负）。后者只用于
+重算评分时的频率窗口，不计入本会话的事件数。
+
+写入：帧循环中的事件回调只把记录打包后放入内存队列（加锁追加一个bytes对象），
+由后台线程每SESSION_LOG_FLUSH_INTERVAL秒批量写入一次，每SESSION_LOG_FSYNC_INTERVAL
+秒fsync一次；磁盘阻塞导致待写记录超过SESSION_LOG_MAX_PENDING时丢弃新记录并计数，
+不会阻塞帧循环。
+
+崩溃恢复：文件只追加，崩溃最多留下末尾写了一半或未落盘（全0）的记录。recover()
+从末尾向前校验CRC截掉这部分，并补写一条"stop"记录。写入期间日志旁有一个
+<日志>.open标记文件，写入进程一直打开并锁定它（Windows上打开的文件不能删除），
+正常关闭后删除；open_session()只检查残留的标记，能取得标记（写入进程已不在）
+时才恢复对应的日志，不会处理其他进程正在写入的日志，也不需要打开历史日志。
+
+读取：SessionLogReader用mmap映射文件，记录直接作为NumPy结构化数组访问，
+不需要逐条解析。
+
+用法:
+    python session_log.py ./sessions --day 20240501
+"""
+
+import os
+import glob
+import time
+import zlib
+import mmap
+import struct
+import argparse
+import threading
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+import config
+import metrics
+import fatigue_scoring
+
+MAGIC = b"FLOG"
+VERSION = 1
+HEADER = struct.Struct("<4sHHd16s16s16s")
+RECORD = struct.Struct("<IdfIHBBB3xI")
+CRC_SIZE = RECORD.size - 4  # CRC覆盖的字节数
+EXTENSION = ".flog"
+MARKER = ".open"  # 写入中的标记文件后缀
+
+# 事件类型（下标即记录中的事件编码）
+EVENTS = ("start", "stop", "blink", "yawn", "nod", "no_driver", "level", "score", "calibrated")
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+
+# 与RECORD布局相同的NumPy结构化类型，用于mmap读取
+DTYPE = np.dtype({
+    "names": ["seq", "timestamp", "value", "frame", "stream", "event", "level", "score", "crc"],
+    "formats": ["<u4", "<f8", "<f4", "<u4", "<u2", "u1", "u1", "u1", "<u4"],
+    "offsets": [0, 4, 12, 16, 20, 22, 23, 24, 28],
+    "itemsize": RECORD.size,
+})
+
+# 运行指标：写入、丢弃的记录数和批量写入、fsync的耗时
+_RECORDS = metrics.counter("session_log_records_total", "写入会话日志的记录数")
+_DROPPED = metrics.counter("session_log_dropped_total", "待写队列已满而丢弃的会话日志记录数")
+_WRITE_SECONDS = metrics.histogram("session_log_write_seconds", "会话日志批量写入的耗时（秒）", ["op"])
+_WRITE = _WRITE_SECONDS.labels("write")
+_FSYNC = _WRITE_SECONDS.labels("fsync")
+
+
+def _tag(text):
+    """编码为16字节的文件头字段"""
+    return (text or "").encode("utf-8")[:16]
+
+
+def _untag(raw):
+    return raw.rstrip(b"\0").decode("utf-8", "replace")
+
+
+def pack_record(seq, event, timestamp, value=None, frame=0, stream=0, level=0, score=0):
+    """打包一条记录（含CRC）
+
+    Args:
+        seq: 记录序号
+        event: 事件名（EVENTS之一）
+        timestamp: 相对会话开始的时间（秒）
+        value: 事件数值（如眨眼时的EAR、评分），None表示无
+        frame: 事件所在的帧序号
+        stream: 视频流编号
+        level: 疲劳等级下标（fatigue_scoring.LEVELS）
+        score: 疲劳评分（0-100）
+
+    Returns:
+        bytes: RECORD.size字节的记录
+    """
+    value = float("nan") if value is None else value
+    body = RECORD.pack(seq & 0xFFFFFFFF, timestamp, value, frame & 0xFFFFFFFF, stream,
+                       EVENT_CODES[event], level, int(score), 0)[:CRC_SIZE]
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def _valid(raw):
+    """记录的CRC是否正确"""
+    return zlib.crc32(raw[:CRC_SIZE]) == struct.unpack_from("<I", raw, CRC_SIZE)[0]
+
+
+def read_header(raw):
+    """解析文件头
+
+    Returns:
+        dict: {"version", "start_time", "vehicle", "route", "driver"}
+
+    Raises:
+        ValueError: 不是会话日志文件或版本不支持
+    """
+    if len(raw) < HEADER.size:
+        raise ValueError("会话日志文件头不完整")
+    magic, version, record_size, start_time, vehicle, route, driver = HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("不是会话日志文件")
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"不支持的会话日志版本: {version}")
+    return {"version": version, "start_time": start_time,
+            "vehicle": _untag(vehicle), "route": _untag(route), "driver": _untag(driver)}
+
+
+def _valid_count(f, size):
+    """从文件末尾向前校验CRC，返回有效记录数（不含末尾写了一半或损坏的记录）"""
+    count = (size - HEADER.size) // RECORD.size
+    while count > 0:
+        f.seek(HEADER.size + (count - 1) * RECORD.size)
+        if _valid(f.read(RECORD.size)):
+            break
+        count -= 1
+    return count
+
+
+def recover(path):
+    """截掉崩溃留下的不完整记录，并在没有"stop"记录时补写一条
+
+    调用方需确认日志没有正在被写入（见claim_marker）。
+
+    Args:
+        path: 会话日志路径
+
+    Returns:
+        int: 截掉的字节数
+    """
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        read_header(f.read(HEADER.size))
+        count = _valid_count(f, size)
+        end = HEADER.size + count * RECORD.size
+        if count > 0:
+            f.seek(end - RECORD.size)
+            last = RECORD.unpack(f.read(RECORD.size))
+            seq, timestamp, event = last[0] + 1, last[1], last[5]
+        else:
+            seq, timestamp, event = 0, 0.0, None
+        if end == size and event == EVENT_CODES["stop"]:
+            return 0
+        f.truncate(end)
+        f.seek(end)
+        if event != EVENT_CODES["stop"]:
+            f.write(pack_record(seq, "stop", timestamp))
+        f.flush()
+        os.fsync(f.fileno())
+    return size - end
+
+
+class SessionLogWriter:
+    """会话日志写入器（后台线程批量写入）"""
+
+    def __init__(self, path, vehicle="", route="", driver="", start_time=None, origin=None, analyzer=None,
+                 stream=0, flush_interval=None, fsync_interval=None, max_pending=None):
+        """创建新的会话日志并启动写入线程
+
+        Args:
+            path: 日志文件路径（不能已存在）
+            vehicle: 车辆编号
+            route: 线路编号
+            driver: 驾驶员编号
+            start_time: 会话开始的Unix时间，None表示当前时间
+            origin: 会话开始时调用方时钟的读数（事件时间戳减去该值后写入），
+                    None表示time.monotonic()（实时检测的事件时间戳为单调时钟）
+            analyzer: 接入日志的疲劳分析器（见attach），None表示不接入，只写一条空的"start"记录
+            stream: 分析器对应的视频流编号
+            flush_interval: 批量写入间隔（秒），None表示使用配置文件中的设置（下同）
+            fsync_interval: fsync间隔（秒）
+            max_pending: 待写记录上限
+        """
+        self.path = path
+        self.start_time = time.time() if start_time is None else start_time
+        self.origin = time.monotonic() if origin is None else origin
+        self.flush_interval = config.SESSION_LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.fsync_interval = config.SESSION_LOG_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self.max_pending = config.SESSION_LOG_MAX_PENDING if max_pending is None else max_pending
+
+        # 写入期间一直打开并锁定标记文件，其他进程据此判断日志正在写入
+        self.marker_path = path + MARKER
+        self.marker = _create_marker(self.marker_path)
+        try:
+            self.file = open(path, "xb")
+        except OSError:
+            self._release_marker()
+            raise
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, self.start_time,
+                                    _tag(vehicle), _tag(route), _tag(driver)))
+
+        self.lock = threading.Lock()
+        self.pending = []       # 待写入的记录
+        self.seq = 0
+        self.dropped = 0
+        self.attached = []      # (分析器, 监听回调)
+        self.closed = False
+        self._wake = threading.Event()
+        # 每个会话（视频流）只有一条"start"记录，接入分析器时由attach写入
+        if analyzer is None:
+            self.write("start", self.origin, stream=stream)
+        else:
+            self.attach(analyzer, stream)
+        self.thread = threading.Thread(target=self._run, name="session-log", daemon=True)
+        self.thread.start()
+
+    def write(self, event, timestamp, value=None, frame=0, stream=0, level=0, score=0):
+        """追加一条记录（只放入内存队列，不进行磁盘I/O）
+
+        Args:
+            event: 事件名（EVENTS之一）
+            timestamp: 事件时间（调用方时钟，与origin相同）
+            其余参数见pack_record
+
+        Returns:
+            bool: 是否已放入队列（关闭后或队列已满时为False）
+        """
+        with self.lock:
+            if self.closed:
+                return False
+            if len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                _DROPPED.inc()
+                return False
+            self.pending.append(pack_record(self.seq, event, timestamp - self.origin, value,
+                                            frame, stream, level, score))
+            self.seq += 1
+        return True
+
+    def attach(self, analyzer, stream=0):
+        """写入分析器的延续状态，并把它之后的事件写入日志，close()时自动移除监听
+
+        Args:
+            analyzer: 疲劳分析器实例
+            stream: 视频流编号
+        """
+        level = fatigue_scoring.LEVELS.index(analyzer.get_fatigue_level())
+        frame = max(analyzer.history.total - 1, 0)
+        self.write("start", self.origin, None, frame, stream, level, analyzer.score)
+        begin = self.origin - analyzer.FREQ_WINDOW
+        for event, estimator in (("blink", analyzer.blink_events), ("yawn", analyzer.yawn_events),
+                                 ("nod", analyzer.nod_events)):
+            for timestamp in estimator.since(begin):
+                self.write(event, min(timestamp, self.origin), None, frame, stream, level, analyzer.score)
+
+        def on_event(event, timestamp, value):
+            level = fatigue_scoring.LEVELS.index(analyzer.get_fatigue_level())
+            frame = max(analyzer.history.total - 1, 0)
+            self.write(event, timestamp, value, frame, stream, level, analyzer.score)
+
+        analyzer.add_listener(on_event)
+        self.attached.append((analyzer, on_event))
+
+    def _drain(self, sync):
+        """把队列中的记录写入文件，sync为True时再fsync"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if batch:
+            start = time.perf_counter()
+            self.file.write(b"".join(batch))
+            self.file.flush()
+            _WRITE.observe(time.perf_counter() - start)
+            _RECORDS.inc(len(batch))
+        if sync:
+            start = time.perf_counter()
+            os.fsync(self.file.fileno())
+            _FSYNC.observe(time.perf_counter() - start)
+
+    def _run(self):
+        """写入线程：按间隔批量写入和fsync"""
+        last_sync = time.monotonic()
+        while not self._wake.wait(self.flush_interval):
+            now = time.monotonic()
+            sync = now - last_sync >= self.fsync_interval
+            try:
+                self._drain(sync)
+            except OSError as e:
+                metrics.ERRORS.labels("session_log").inc()
+                print(f"会话日志写入错误: {str(e)}")
+            if sync:
+                last_sync = now
+
+    def close(self, timestamp=None):
+        """写入"stop"记录，写完剩余记录并fsync后关闭文件
+
+        Args:
+            timestamp: 会话结束时间（调用方时钟），None表示time.monotonic()
+        """
+        if self.closed:
+            return
+        for analyzer, on_event in self.attached:
+            if on_event in analyzer.listeners:
+                analyzer.listeners.remove(on_event)
+        self.attached = []
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self.lock:
+            # "stop"记录不受待写记录上限限制，保证正常结束的会话都有结束记录
+            self.pending.append(pack_record(self.seq, "stop", timestamp - self.origin))
+            self.seq += 1
+            self.closed = True
+        self._wake.set()
+        self.thread.join()
+        try:
+            self._drain(True)
+        finally:
+            self.file.close()
+            self._release_marker()
+
+    def _release_marker(self):
+        """删除标记文件（POSIX上在持有锁时删除，Windows上需先关闭）"""
+        if fcntl is None:
+            self.marker.close()
+        try:
+            os.remove(self.marker_path)
+        except OSError:
+            pass
+        self.marker.close()
+
+
+def _create_marker(marker):
+    """创建并锁定标记文件
+
+    POSIX上先在临时文件名下创建并加锁，再改名为标记文件，避免其他进程在加锁前
+    取得刚创建的标记；Windows上打开期间标记无法删除，直接创建即可。
+
+    Returns:
+        file: 打开的标记文件（关闭日志前一直保持打开）
+    """
+    if fcntl is None:
+        return open(marker, "wb")
+    temp = f"{marker}.{os.getpid()}"
+    f = open(temp, "wb")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        os.rename(temp, marker)
+    except OSError:
+        f.close()
+        os.remove(temp)
+        raise
+    return f
+
+
+def claim_marker(marker):
+    """尝试取得残留的标记文件并删除，用于判断对应的日志是否可以恢复
+
+    Args:
+        marker: 标记文件路径
+
+    Returns:
+        bool: 写入进程已不在、由本进程取得时为True；正在写入或已被其他进程取得时为False
+    """
+    if fcntl is None:
+        # Windows上写入进程打开着标记文件时无法删除
+        try:
+            os.remove(marker)
+        except OSError:
+            return False
+        return True
+    try:
+        f = open(marker, "rb")
+    except OSError:
+        return False
+    with f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        try:
+            os.remove(marker)
+        except OSError:
+            return False  # 其他进程已先取得
+    return True
+
+
+def session_path(directory, start_time, vehicle=""):
+    """按开始时间和车辆编号生成日志文件路径（同一秒内的多个会话加序号区分）"""
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(start_time))
+    base = os.path.join(directory, f"{stamp}-{vehicle or 'local'}")
+    path = base + EXTENSION
+    index = 1
+    while os.path.exists(path):
+        path = f"{base}-{index}{EXTENSION}"
+        index += 1
+    return path
+
+
+def open_session(directory=None, vehicle=None, route=None, driver=None, start_time=None, origin=None,
+                 analyzer=None, stream=0):
+    """恢复目录中未正常结束（留有标记文件且写入进程已不在）的日志，然后创建新的会话日志
+
+    Args:
+        directory: 日志目录，None表示使用配置文件中的SESSION_LOG_DIR
+        vehicle: 车辆编号，None表示使用配置文件中的设置（线路、驾驶员同）
+        route: 线路编号
+        driver: 驾驶员编号
+        start_time: 会话开始的Unix时间，None表示当前时间
+        origin: 见SessionLogWriter（analyzer、stream同）
+
+    Returns:
+        SessionLogWriter: 写入器
+    """
+    directory = directory or config.SESSION_LOG_DIR
+    os.makedirs(directory, exist_ok=True)
+    for marker in glob.glob(os.path.join(directory, "*" + EXTENSION + MARKER)):
+        if not claim_marker(marker):
+            continue
+        path = marker[:-len(MARKER)]
+        try:
+            removed = recover(path)
+            print(f"会话日志{path}未正常结束，已恢复（截掉{removed}字节不完整记录）")
+        except (OSError, ValueError) as e:
+            print(f"会话日志恢复错误 {path}: {str(e)}")
+    start_time = time.time() if start_time is None else start_time
+    vehicle = config.VEHICLE_ID if vehicle is None else vehicle
+    return SessionLogWriter(session_path(directory, start_time, vehicle), vehicle,
+                            config.ROUTE_ID if route is None else route,
+                            config.DRIVER_ID if driver is None else driver,
+                            start_time=start_time, origin=origin, analyzer=analyzer, stream=stream)
+
+
+class SessionLogReader:
+    """用mmap读取会话日志，记录为NumPy结构化数组（只读，不复制）"""
+
+    def __init__(self, path, verify=False):
+        """打开日志
+
+        Args:
+            path: 日志文件路径
+            verify: 是否校验每条记录的CRC（只保留有效记录，需要复制）；
+                    默认只去掉末尾写了一半或损坏的记录
+
+        Raises:
+            ValueError: 不是会话日志文件或版本不支持
+        """
+        self.path = path
+        self.mmap = None
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.header = read_header(f.read(HEADER.size))
+            count = _valid_count(f, size)
+            if count > 0:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.start_time = self.header["start_time"]
+        self.vehicle = self.header["vehicle"]
+        self.route = self.header["route"]
+        self.driver = self.header["driver"]
+        if self.mmap is None:
+            self.records = np.zeros(0, dtype=DTYPE)
+        else:
+            self.records = np.frombuffer(self.mmap, dtype=DTYPE, count=count, offset=HEADER.size)
+        if verify and len(self.records):
+            raw = self.records.view(np.uint8).reshape(-1, RECORD.size)
+            valid = np.fromiter((_valid(row.tobytes()) for row in raw), dtype=bool, count=len(raw))
+            self.records = self.records[valid]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def times(self):
+        """各记录的Unix时间"""
+        return self.start_time + self.records["timestamp"]
+
+    def events(self, name):
+        """某类事件的记录"""
+        return self.records[self.records["event"] == EVENT_CODES[name]]
+
+    def duration(self):
+        """会话时长（秒），即最后一条记录的时间"""
+        return float(self.records["timestamp"][-1]) if len(self.records) else 0.0
+
+    def close(self):
+        """释放映射（调用方仍持有记录视图时由垃圾回收释放）"""
+        self.records = None
+        if self.mmap is not None:
+            try:
+                self.mmap.close()
+            except BufferError:
+                pass
+            self.mmap = None
+
+
+def list_sessions(directories, day=None):
+    """列出目录中的会话日志
+
+    Args:
+        directories: 日志目录列表（如车队各车辆同步来的目录）
+        day: 只列出该日（YYYYMMDD，按文件名中的开始时间）开始的会话，None表示全部
+
+    Returns:
+        list: 按文件名排序的日志路径
+    """
+    pattern = (day or "") + "*" + EXTENSION
+    paths = []
+    for directory in directories:
+        paths.extend(glob.glob(os.path.join(directory, "**", pattern), recursive=True))
+    return sorted(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="会话事件日志统计")
+    parser.add_argument("dirs", nargs="+", help="会话日志目录")
+    parser.add_argument("--day", help="只统计该日（YYYYMMDD）开始的会话")
+    parser.add_argument("--verify", action="store_true", help="校验每条记录的CRC")
+    args = parser.parse_args()
+
+    totals = np.zeros(len(EVENTS), dtype=np.int64)
+    sessions = 0
+    for path in list_sessions(args.dirs, args.day):
+        try:
+            with SessionLogReader(path, verify=args.verify) as reader:
+                # 时间戳为负的是会话开始前延续的事件，不计入本会话
+                events = reader.records["event"][reader.records["timestamp"] >= 0]
+                counts = np.bincount(events, minlength=len(EVENTS))[:len(EVENTS)]
+                print(f"{os.path.basename(path)}  车辆={reader.vehicle or '-'}  线路={reader.route or '-'}  "
+                      f"时长={reader.duration():.0f}s  眨眼={counts[EVENT_CODES['blink']]}  "
+                      f"打哈欠={counts[EVENT_CODES['yawn']]}  点头={counts[EVENT_CODES['nod']]}")
+        except (OSError, ValueError) as e:
+            print(f"读取失败 {path}: {str(e)}")
+            continue
+        totals += counts
+        sessions += 1
+    print(f"共{sessions}个会话: " + "  ".join(f"{name}={totals[code]}" for code, name in enumerate(EVENTS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import time
+import heapq
+import threading
 import pyttsx3
-import pythoncom
-from win32com import client
+import config
+import metrics
+
+try:
+    import pythoncom
+    from win32com import client
+except ImportError:  # 非Windows平台（如离线处理服务器）没有SAPI
+    pythoncom = None
+    client = None
 
 def speak_windows(text):
     """
@@ -11,6 +21,8 @@ def speak_windows(text):
     Args:
         text: 要播报的文本内容
     """
+    if client is None:
+        return False
     try:
         pythoncom.CoInitialize()
         engine = client.Dispatch("SAPI.SpVoice")
@@ -56,6 +68,247 @@ def speak(text, use_windows=True):
     else:
         return speak_pyttsx3(text)
 
+# 运行指标：播报延迟、播报数和丢弃的消息数
+_SPEECH_LATENCY = metrics.histogram("speech_latency_seconds", "语音消息从入队到开始播报的延迟（秒）",
+                                    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+_SPEECH_SPOKEN = metrics.counter("speech_spoken_total", "已开始播报的语音消息数")
+_SPEECH_DROPPED = metrics.counter("speech_dropped_total", "被丢弃的语音消息数", ["reason"])
+_SPEECH_INTERRUPTED = metrics.counter("speech_interrupted_total", "被更高优先级消息打断的播报数")
+_QUEUE_DEPTH = metrics.gauge("queue_depth", "各队列中等待处理的数量", ["queue"])
+
+class _SapiEngine:
+    """长期存在的Windows SAPI语音引擎（必须在播报线程中创建）"""
+    
+    SVSF_ASYNC = 1
+    SVSF_PURGE = 2
+    
+    def __init__(self):
+        if client is None:
+            raise RuntimeError("当前平台不支持Windows SAPI")
+        pythoncom.CoInitialize()
+        self.voice = client.Dispatch("SAPI.SpVoice")
+    
+    def say(self, text, interrupted):
+        """异步播报并轮询是否需要被打断，返回是否完整播报"""
+        self.voice.Speak(text, self.SVSF_ASYNC)
+        while not self.voice.WaitUntilDone(100):
+            if interrupted():
+                # 清空当前播报，让更高优先级的消息立即开始
+                self.voice.Speak("", self.SVSF_ASYNC | self.SVSF_PURGE)
+                return False
+        return True
+
+
+class _Pyttsx3Engine:
+    """长期存在的pyttsx3语音引擎（播报过程不可打断）"""
+    
+    def __init__(self):
+        self.engine = pyttsx3.init()
+    
+    def say(self, text, interrupted):
+        self.engine.say(text)
+        self.engine.runAndWait()
+        return True
+
+
+class _SpeechItem:
+    """队列中的一条语音消息"""
+    
+    __slots__ = ("text", "key", "priority", "enqueue_time")
+    
+    def __init__(self, text, key, priority, enqueue_time):
+        self.text = text
+        self.key = key
+        self.priority = priority
+        self.enqueue_time = enqueue_time
+
+
+class SpeechWorker:
+    """语音播报工作线程
+    
+    持有一个长期存在的TTS引擎，消息进入有界优先级队列：高优先级的消息先播报，
+    并可打断正在播报的低优先级消息（仅SAPI引擎支持）；队列中已有相同消息时
+    不重复入队；同一消息在冷却时间内只播报一次。调用方只负责入队，不会被阻塞。
+    """
+    
+    def __init__(self, use_windows=True, maxsize=None):
+        """初始化并启动播报线程
+        
+        Args:
+            use_windows: 是否优先使用Windows SAPI接口
+            maxsize: 队列容量，None表示使用配置文件中的SPEECH_QUEUE_SIZE
+        """
+        self.use_windows = use_windows
+        self.maxsize = maxsize or config.SPEECH_QUEUE_SIZE
+        self.cond = threading.Condition()
+        self.heap = []          # (-优先级, 序号, 消息)
+        self.seq = 0
+        self.last_accepted = {}  # 消息键 -> 最近一次入队时间，用于冷却
+        self.speaking = None    # 正在播报的消息
+        self.running = True
+        self.dropped = 0        # 因去重、冷却或队列已满被丢弃的消息数
+        self.last_latency = 0.0  # 最近一条消息从入队到开始播报的延迟（秒）
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def say(self, text, priority=0, key=None, cooldown=0.0):
+        """消息入队（不阻塞）
+        
+        Args:
+            text: 要播报的文本内容
+            priority: 优先级，数值越大越优先
+            key: 去重和冷却使用的消息键，None表示使用文本本身
+            cooldown: 冷却时间（秒），在此时间内相同消息不再入队
+            
+        Returns:
+            bool: 消息是否入队
+        """
+        key = key or text
+        now = time.monotonic()
+        with self.cond:
+            if not self.running:
+                return False
+            
+            # 冷却与去重
+            last = self.last_accepted.get(key)
+            if last is not None and now - last < cooldown:
+                self.dropped += 1
+                _SPEECH_DROPPED.labels("cooldown").inc()
+                return False
+            if (self.speaking is not None and self.speaking.key == key) or \
+                    any(entry[2].key == key for entry in self.heap):
+                self.dropped += 1
+                _SPEECH_DROPPED.labels("duplicate").inc()
+                return False
+            
+            # 队列已满：新消息优先级更高时丢弃队列中优先级最低的消息，否则丢弃新消息
+            if len(self.heap) >= self.maxsize:
+                lowest = max(self.heap)
+                _SPEECH_DROPPED.labels("queue_full").inc()
+                if -lowest[0] >= priority:
+                    self.dropped += 1
+                    return False
+                self.heap.remove(lowest)
+                heapq.heapify(self.heap)
+                self.dropped += 1
+            
+            heapq.heappush(self.heap, (-priority, self.seq, _SpeechItem(text, key, priority, now)))
+            self.seq += 1
+            self.last_accepted[key] = now
+            self.cond.notify()
+            return True
+    
+    def pending(self):
+        """队列中等待播报的消息数"""
+        with self.cond:
+            return len(self.heap)
+    
+    def _interrupted(self):
+        """是否有比正在播报的消息优先级更高的消息在等待"""
+        with self.cond:
+            return bool(self.heap) and self.speaking is not None and -self.heap[0][0] > self.speaking.priority
+    
+    def _create_engine(self):
+        """在播报线程中创建语音引擎，SAPI不可用时使用pyttsx3"""
+        if self.use_windows:
+            try:
+                return _SapiEngine()
+            except Exception as e:
+                print(f"Windows语音引擎初始化失败: {e}")
+        try:
+            return _Pyttsx3Engine()
+        except Exception as e:
+            print(f"pyttsx3语音引擎初始化失败: {e}")
+            return None
+    
+    def _run(self):
+        """播报线程主循环"""
+        engine = self._create_engine()
+        while True:
+            with self.cond:
+                while self.running and not self.heap:
+                    self.cond.wait()
+                if not self.heap:
+                    break
+                _, _, item = heapq.heappop(self.heap)
+                self.speaking = item
+            
+            self.last_latency = time.monotonic() - item.enqueue_time
+            _SPEECH_LATENCY.observe(self.last_latency)
+            _SPEECH_SPOKEN.inc()
+            if engine is not None:
+                try:
+                    if not engine.say(item.text, self._interrupted):
+                        _SPEECH_INTERRUPTED.inc()
+                except Exception as e:
+                    metrics.ERRORS.labels("speech").inc()
+                    print(f"语音播报失败: {e}")
+            
+            with self.cond:
+                self.speaking = None
+                self.cond.notify_all()
+    
+    def shutdown(self, timeout=None):
+        """播报完队列中剩余的消息后停止
+        
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+
+# 默认的语音播报工作线程（首次使用时创建）
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_worker():
+    """获取默认的语音播报工作线程"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SpeechWorker()
+            _QUEUE_DEPTH.labels("speech").set_function(_worker.pending)
+        return _worker
+
+def speak_async(text, priority=0, key=None, cooldown=0.0):
+    """
+    语音消息入队，由后台播报线程播报，调用方不等待
+    
+    Args:
+        text: 要播报的文本内容
+        priority: 优先级，数值越大越优先
+        key: 去重和冷却使用的消息键
+        cooldown: 冷却时间（秒）
+    
+    Returns:
+        bool: 消息是否入队
+    """
+    return get_worker().say(text, priority, key, cooldown)
+
+def announce(name):
+    """
+    播报预定义消息，使用其预设的优先级和冷却时间
+    
+    Args:
+        name: MESSAGES中的消息名
+    
+    Returns:
+        bool: 消息是否入队
+    """
+    return speak_async(MESSAGES[name], MESSAGE_PRIORITY.get(name, 0), name,
+                       config.SPEECH_COOLDOWN.get(name, 0.0))
+
+def shutdown(timeout=None):
+    """播报完剩余消息后停止默认的播报线程"""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.shutdown(timeout)
+
 # 预定义的语音消息
 MESSAGES = {
     "camera_success": "打开摄像头成功，开始为您检测，祝您一路顺风",
@@ -65,4 +318,11 @@ MESSAGES = {
     "fatigue_mild": "警报警报，检测到您已进入轻度疲劳，请注意",
     "fatigue_moderate": "警报警报，检测到您已进入中度疲劳，请尽快打起精神，否则即将自动报警",
     "fatigue_severe": "警报警报，检测到您已进入重度疲劳，请靠边停车，已为您自动报警"
+}
+
+# 预定义消息的优先级（数值越大越优先，重度疲劳可打断轻度疲劳的播报）
+MESSAGE_PRIORITY = {
+    "fatigue_severe": 3,
+    "fatigue_moderate": 2,
+    "fatigue_mild": 1,
 }
\ No newline at end of file
@@ -3,24 +3,33 @@
 import wx
 import wx.xrc
 import wx.adv
-import cv2
 import time
 import _thread
-import numpy as np
 import config
 import speech_utils
+import metrics
+import session_log
+
+# 运行指标（界面只有一路摄像头，stream标签固定为camera；采集相关的指标由capture模块记录）
+_FRAMES_PROCESSED = metrics.counter("frames_processed_total", "完成分析的视频帧数", ["stream"]).labels("camera")
+_FRAMES_DROPPED = metrics.counter("frames_dropped_total", "未完成分析的视频帧数（按原因）", ["stream", "reason"])
+_LOOP_SECONDS = metrics.histogram("loop_stage_seconds", "检测主循环各阶段耗时（秒）", ["stage"])
+_STAGE_DETECT = _LOOP_SECONDS.labels("detect")
+_STAGE_ANALYZE = _LOOP_SECONDS.labels("analyze")
+_FRAME_INTERVAL = metrics.histogram("frame_interval_seconds", "相邻两帧分析结果的间隔（秒）")
 
 class FatigueDetectionUI(wx.Frame):
     """疲劳驾驶检测系统UI组件"""
     
-    def __init__(self, parent, title, detector, analyzer):
+    def __init__(self, parent, title, detector=None, analyzer=None, loader=None):
         """初始化UI组件
         
         Args:
             parent: 父窗口
             title: 窗口标题
-            detector: 人脸检测器实例
+            detector: 人脸检测器实例，为None时使用loader在后台加载的检测器
             analyzer: 疲劳分析器实例
+            loader: 后台模型加载器（model_loader.ModelLoader）
         """
         wx.Frame.__init__(self, parent, id=wx.ID_ANY, title=title, pos=wx.DefaultPosition, size=wx.Size(925, 535),
                           style=wx.DEFAULT_FRAME_STYLE | wx.TAB_TRAVERSAL)
@@ -28,10 +37,18 @@ class FatigueDetectionUI(wx.Frame):
         # 保存检测器和分析器实例
         self.detector = detector
         self.analyzer = analyzer
+        self.loader = loader
         
         # 设置分析器的UI回调函数
         self.analyzer.ui_callback = self.append_text
         
+        # 后台模型加载的进度显示在状态栏
+        if self.loader is not None:
+            self.loader.progress_callback = self._on_load_progress
+        
+        # 当前疲劳评分在导出指标时读取
+        metrics.gauge("fatigue_score", "当前疲劳评分").set_function(lambda: self.analyzer.score)
+        
         # 初始化UI组件
         self.init_ui()
         
@@ -327,7 +344,12 @@ class FatigueDetectionUI(wx.Frame):
         """初始化摄像头参数"""
         self.VIDEO_STREAM = config.VIDEO_STREAM
         self.CAMERA_STYLE = config.CAMERA_STYLE_DEFAULT  # False未打开摄像头，True摄像头已打开
-        self.cap = None  # 摄像头对象
+        self.capture = None  # 摄像头采集线程
+        self.pipeline = None  # 多进程流水线
+        self.renderer = None  # 显示渲染器
+        self.scheduler = None  # 自适应分析帧率调度器
+        self.session_log = None  # 会话事件日志
+        self.display_bitmap = None  # 复用的显示位图
     
     def bind_events(self):
         """绑定事件处理函数"""
@@ -366,24 +388,54 @@ class FatigueDetectionUI(wx.Frame):
             # 如果UI组件已被删除，则忽略错误
             print(f"无法更新文本区域: {str(e)}")
     
+    def _on_load_progress(self, message, progress):
+        """后台模型加载进度回调（在加载线程中调用）
+        
+        Args:
+            message: 进度提示文本
+            progress: 进度（0-1）
+        """
+        wx.CallAfter(self.SetStatusText, message)
+        if progress >= 1.0 or self.loader.error is not None:
+            self.append_text(message + "\n")
+    
+    def _wait_detector(self):
+        """等待后台加载的人脸检测器
+        
+        Returns:
+            bool: 检测器是否可用
+        """
+        if self.detector is not None:
+            return True
+        if self.loader is None:
+            return False
+        if not self.loader.ready():
+            self.append_text(u"正在加载人脸检测模型，请稍候...\n")
+        try:
+            self.detector = self.loader.wait()
+        except Exception as e:
+            self.append_text(f"人脸检测模型加载失败: {str(e)}\n")
+            wx.CallAfter(self.SetStatusText, u"模型加载失败 - 无法检测")
+            return False
+        return True
+    
     def prepare(self, evt):
         """准备加载摄像头"""
         self.append_text(u"加载车载摄像头成功!!!\n")
-        speech_utils.speak(speech_utils.MESSAGES["model_loaded"])
+        speech_utils.announce("model_loaded")
     
     def camera_on(self, event):
         """开始检测，启动多线程"""
         # 使用多线程，子线程运行后台的程序，主线程更新前台的UI
+        # 疲劳评分和警报由检测循环中的analyzer.tick()调度，不再需要单独的轮询线程
         _thread.start_new_thread(self._learning_face, (event,))
-        _thread.start_new_thread(self._frequency_counter, (event,))
-        _thread.start_new_thread(self._fatigue_alarm, (event,))
     
     def off(self, event):
         """暂停检测，关闭摄像头"""
         try:
-            if self.cap and self.cap.isOpened():
-                self.cap.release()
-                self.cap = None
+            if self.capture is not None and self.capture.is_opened():
+                self.capture.stop()
+                self.capture = None
                 self.CAMERA_STYLE = False
                 
                 # 重新加载并调整封面图片大小
@@ -430,9 +482,9 @@ class FatigueDetectionUI(wx.Frame):
         if (dlg.ShowModal() == wx.ID_YES):
             # 先关闭摄像头，确保线程能够正常退出
             try:
-                if self.cap and self.cap.isOpened():
-                    self.cap.release()
-                    self.cap = None
+                if self.capture is not None:
+                    self.capture.stop()
+                    self.capture = None
                     self.CAMERA_STYLE = False
             except:
                 pass
@@ -441,7 +493,9 @@ class FatigueDetectionUI(wx.Frame):
             time.sleep(0.5)
             
             self.Destroy()
-            speech_utils.speak(speech_utils.MESSAGES["exit"])
+            speech_utils.announce("exit")
+            speech_utils.shutdown(timeout=10)
+            metrics.stop_exporter()
             print("检测结束，成功退出程序!!!")
     
     def OnClose(self, evt):
@@ -450,9 +504,9 @@ class FatigueDetectionUI(wx.Frame):
         if (dlg.ShowModal() == wx.ID_YES):
             # 先关闭摄像头，确保线程能够正常退出
             try:
-                if self.cap and self.cap.isOpened():
-                    self.cap.release()
-                    self.cap = None
+                if self.capture is not None:
+                    self.capture.stop()
+                    self.capture = None
                     self.CAMERA_STYLE = False
             except:
                 pass
@@ -461,32 +515,42 @@ class FatigueDetectionUI(wx.Frame):
             time.sleep(0.5)
             
             self.Destroy()
-            speech_utils.speak(speech_utils.MESSAGES["exit"])
+            speech_utils.announce("exit")
+            speech_utils.shutdown(timeout=10)
+            metrics.stop_exporter()
             print("检测结束，成功退出程序!!!")
     
     def _learning_face(self, event):
         """人脸检测主循环"""
+        # 依赖cv2的模块在检测线程中才导入，避免拖慢界面启动
+        import cv2
+        import capture
+        import frame_pipeline
+        import frame_renderer
+        import adaptive_scheduler
+        
         # 打开摄像头
         try:
             # 先尝试释放之前可能存在的摄像头资源
-            if self.cap is not None and self.cap.isOpened():
-                self.cap.release()
+            if self.capture is not None:
+                self.capture.stop()
                 
-            # 重新打开摄像头
-            self.cap = cv2.VideoCapture(self.VIDEO_STREAM, cv2.CAP_DSHOW)  # Windows系统推荐
-            
-            # 设置摄像头分辨率
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            # 重新打开摄像头（Windows系统推荐DSHOW后端），设置分辨率为640x480
+            # 读取失败时重新连接一次，仍失败则停止检测
+            self.capture = capture.FrameCapture(self.VIDEO_STREAM, api=cv2.CAP_DSHOW, name="camera",
+                                                width=640, height=480, max_reconnects=1,
+                                                status_callback=self.append_text)
             
-            if self.cap.isOpened() == True:  # 检查初始化是否成功
+            if self.capture.is_opened():  # 检查初始化是否成功
                 self.CAMERA_STYLE = True
+                # 采集线程只保留最新一帧，检测慢于摄像头时丢弃旧帧
+                self.capture.start()
                 self.append_text(u"打开摄像头成功!!!\n")
-                speech_utils.speak(speech_utils.MESSAGES["camera_success"])
+                speech_utils.announce("camera_success")
                 # 更新状态栏
                 self.SetStatusText(u"摄像头已连接 - 正在检测中")
             else:
-                speech_utils.speak(speech_utils.MESSAGES["camera_fail"])
+                speech_utils.announce("camera_fail")
                 self.append_text(u"摄像头打开失败!!!\n")
                 # 显示封面图
                 self.bmp.SetBitmap(wx.Bitmap(self.image_cover))
@@ -501,144 +565,205 @@ class FatigueDetectionUI(wx.Frame):
             self.SetStatusText(u"摄像头连接错误 - 请检查设备")
             return
         
-        # 循环读取视频流
-        while (self.cap is not None and self.cap.isOpened()):
+        # 模型在后台加载时，摄像头已开始采集（只保留最新一帧），这里等待加载完成
+        if not self._wait_detector():
+            if self.capture is not None:
+                self.capture.stop()
+                self.capture = None
+            self.CAMERA_STYLE = False
+            return
+        
+        # 多进程流水线模式：检测分发到多个工作进程，结果按帧顺序交给分析器
+        self.pipeline = None
+        if config.PIPELINE_WORKERS > 0:
+            self.pipeline = frame_pipeline.FramePipeline(config.PIPELINE_WORKERS, self.detector.predictor_path,
+                                                         detect_scale=self.detector.detect_scale)
+        
+        # 自适应分析帧率：状态稳定时降低分析帧率，并限制CPU占用
+        self.scheduler = adaptive_scheduler.AdaptiveScheduler(self.analyzer) if config.ADAPTIVE_RATE else None
+        
+        # 会话事件日志：事件由后台线程批量写入，不阻塞检测循环
+        self.session_log = None
+        if config.SESSION_LOG_DIR:
             try:
-                # 读取一帧
-                flag, frame = self.cap.read()
-                
-                # 检查帧是否成功读取
-                if not flag or frame is None:
-                    self.append_text(u"视频帧获取失败，尝试重新连接...\n")
-                    # 尝试重新连接摄像头
-                    self.cap.release()
-                    self.cap = cv2.VideoCapture(self.VIDEO_STREAM, cv2.CAP_DSHOW)
-                    if not self.cap.isOpened():
-                        self.append_text(u"重新连接摄像头失败\n")
-                        break
-                    continue
-                    
-                start = time.time()
-                
-                # 检测人脸
-                face_detected, shape, leftEye, rightEye, mouth, ear, mar, pose = self.detector.detect_face(frame)
-                
-                if face_detected:
-                    # 绘制人脸特征
-                    frame = self.detector.draw_face_features(frame, shape, leftEye, rightEye, mouth)
-                    
-                    # 更新疲劳检测状态
-                    self.analyzer.update_blink(ear)
-                    self.analyzer.update_yawn(mar)
-                    self.analyzer.update_nod(pose[1])  # pose[1]是欧拉角
-                else:
-                    # 没有检测到人脸
-                    cv2.putText(frame, "No Face", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3, cv2.LINE_AA)
-                    self.analyzer.update_no_face()
-                
-                # 获取当前状态信息
-                status = self.analyzer.get_status_info()
-                fatigue_level = status["fatigue_level"]
-                
-                # 更新UI上的统计数据
-                try:
-                    wx.CallAfter(self.update_stats_ui, status)
-                except Exception as e:
-                    print(f"更新UI统计数据失败: {str(e)}")
-                
-                # 在图像上显示疲劳程度
-                if fatigue_level == "mild":
-                    cv2.putText(frame, "轻度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                elif fatigue_level == "moderate":
-                    cv2.putText(frame, "中度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                elif fatigue_level == "severe":
-                    cv2.putText(frame, "重度疲劳", (350, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                
-                # 计算FPS
-                T = time.time() - start
-                fps = 1 / T
-                fps_txt = 'FPS: %.2f' % (fps)
-                
-                # 在图像上显示各种信息，使用更美观的字体和颜色
-                # 使用半透明背景使文字更易读
-                info_bg = frame.copy()
-                cv2.rectangle(info_bg, (5, 5), (300, 180), (0, 0, 0), -1)
-                cv2.addWeighted(info_bg, 0.3, frame, 0.7, 0, frame)
-                
-                # 添加信息文本 - 使用英文显示，避免中文乱码问题
-                cv2.putText(frame, "Blinks: {}".format(status["blinks"]), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, "Nods: {}".format(status["nods"]), (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, "Yawns: {}".format(status["yawns"]), (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, "Blink Freq: {:.2f}".format(status["blink_frequency"]), (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, "Fatigue: {}".format(status["fatigue_score"]), (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                cv2.putText(frame, fps_txt, (frame.shape[1] - 120, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                # 转换颜色空间并显示图像
-                try:
-                    # 获取图像面板的客户区大小（实际可用于显示的区域）
-                    panel_size = self.image_panel.GetClientSize()
-                    panel_width, panel_height = panel_size.GetWidth(), panel_size.GetHeight()
-                    
-                    # 如果无法获取有效的面板尺寸，使用创建时设置的固定尺寸
-                    if panel_width <= 0 or panel_height <= 0:
-                        panel_width, panel_height = 640, 480
-                    
-                    # 保持原始视频帧的宽高比
-                    frame_height, frame_width = frame.shape[:2]
-                    aspect_ratio = frame_width / frame_height
-                    panel_aspect_ratio = panel_width / panel_height
-                    
-                    # 创建一个黑色背景，大小与面板一致
-                    display_frame = np.zeros((panel_height, panel_width, 3), dtype=np.uint8)
-                    
-                    # 根据宽高比决定如何调整大小
-                    if aspect_ratio > panel_aspect_ratio:
-                        # 视频帧更宽，以宽度为基准
-                        new_width = panel_width
-                        new_height = int(new_width / aspect_ratio)
-                        # 计算垂直居中的偏移量
-                        y_offset = (panel_height - new_height) // 2
-                        x_offset = 0
-                    else:
-                        # 视频帧更高，以高度为基准
-                        new_height = panel_height
-                        new_width = int(new_height * aspect_ratio)
-                        # 计算水平居中的偏移量
-                        x_offset = (panel_width - new_width) // 2
-                        y_offset = 0
-                    
-                    # 调整视频帧大小，保持宽高比
-                    resized_frame = cv2.resize(frame, (new_width, new_height))
-                    
-                    # 将调整大小后的帧放置在黑色背景上的正确位置
-                    display_frame[y_offset:y_offset+new_height, x_offset:x_offset+new_width] = resized_frame
-                    
-                    # 转换颜色空间
-                    image1 = cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB)
-                    pic = wx.Bitmap.FromBuffer(panel_width, panel_height, image1)
-                    
-                    # 在主线程中更新UI
-                    wx.CallAfter(self.bmp.SetBitmap, pic)
-                except Exception as e:
-                    self.append_text(f"视频帧处理错误: {str(e)}\n")
+                self.session_log = session_log.open_session(analyzer=self.analyzer)
+            except (OSError, ValueError) as e:
+                self.append_text(f"会话日志打开失败: {str(e)}\n")
+        
+        # 显示渲染器：独立线程按显示帧率渲染，DISPLAY_FPS为0时不显示视频
+        self.renderer = None
+        if config.DISPLAY_FPS > 0:
+            self.renderer = frame_renderer.FrameRenderer(
+                self.detector,
+                present=lambda canvas, width, height, status: wx.CallAfter(self._present_frame, canvas, width, height, status),
+                get_size=self._display_size, is_visible=self._display_visible, fps=config.DISPLAY_FPS)
+            self.renderer.start()
+        
+        # 循环读取视频流
+        if self.pipeline is not None:
+            results = self.pipeline.process(self._camera_frames())
+        else:
+            results = self._serial_detect(self._camera_frames())
+        
+        self.last_output_time = time.time()
+        try:
+            for capture_time, frame, result in results:
+                if result is None:
+                    _FRAMES_DROPPED.labels("camera", "error").inc()
                     continue
-            except Exception as e:
-                try:
-                    # 使用print记录错误，避免UI线程问题
-                    print(f"视频处理错误: {str(e)}")
-                    self.append_text(f"视频处理错误: {str(e)}\n")
-                except:
-                    # 如果UI已被销毁，只打印错误
-                    print(f"视频处理错误(UI已关闭): {str(e)}")
-                continue
+                self._handle_frame(frame, result, capture_time)
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+                self.pipeline = None
+            if self.renderer is not None:
+                self.renderer.stop()
+                self.renderer = None
+            if self.session_log is not None:
+                self.session_log.close()
+                self.session_log = None
         
         # 释放摄像头
-        if self.cap is not None and self.cap.isOpened():
-            self.cap.release()
-            self.cap = None
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
         # 更新状态栏
         wx.CallAfter(self.SetStatusText, u"摄像头已断开 - 检测已停止")
     
+    def _camera_frames(self):
+        """从采集线程依次取出最新的视频帧，采集结束或被停止时返回
+        
+        Yields:
+            tuple: (采集时刻, 视频帧)
+        """
+        camera = self.capture
+        if camera is None:
+            return
+        for frame, _, capture_time in camera.frames():
+            yield capture_time, frame
+            # 降频时等待到下一次分析的时刻再取最新的一帧
+            scheduler = self.scheduler
+            if scheduler is not None:
+                scheduler.wait()
+    
+    def _serial_detect(self, frames):
+        """在当前线程中逐帧检测人脸
+        
+        Args:
+            frames: (附加信息, 视频帧) 的可迭代对象
+            
+        Yields:
+            tuple: (附加信息, 视频帧, detect_face的返回值)，检测出错时返回值为None
+        """
+        for meta, frame in frames:
+            start = time.perf_counter()
+            try:
+                result = self.detector.detect_face(frame)
+            except Exception as e:
+                metrics.ERRORS.labels("detect").inc()
+                print(f"人脸检测错误: {str(e)}")
+                result = None
+            _STAGE_DETECT.observe(time.perf_counter() - start)
+            yield meta, frame, result
+    
+    def _handle_frame(self, frame, result, capture_time=None):
+        """分析一帧检测结果，并把结果交给渲染器
+        
+        Args:
+            frame: 视频帧
+            result: detect_face的返回值
+            capture_time: 该帧的采集时刻（time.monotonic），事件以采集时刻计时
+        """
+        try:
+            start = time.perf_counter()
+            face_detected, shape, leftEye, rightEye, mouth, ear, mar, pose = result
+            
+            # 更新疲劳检测状态
+            if face_detected:
+                self.analyzer.update(True, ear, mar, pose[1], timestamp=capture_time)  # pose[1]是欧拉角
+            else:
+                self.analyzer.update(False, timestamp=capture_time)
+            
+            # 调度节拍：按间隔更新疲劳评分并检查警报
+            self.analyzer.tick()
+            
+            # 获取当前状态信息
+            status = self.analyzer.get_status_info()
+            _STAGE_ANALYZE.observe(time.perf_counter() - start)
+            
+            # 根据本帧状态决定下一帧的分析时刻
+            if self.scheduler is not None:
+                self.scheduler.observe(result)
+            _FRAMES_PROCESSED.inc()
+            
+            # 从采集到做出判断的延迟
+            camera = self.capture
+            if capture_time is not None and camera is not None:
+                status["capture_latency"] = camera.record_decision(capture_time)
+            
+            # 计算FPS（相邻两帧结果输出的间隔，流水线模式下反映整体吞吐）
+            now = time.time()
+            T = now - self.last_output_time
+            self.last_output_time = now
+            _FRAME_INTERVAL.observe(T)
+            fps = 1 / T if T > 0 else 0.0
+            
+            # 绘制和显示由渲染线程按显示帧率完成，这里只提交最新一帧
+            if self.renderer is not None:
+                face = (shape, leftEye, rightEye, mouth) if face_detected else None
+                self.renderer.submit(frame, face, status, fps)
+        except Exception as e:
+            metrics.ERRORS.labels("analyze").inc()
+            try:
+                # 使用print记录错误，避免UI线程问题
+                print(f"视频处理错误: {str(e)}")
+                self.append_text(f"视频处理错误: {str(e)}\n")
+            except:
+                # 如果UI已被销毁，只打印错误
+                print(f"视频处理错误(UI已关闭): {str(e)}")
+    
+    def _display_size(self):
+        """获取图像面板的客户区大小（实际可用于显示的区域）"""
+        panel_size = self.image_panel.GetClientSize()
+        panel_width, panel_height = panel_size.GetWidth(), panel_size.GetHeight()
+        
+        # 如果无法获取有效的面板尺寸，使用创建时设置的固定尺寸
+        if panel_width <= 0 or panel_height <= 0:
+            panel_width, panel_height = 640, 480
+        return panel_width, panel_height
+    
+    def _display_visible(self):
+        """窗口可见且未最小化时才需要渲染"""
+        try:
+            return self.IsShown() and not self.IsIconized()
+        except Exception:
+            return False
+    
+    def _present_frame(self, canvas, width, height, status):
+        """在主线程中显示渲染好的画布，复用同一个位图
+        
+        Args:
+            canvas: RGB画布
+            width: 画布宽度
+            height: 画布高度
+            status: 包含当前状态的字典
+        """
+        try:
+            if self.display_bitmap is None or self.display_bitmap.GetSize() != wx.Size(width, height):
+                self.display_bitmap = wx.Bitmap.FromBuffer(width, height, canvas)
+            else:
+                self.display_bitmap.CopyFromBuffer(canvas)
+            self.bmp.SetBitmap(self.display_bitmap)
+            self.bmp.Refresh()
+            
+            # 统计数据也按显示帧率更新
+            self.update_stats_ui(status)
+        except Exception as e:
+            print(f"显示视频帧失败: {str(e)}")
+        finally:
+            if self.renderer is not None:
+                self.renderer.release()
+    
     def update_stats_ui(self, status):
         """更新UI上的统计数据
         
@@ -683,29 +808,6 @@ class FatigueDetectionUI(wx.Frame):
             # 如果UI组件已被删除，则忽略错误
             print(f"更新统计UI失败: {str(e)}")
     
-    def _frequency_counter(self, event):
-        """频率计算线程"""
-        try:
-            for i in range(500):  # 限制循环次数，避免无限循环
-                if not self.IsShown():  # 检查窗口是否仍然显示
-                    break
-                self.analyzer.calculate_frequencies()
-                self.analyzer.update_fatigue_score()
-                time.sleep(0.5)  # 添加短暂延迟，减少CPU使用率
-        except Exception as e:
-            print(f"频率计算线程错误: {str(e)}")
-    
-    def _fatigue_alarm(self, event):
-        """疲劳警报线程"""
-        try:
-            for i in range(500):  # 限制循环次数，避免无限循环
-                if not self.IsShown():  # 检查窗口是否仍然显示
-                    break
-                time.sleep(3)  # 每3秒检查一次
-                self.analyzer.check_and_alert()
-        except Exception as e:
-            print(f"疲劳警报线程错误: {str(e)}")
-            
     def on_button_hover(self, event, button, color):
         """按钮悬停效果"""
         button.SetBackgroundColour(color)